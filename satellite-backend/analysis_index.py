@@ -0,0 +1,208 @@
+"""
+Persistent analysis index backed by SQLite
+Maps analysis IDs to their upload directory, result folder and status
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    analysis_id   TEXT PRIMARY KEY,
+    upload_dir    TEXT NOT NULL,
+    result_folder TEXT,
+    location      TEXT,
+    status        TEXT NOT NULL,
+    error         TEXT,
+    created_at    TEXT NOT NULL,
+    updated_at    TEXT NOT NULL,
+    finished_at   TEXT,
+    size_bytes    INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+_MIGRATIONS = {
+    'size_bytes': "ALTER TABLE analyses ADD COLUMN size_bytes INTEGER NOT NULL DEFAULT 0",
+}
+
+
+class AnalysisIndex:
+    """Primary-key lookups for analyses instead of directory scans"""
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path: Path to the SQLite database file (created if missing)
+        """
+        self.db_path = str(db_path)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_created ON analyses (created_at)")
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(analyses)")}
+        for column, statement in _MIGRATIONS.items():
+            if column not in columns:
+                self._conn.execute(statement)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+                return cursor.rowcount
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def register(self, analysis_id, upload_dir, location=None, result_folder=None):
+        """Record a newly started analysis"""
+        now = datetime.now().isoformat()
+        self._execute(
+            "INSERT INTO analyses (analysis_id, upload_dir, result_folder, location, status, "
+            "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (analysis_id, str(upload_dir), result_folder, location, STATUS_RUNNING, now, now)
+        )
+
+    def complete(self, analysis_id, result_folder):
+        """Mark an analysis as finished; a single transaction so readers never see half a row"""
+        now = datetime.now().isoformat()
+        self._execute(
+            "UPDATE analyses SET status = ?, result_folder = ?, error = NULL, "
+            "updated_at = ?, finished_at = ? WHERE analysis_id = ?",
+            (STATUS_COMPLETED, result_folder, now, now, analysis_id)
+        )
+
+    def fail(self, analysis_id, error):
+        """Mark an analysis as failed"""
+        now = datetime.now().isoformat()
+        self._execute(
+            "UPDATE analyses SET status = ?, error = ?, updated_at = ?, finished_at = ? "
+            "WHERE analysis_id = ?",
+            (STATUS_FAILED, str(error), now, now, analysis_id)
+        )
+
+    def remove(self, analysis_id):
+        """Drop an analysis from the index"""
+        self._execute("DELETE FROM analyses WHERE analysis_id = ?", (analysis_id,))
+
+    def get(self, analysis_id):
+        """Return the index entry for an analysis as a dict, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM analyses WHERE analysis_id = ?", (analysis_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def set_size(self, analysis_id, size_bytes):
+        """Record the on-disk size of an analysis (uploads plus results)"""
+        self._execute(
+            "UPDATE analyses SET size_bytes = ?, updated_at = ? WHERE analysis_id = ?",
+            (int(size_bytes), datetime.now().isoformat(), analysis_id)
+        )
+
+    def list_finished(self, older_than=None):
+        """
+        Return finished (completed or failed) analyses, oldest first
+
+        Args:
+            older_than: Optional ISO timestamp; only analyses created before it
+        """
+        sql = "SELECT * FROM analyses WHERE status != ?"
+        params = [STATUS_RUNNING]
+        if older_than is not None:
+            sql += " AND created_at < ?"
+            params.append(older_than)
+        sql += " ORDER BY created_at ASC"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def result_folders(self):
+        """Return the set of result folders referenced by any analysis"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT result_folder FROM analyses WHERE result_folder IS NOT NULL"
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def usage(self):
+        """Return analysis counts per status and the total recorded size"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*), COALESCE(SUM(size_bytes), 0) FROM analyses GROUP BY status"
+            ).fetchall()
+        by_status = {row[0]: {'count': row[1], 'size_bytes': row[2]} for row in rows}
+        return {
+            'analyses': sum(v['count'] for v in by_status.values()),
+            'size_bytes': sum(v['size_bytes'] for v in by_status.values()),
+            'by_status': by_status
+        }
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def import_legacy(self, upload_dir):
+        """
+        Register analyses written before the index existed
+
+        Upload folders are named ``<analysis_id>_<timestamp>`` and carry a
+        ``response.json`` with the result folder. This runs once at startup;
+        entries that are already indexed are left untouched.
+
+        Returns:
+            Number of imported analyses
+        """
+        import json
+
+        upload_dir = Path(upload_dir)
+        if not upload_dir.exists():
+            return 0
+
+        imported = 0
+        for entry in upload_dir.iterdir():
+            if not entry.is_dir():
+                continue
+            analysis_id = entry.name.split('_', 1)[0]
+            if self.get(analysis_id):
+                continue
+
+            response_path = entry / "response.json"
+            created_at = datetime.fromtimestamp(entry.stat().st_mtime).isoformat()
+            result_folder = None
+            location = None
+            status = STATUS_FAILED
+            if response_path.exists():
+                try:
+                    with open(response_path, 'r') as f:
+                        response = json.load(f)
+                    result_folder = response.get('result_folder')
+                    location = response.get('location')
+                    status = STATUS_COMPLETED
+                except (OSError, ValueError):
+                    pass
+
+            self._execute(
+                "INSERT OR IGNORE INTO analyses (analysis_id, upload_dir, result_folder, location, "
+                "status, created_at, updated_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (analysis_id, str(entry), result_folder, location, status,
+                 created_at, created_at, created_at)
+            )
+            imported += 1
+
+        return imported
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
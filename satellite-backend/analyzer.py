@@ -5,6 +5,8 @@ import torch
 import rasterio
 from datetime import datetime
 import json
+import config
+from zonal_stats import zonal_statistics
 
 class EnvironmentalAnalyzer:
     def __init__(self):
@@ -55,15 +57,24 @@ class EnvironmentalAnalyzer:
             'savi': savi
         }
     
+    def spectral_change(self, bands1, bands2):
+        """Per-pixel largest |change| of NDVI, NDBI and NDWI (cheap change prefilter)"""
+        indices1 = self.calculate_indices(bands1)
+        indices2 = self.calculate_indices(bands2)
+        score = np.abs(indices2['ndvi'] - indices1['ndvi'])
+        for name in ('ndbi', 'ndwi'):
+            np.maximum(score, np.abs(indices2[name] - indices1[name]), out=score)
+        return score
+    
     def analyze_vegetation_change(self, indices1, indices2):
         """Analyze vegetation changes"""
         ndvi_diff = indices2['ndvi'] - indices1['ndvi']
         savi_diff = indices2['savi'] - indices1['savi']
         
         # Classify changes
-        vegetation_increase = np.sum(ndvi_diff > 0.1)
-        vegetation_decrease = np.sum(ndvi_diff < -0.1)
-        vegetation_stable = np.sum(np.abs(ndvi_diff) <= 0.1)
+        vegetation_increase = np.sum(ndvi_diff > config.INDEX_CHANGE_THRESHOLD)
+        vegetation_decrease = np.sum(ndvi_diff < -config.INDEX_CHANGE_THRESHOLD)
+        vegetation_stable = np.sum(np.abs(ndvi_diff) <= config.INDEX_CHANGE_THRESHOLD)
         
         total_pixels = ndvi_diff.size
         
@@ -82,9 +93,9 @@ class EnvironmentalAnalyzer:
         ndbi_diff = indices2['ndbi'] - indices1['ndbi']
         
         # Classify changes
-        urbanization = np.sum(ndbi_diff > 0.1)
-        deurbanization = np.sum(ndbi_diff < -0.1)
-        urban_stable = np.sum(np.abs(ndbi_diff) <= 0.1)
+        urbanization = np.sum(ndbi_diff > config.INDEX_CHANGE_THRESHOLD)
+        deurbanization = np.sum(ndbi_diff < -config.INDEX_CHANGE_THRESHOLD)
+        urban_stable = np.sum(np.abs(ndbi_diff) <= config.INDEX_CHANGE_THRESHOLD)
         
         total_pixels = ndbi_diff.size
         
@@ -93,16 +104,16 @@ class EnvironmentalAnalyzer:
             'deurbanization_percent': (deurbanization / total_pixels) * 100,
             'urban_stable_percent': (urban_stable / total_pixels) * 100,
             'mean_ndbi_change': float(np.mean(ndbi_diff)),
-            'construction_area_km2': (urbanization * 100) / 1e6,  # Assuming 10m resolution
-            'demolition_area_km2': (deurbanization * 100) / 1e6
+            'construction_area_km2': urbanization * config.PIXEL_AREA_KM2,
+            'demolition_area_km2': deurbanization * config.PIXEL_AREA_KM2
         }
     
     def analyze_water_change(self, indices1, indices2):
         """Analyze water body changes"""
         ndwi_diff = indices2['ndwi'] - indices1['ndwi']
         
-        water_increase = np.sum(ndwi_diff > 0.1)
-        water_decrease = np.sum(ndwi_diff < -0.1)
+        water_increase = np.sum(ndwi_diff > config.INDEX_CHANGE_THRESHOLD)
+        water_decrease = np.sum(ndwi_diff < -config.INDEX_CHANGE_THRESHOLD)
         
         total_pixels = ndwi_diff.size
         
@@ -110,16 +121,37 @@ class EnvironmentalAnalyzer:
             'water_increase_percent': (water_increase / total_pixels) * 100,
             'water_decrease_percent': (water_decrease / total_pixels) * 100,
             'mean_ndwi_change': float(np.mean(ndwi_diff)),
-            'water_gain_area_km2': (water_increase * 100) / 1e6,
-            'water_loss_area_km2': (water_decrease * 100) / 1e6
+            'water_gain_area_km2': water_increase * config.PIXEL_AREA_KM2,
+            'water_loss_area_km2': water_decrease * config.PIXEL_AREA_KM2
         }
     
-    def generate_report(self, bands1, bands2, date1, date2, location="Unknown"):
-        """Generate comprehensive environmental change report"""
+    def generate_report(self, bands1, bands2, date1, date2, location="Unknown", mask=None,
+                        zones=None, zone_names=None):
+        """
+        Generate comprehensive environmental change report
+        
+        With a (H, W) bool mask only the selected pixels are indexed and counted,
+        so the cost follows the ROI area rather than the scene area. With an
+        (H, W) integer zones raster the report gains per-zone metrics
+        ('zonal_analysis'), computed from the same indices.
+        """
+        if mask is not None:
+            bands1 = bands1[:, mask]
+            bands2 = bands2[:, mask]
+            if zones is not None:
+                zones = zones[mask]
+        
         # Calculate indices
         indices1 = self.calculate_indices(bands1)
         indices2 = self.calculate_indices(bands2)
         
+        report = self.generate_report_from_indices(indices1, indices2, date1, date2, location)
+        if zones is not None:
+            report['zonal_analysis'] = zonal_statistics(indices1, indices2, zones, zone_names)
+        return report
+    
+    def generate_report_from_indices(self, indices1, indices2, date1, date2, location="Unknown"):
+        """Same report as generate_report, from indices computed earlier (e.g. in a time series)"""
         # Analyze changes
         veg_analysis = self.analyze_vegetation_change(indices1, indices2)
         urban_analysis = self.analyze_urban_change(indices1, indices2)
@@ -166,3 +198,56 @@ class EnvironmentalAnalyzer:
             summary.append("Minimal environmental changes detected in the analyzed period")
         
         return summary
+
+
+class TrendAccumulator:
+    """
+    Per-pixel least-squares slope of an index over time, updated one date at a time
+    
+    Only running sums are kept (n, Σt, Σt² as scalars; Σy, Σty per pixel), so
+    the date stack never has to be held in memory or read twice.
+    """
+    
+    def __init__(self):
+        self.n = 0
+        self.sum_t = 0.0
+        self.sum_tt = 0.0
+        self.sum_y = None
+        self.sum_ty = None
+    
+    def update(self, t, values):
+        """Add one acquisition: t in years since the first date, values an (H, W) index map"""
+        if self.sum_y is None:
+            self.sum_y = np.zeros(values.shape, dtype=np.float32)
+            self.sum_ty = np.zeros(values.shape, dtype=np.float32)
+        self.sum_y += values
+        self.sum_ty += np.float32(t) * values
+        self.n += 1
+        self.sum_t += t
+        self.sum_tt += t * t
+    
+    def slope(self):
+        """Per-pixel slope in index units per year (zeros with fewer than two distinct dates)"""
+        denom = self.n * self.sum_tt - self.sum_t ** 2
+        if self.sum_y is None or self.n < 2 or denom <= 0:
+            return np.zeros_like(self.sum_y) if self.sum_y is not None else None
+        return (self.n * self.sum_ty - np.float32(self.sum_t) * self.sum_y) / np.float32(denom)
+    
+    def mean(self):
+        return self.sum_y / self.n if self.n else None
+    
+    def summary(self, threshold):
+        """Scene statistics of the slope map; threshold splits rising/falling/stable pixels"""
+        slope = self.slope()
+        if slope is None:
+            return None
+        p10, p50, p90 = np.percentile(slope, [10, 50, 90])
+        return {
+            'mean_slope_per_year': float(np.mean(slope)),
+            'median_slope_per_year': float(p50),
+            'p10_slope_per_year': float(p10),
+            'p90_slope_per_year': float(p90),
+            'increasing_percent': float(np.mean(slope > threshold) * 100),
+            'decreasing_percent': float(np.mean(slope < -threshold) * 100),
+            'stable_percent': float(np.mean(np.abs(slope) <= threshold) * 100)
+        }
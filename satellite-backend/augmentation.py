@@ -0,0 +1,69 @@
+"""Batched augmentation on (B, C, H, W) tensor pairs
+
+Replaces the per-sample albumentations flips/rot90/crops that run in the
+DataLoader workers with a few tensor ops over the whole collated batch.
+"""
+
+import torch
+
+
+class BatchAugment:
+    """Random flips, 90° rotations and crops with shared parameters for img1 and img2"""
+
+    def __init__(self, crop_size=None, p_hflip=0.5, p_vflip=0.5, p_rot90=0.5, generator=None):
+        """
+        Args:
+            crop_size: Side of the square random crop, or None to keep the input size
+            p_hflip, p_vflip: Per-sample flip probabilities
+            p_rot90: Per-sample probability of a random k x 90° rotation
+                     (like albumentations.RandomRotate90, k may be 0)
+            generator: Optional torch.Generator for reproducible draws
+        """
+        self.crop_size = crop_size
+        self.p_hflip = p_hflip
+        self.p_vflip = p_vflip
+        self.p_rot90 = p_rot90
+        self.generator = generator
+
+    def _rand(self, n, device):
+        return torch.rand(n, generator=self.generator).to(device)
+
+    def _crop(self, x):
+        b, c, h, w = x.shape
+        size = self.crop_size
+        if size is None or (size >= h and size >= w):
+            return x
+
+        oy = torch.randint(0, h - size + 1, (b,), generator=self.generator).to(x.device)
+        ox = torch.randint(0, w - size + 1, (b,), generator=self.generator).to(x.device)
+        offsets = torch.arange(size, device=x.device)
+        rows = (oy[:, None] + offsets)[:, :, None]  # (B, S, 1)
+        cols = (ox[:, None] + offsets)[:, None, :]  # (B, 1, S)
+        batch_idx = torch.arange(b, device=x.device)[:, None, None]
+
+        # Advanced indexing gathers every sample's window at once: (B, S, S, C)
+        return x.permute(0, 2, 3, 1)[batch_idx, rows, cols].permute(0, 3, 1, 2)
+
+    def __call__(self, img1, img2):
+        """Augment a batch pair; returns (img1, img2) with identical geometry per sample"""
+        channels = img1.shape[1]
+        x = torch.cat([img1, img2], dim=1)
+        b = x.shape[0]
+
+        x = self._crop(x)
+
+        hflip = (self._rand(b, x.device) < self.p_hflip)[:, None, None, None]
+        x = torch.where(hflip, x.flip(-1), x)
+        vflip = (self._rand(b, x.device) < self.p_vflip)[:, None, None, None]
+        x = torch.where(vflip, x.flip(-2), x)
+
+        if self.p_rot90 > 0 and x.shape[-1] == x.shape[-2]:
+            k = torch.randint(0, 4, (b,), generator=self.generator)
+            k[torch.rand(b, generator=self.generator) >= self.p_rot90] = 0
+            x = x.clone()
+            for turns in (1, 2, 3):
+                idx = (k == turns).nonzero(as_tuple=True)[0].to(x.device)
+                if idx.numel():
+                    x[idx] = torch.rot90(x[idx], turns, dims=(-2, -1))
+
+        return x[:, :channels], x[:, channels:]
@@ -0,0 +1,199 @@
+"""
+Bulk conversion of RGB image archives to stacked 13-band GeoTIFFs
+Streams a directory tree or manifest through a process pool
+"""
+
+import os
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, ALL_COMPLETED, wait
+import config
+from image_converter import ImageConverter
+
+RGB_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+_converter = None
+
+
+def _init_worker():
+    """Create one converter per worker process"""
+    global _converter
+    _converter = ImageConverter()
+
+
+def _convert_one(src_path, dst_path):
+    """Convert a single image inside a worker process"""
+    try:
+        _converter.convert_rgb_to_stack(src_path, dst_path)
+        return src_path, None
+    except Exception as e:
+        # Never leave a partial stack behind, so a rerun retries this item
+        if os.path.exists(dst_path + '.part'):
+            os.remove(dst_path + '.part')
+        return src_path, str(e)
+
+
+def iter_directory(input_dir):
+    """Yield (source, relative path) pairs for every RGB image under input_dir"""
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(RGB_EXTENSIONS):
+                src_path = os.path.join(root, name)
+                yield src_path, os.path.relpath(src_path, input_dir)
+
+
+def iter_manifest(manifest_path):
+    """
+    Yield (source, relative path) pairs from a manifest with one path per line
+
+    Entries under the manifest's folder keep their relative layout. Absolute
+    entries and entries outside that folder go to ``_external/`` with a short
+    hash of their full path, so equal file names from different folders do
+    not collide.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            src_path = line.strip()
+            if not src_path or src_path.startswith('#'):
+                continue
+            src_path = os.path.normpath(os.path.join(base_dir, src_path))
+            rel_path = os.path.relpath(src_path, base_dir)
+            if os.path.isabs(rel_path) or rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+                stem, ext = os.path.splitext(os.path.basename(src_path))
+                digest = hashlib.blake2b(src_path.encode('utf-8'), digest_size=4).hexdigest()
+                rel_path = os.path.join('_external', f"{stem}-{digest}{ext}")
+            yield src_path, rel_path
+
+
+class BatchConverter:
+    """Converts large RGB archives with bounded memory and resumable output"""
+
+    def __init__(self, output_dir, workers=None, max_in_flight=None, report_every=100):
+        """
+        Args:
+            output_dir: Root folder for the stacked .tif outputs
+            workers: Number of worker processes (default: config.NUM_WORKERS)
+            max_in_flight: Maximum submitted-but-unfinished items (default: 2 x workers)
+            report_every: Print progress after this many finished items
+        """
+        self.output_dir = output_dir
+        self.workers = workers or config.NUM_WORKERS
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.report_every = report_every
+
+    def output_path_for(self, rel_path):
+        """
+        Map an input path relative to its source root to its stacked output
+
+        The source extension is kept (``a.png`` -> ``a.png.tif``), so images
+        that differ only in extension get separate outputs.
+
+        Raises:
+            ValueError: if the output would land outside output_dir
+        """
+        dst_path = os.path.join(self.output_dir, rel_path + '.tif')
+        root = os.path.realpath(self.output_dir)
+        if os.path.commonpath([root, os.path.realpath(dst_path)]) != root:
+            raise ValueError(f"output {dst_path} is outside {self.output_dir}")
+        return dst_path
+
+    def run(self, items):
+        """
+        Convert every (source, relative path) pair from an iterator
+
+        Items whose output already exists are skipped, which makes an
+        interrupted run resumable. Only ``max_in_flight`` items are held by
+        the pool at once, so memory stays bounded for any archive size.
+
+        Returns:
+            Dictionary with converted/skipped/failed counts and throughput
+        """
+        stats = {'converted': 0, 'skipped': 0, 'failed': 0, 'errors': []}
+        start_time = time.perf_counter()
+        pending = set()
+
+        def drain(return_when):
+            done, still_pending = wait(pending, return_when=return_when)
+            for future in done:
+                src_path, error = future.result()
+                if error:
+                    stats['failed'] += 1
+                    stats['errors'].append({'source': src_path, 'error': error})
+                    print(f"  ⚠️  {src_path}: {error}")
+                else:
+                    stats['converted'] += 1
+                    if stats['converted'] % self.report_every == 0:
+                        self._print_progress(stats, start_time)
+            return still_pending
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+            for src_path, rel_path in items:
+                try:
+                    dst_path = self.output_path_for(rel_path)
+                except ValueError as e:
+                    stats['failed'] += 1
+                    stats['errors'].append({'source': src_path, 'error': str(e)})
+                    print(f"  ⚠️  {src_path}: {e}")
+                    continue
+                if os.path.exists(dst_path):
+                    stats['skipped'] += 1
+                    continue
+
+                pending.add(pool.submit(_convert_one, src_path, dst_path))
+                if len(pending) >= self.max_in_flight:
+                    pending = drain(FIRST_COMPLETED)
+
+            if pending:
+                pending = drain(ALL_COMPLETED)
+
+        elapsed = time.perf_counter() - start_time
+        stats['elapsed_seconds'] = elapsed
+        stats['images_per_second'] = stats['converted'] / elapsed if elapsed > 0 else 0.0
+        return stats
+
+    def _print_progress(self, stats, start_time):
+        elapsed = time.perf_counter() - start_time
+        rate = stats['converted'] / elapsed if elapsed > 0 else 0.0
+        print(f"  {stats['converted']} converted, {stats['skipped']} skipped, "
+              f"{stats['failed']} failed ({rate:.2f} images/s)")
+
+
+def main():
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Bulk RGB to 13-band conversion')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input-dir', help='Folder scanned recursively for PNG/JPEG images')
+    source.add_argument('--manifest', help='Text file with one image path per line')
+    parser.add_argument('--output-dir', required=True, help='Folder for stacked .tif outputs')
+    parser.add_argument('--workers', type=int, default=config.NUM_WORKERS, help='Worker processes')
+    parser.add_argument('--max-in-flight', type=int, help='Items queued in the pool at once')
+    parser.add_argument('--report-every', type=int, default=100, help='Progress interval (images)')
+    parser.add_argument('--errors-file', help='Write failed items to this JSON file')
+
+    args = parser.parse_args()
+
+    items = iter_directory(args.input_dir) if args.input_dir else iter_manifest(args.manifest)
+    batch = BatchConverter(args.output_dir, args.workers, args.max_in_flight, args.report_every)
+
+    print(f"🔄 Converting with {batch.workers} workers (max {batch.max_in_flight} in flight)...")
+    stats = batch.run(items)
+
+    print("\n" + "=" * 60)
+    print(f"Converted: {stats['converted']}")
+    print(f"Skipped (already done): {stats['skipped']}")
+    print(f"Failed: {stats['failed']}")
+    print(f"Elapsed: {stats['elapsed_seconds']:.1f}s")
+    print(f"Throughput: {stats['images_per_second']:.2f} images/s")
+
+    if args.errors_file and stats['errors']:
+        with open(args.errors_file, 'w') as f:
+            json.dump(stats['errors'], f, indent=4)
+        print(f"Errors written to: {args.errors_file}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+"""End-to-end performance benchmark on synthetic 13-band scenes
+
+Times every stage of the analysis pipeline separately so regressions can be
+traced to one component:
+
+    python benchmark.py                                   # 256, 1024, 4096
+    python benchmark.py --sizes 256 1024 4096 10000 --output bench.json
+    python benchmark.py --baseline bench.json --tolerance 0.1
+    python benchmark.py --sizes 256 --heads-size 1024  # per-head vs fused task heads
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import platform
+from pathlib import Path
+import statistics
+import tempfile
+import numpy as np
+import rasterio
+import torch
+from PIL import Image
+from datetime import datetime
+import config
+from predict import ChangeDetectionPredictor
+from image_converter import ImageConverter
+from tiling import run_tiled_inference
+from memory_tracker import peak_rss_mb
+
+DEFAULT_SIZES = [256, 1024, 4096]
+
+
+def write_synthetic_scene(folder, size, seed):
+    """
+    Write a reproducible 13-band uint16 scene as one GeoTIFF per band
+
+    Smooth low-frequency structure plus noise, so the analyzer and the
+    compressors see something closer to real imagery than white noise.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    coarse = max(size // 64, 2)
+    for band_name in config.BAND_NAMES:
+        base = rng.uniform(500, 4000, (coarse, coarse)).astype(np.float32)
+        base = np.array(Image.fromarray(base).resize((size, size), Image.BILINEAR))
+        band = base + rng.normal(0, 150, (size, size)).astype(np.float32)
+        band = np.clip(band, 0, 10000).astype(np.uint16)
+        with rasterio.open(
+            os.path.join(folder, f"{band_name}.tif"), 'w', driver='GTiff',
+            height=size, width=size, count=1, dtype='uint16'
+        ) as dst:
+            dst.write(band, 1)
+        del base, band
+
+
+def write_synthetic_rgb(path, size, seed):
+    rng = np.random.default_rng(seed)
+    rgb = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+    Image.fromarray(rgb).save(path)
+
+
+def time_stage(fn, repeats):
+    """Run fn() ``repeats`` times; returns (timing summary, last result)"""
+    times = []
+    result = None
+    for _ in range(repeats):
+        result = None  # Release the previous result before the next run
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'runs': times
+    }, result
+
+
+def model_forward(predictor, bands1, bands2):
+    """Full-frame forward up to one tile, tiled inference above that"""
+    if max(bands1.shape[1:]) <= config.TILE_SIZE:
+        img1 = torch.from_numpy(bands1).unsqueeze(0).to(predictor.device)
+        img2 = torch.from_numpy(bands2).unsqueeze(0).to(predictor.device)
+        with torch.no_grad():
+            outputs = predictor.model(img1, img2)
+        return {
+            'change': outputs['change'].cpu().numpy()[0, 0],
+            'vegetation': outputs['vegetation'].cpu().numpy()[0],
+            'urban': outputs['urban'].cpu().numpy()[0]
+        }
+    return run_tiled_inference(predictor.model, bands1, bands2, predictor.device)
+
+
+class ApiClient:
+    """Drives /api/analyze in-process with the LLM disabled and throwaway storage"""
+
+    def __init__(self, predictor, work_dir):
+        from fastapi.testclient import TestClient
+        import main
+        from analysis_index import AnalysisIndex
+        from storage_manager import StorageManager
+
+        # The endpoint refuses to run without a key; it is never used since the explainer is off
+        os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+        main.predictor = predictor
+        main.llm_explainer = None
+        main.UPLOAD_DIR = Path(work_dir) / 'uploads'
+        main.RESULTS_DIR = Path(work_dir) / 'results'
+        main.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        main.RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        main.analysis_index = AnalysisIndex(os.path.join(work_dir, 'analysis_index.db'))
+        main.storage_manager = StorageManager(main.analysis_index, main.UPLOAD_DIR, main.RESULTS_DIR)
+
+        # No context manager: startup would load the real checkpoint and start the sweeper
+        self.client = TestClient(main.app)
+
+    def analyze(self, before_png, after_png):
+        with open(before_png, 'rb') as f:
+            before = f.read()
+        with open(after_png, 'rb') as f:
+            after = f.read()
+        response = self.client.post(
+            '/api/analyze',
+            params={'location': 'benchmark'},
+            files=[
+                ('before_images', ('before.png', io.BytesIO(before), 'image/png')),
+                ('after_images', ('after.png', io.BytesIO(after), 'image/png'))
+            ]
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/analyze returned {response.status_code}: {response.text}")
+        return response.json()
+
+
+def benchmark_size(predictor, size, repeats, work_dir, api_client=None, api_max_size=None, seed=0):
+    """Time every stage for one scene size"""
+    print(f"\n=== {size}x{size} ===")
+    size_dir = os.path.join(work_dir, str(size))
+    before_dir = os.path.join(size_dir, 'before')
+    after_dir = os.path.join(size_dir, 'after')
+    write_synthetic_scene(before_dir, size, seed)
+    write_synthetic_scene(after_dir, size, seed + 1)
+
+    stages = {}
+
+    stages['load_image_bands'], bands1 = time_stage(lambda: predictor.load_image_bands(before_dir), repeats)
+    bands2 = predictor.load_image_bands(after_dir)
+
+    stages['model_forward'], outputs = time_stage(lambda: model_forward(predictor, bands1, bands2), repeats)
+
+    stages['generate_report'], _ = time_stage(
+        lambda: predictor.analyzer.generate_report(bands1, bands2, '20200101', '20210101', 'benchmark'),
+        repeats
+    )
+
+    viz_path = os.path.join(size_dir, 'viz', 'change_analysis.png')
+    os.makedirs(os.path.dirname(viz_path), exist_ok=True)
+    stages['create_change_visualization'], _ = time_stage(
+        lambda: predictor.visualizer.create_change_visualization(
+            bands1, bands2, outputs['change'], outputs['vegetation'], outputs['urban'],
+            output_path=viz_path
+        ),
+        repeats
+    )
+    del outputs, bands1, bands2
+
+    before_png = os.path.join(size_dir, 'before.png')
+    after_png = os.path.join(size_dir, 'after.png')
+    write_synthetic_rgb(before_png, size, seed)
+    write_synthetic_rgb(after_png, size, seed + 1)
+    converter = ImageConverter()
+    stages['convert_rgb_to_multispectral'], _ = time_stage(
+        lambda: converter.convert_rgb_to_multispectral(before_png, os.path.join(size_dir, 'converted')),
+        repeats
+    )
+
+    # The endpoint runs a full-frame forward pass, so very large scenes are skipped
+    if api_client is not None and (api_max_size is None or size <= api_max_size):
+        stages['api_analyze'], _ = time_stage(lambda: api_client.analyze(before_png, after_png), repeats)
+
+    for name, timing in stages.items():
+        print(f"  {name:<30} median {timing['median']:8.3f}s  (min {timing['min']:.3f}s)")
+
+    shutil.rmtree(size_dir, ignore_errors=True)
+    return {'size': size, 'pixels': size * size, 'stages': stages, 'peak_rss_mb': peak_rss_mb()}
+
+
+def benchmark_heads(model, size, repeats, device, seed=0):
+    """
+    Time ChangeDetectionModel.compare with separate vs fused task heads, all
+    heads vs the change head only, on random (1, 64, size, size) features
+
+    Returns:
+        Stage timings, speedups over the separate all-heads run and the largest
+        output difference between the fused and separate heads
+    """
+    print(f"\n=== task heads {size}x{size} ===")
+    generator = torch.Generator().manual_seed(seed)
+    feat1 = torch.randn(1, 64, size, size, generator=generator).to(device)
+    feat2 = torch.randn(1, 64, size, size, generator=generator).to(device)
+    was_fused = model.fused_heads is not None
+
+    def run(heads=None):
+        outputs = model.compare(feat1, feat2, heads)
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        return outputs
+
+    stages = {}
+    with torch.no_grad():
+        model.unfuse_heads()
+        stages['separate_all_heads'], reference = time_stage(run, repeats)
+        stages['separate_change_only'], _ = time_stage(lambda: run(('change',)), repeats)
+        model.fuse_heads()
+        stages['fused_all_heads'], fused = time_stage(run, repeats)
+        stages['fused_change_only'], _ = time_stage(lambda: run(('change',)), repeats)
+        max_diff = max(float((fused[name] - reference[name]).abs().max()) for name in reference)
+    if not was_fused:
+        model.unfuse_heads()
+
+    base = stages['separate_all_heads']['median']
+    speedups = {name: base / timing['median'] for name, timing in stages.items() if timing['median'] > 0}
+    for name, timing in stages.items():
+        print(f"  {name:<30} median {timing['median']:8.3f}s  ({speedups.get(name, 0):.2f}x)")
+    print(f"  max |fused - separate| = {max_diff:.2e}")
+    return {'size': size, 'stages': stages, 'speedup': speedups, 'max_abs_diff': max_diff}
+
+
+def machine_info():
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'python': sys.version.split()[0],
+        'torch': torch.__version__,
+        'cpu_count': os.cpu_count(),
+        'torch_threads': torch.get_num_threads(),
+        'cuda': torch.cuda.get_device_name(0) if torch.cuda.is_available() else None
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Compare median stage times against a previous results file
+
+    Returns:
+        List of regressions (stage slower than baseline * (1 + tolerance))
+    """
+    baseline_sizes = {entry['size']: entry for entry in baseline['results']}
+    regressions = []
+    print("\n" + "=" * 72)
+    print(f"{'size':>6} {'stage':<30} {'baseline':>10} {'current':>10} {'change':>9}")
+    for entry in results['results']:
+        previous = baseline_sizes.get(entry['size'])
+        if previous is None:
+            continue
+        for name, timing in entry['stages'].items():
+            if name not in previous['stages']:
+                continue
+            old = previous['stages'][name]['median']
+            new = timing['median']
+            change = (new - old) / old if old > 0 else 0.0
+            flag = ''
+            if change > tolerance:
+                flag = '  ⚠️'
+                regressions.append({'size': entry['size'], 'stage': name, 'baseline': old,
+                                    'current': new, 'change': change})
+            print(f"{entry['size']:>6} {name:<30} {old:>9.3f}s {new:>9.3f}s {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the analysis pipeline on synthetic scenes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Square scene sizes in pixels (e.g. 256 1024 4096 10000)')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per stage')
+    parser.add_argument('--model', help='Checkpoint to load (default: untrained weights)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic scenes')
+    parser.add_argument('--threads', type=int, help='Torch intra-op threads')
+    parser.add_argument('--no-api', action='store_true', help='Skip the /api/analyze round trip')
+    parser.add_argument('--api-max-size', type=int, default=1024,
+                        help='Largest scene sent through /api/analyze')
+    parser.add_argument('--output', default='benchmark_results.json', help='Results file')
+    parser.add_argument('--baseline', help='Previous results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed slowdown vs. baseline before failing (fraction)')
+    parser.add_argument('--heads-size', type=int, default=config.TILE_SIZE,
+                        help='Feature map size for the task-head benchmark (0 = skip)')
+
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    predictor = ChangeDetectionPredictor(args.model, use_llm=False)
+    work_dir = tempfile.mkdtemp(prefix='terratrack_bench_')
+    try:
+        api_client = None if args.no_api else ApiClient(predictor, work_dir)
+        results = {
+            'created_at': datetime.now().isoformat(),
+            'machine': machine_info(),
+            'settings': {
+                'repeats': args.repeats,
+                'seed': args.seed,
+                'model': args.model,
+                'tile_size': config.TILE_SIZE,
+                'tile_overlap': config.TILE_OVERLAP,
+                'device': str(predictor.device)
+            },
+            'results': [
+                benchmark_size(predictor, size, args.repeats, work_dir, api_client,
+                               args.api_max_size, args.seed)
+                for size in args.sizes
+            ]
+        }
+        if args.heads_size:
+            results['heads'] = benchmark_heads(predictor.model, args.heads_size, args.repeats,
+                                               predictor.device, args.seed)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        results['baseline'] = {'path': args.baseline, 'tolerance': args.tolerance,
+                               'regressions': regressions}
+        if regressions:
+            print(f"\n❌ {len(regressions)} stage(s) slower than baseline by more than {args.tolerance:.0%}")
+            exit_code = 1
+        else:
+            print("\n✅ No regressions against baseline")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(f"\nResults saved to: {args.output}")
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+Change-region vectorization
+Thresholds the model's change map, labels connected components with
+OpenCV's block-based labeling and turns every region above a minimum area
+into a GeoJSON polygon with its area, bounding box and dominant class.
+Per-region statistics come from bincount over the labels, so the cost is
+one pass over the scene plus one pass over each region's bounding box.
+"""
+
+import json
+import cv2
+import numpy as np
+from rasterio.transform import Affine
+import config
+
+VEGETATION_CLASSES = ('stable', 'increase', 'decrease')
+URBAN_CLASSES = ('none', 'construction', 'demolition')
+CHANGE_TYPES = ('vegetation_increase', 'vegetation_decrease', 'urban_construction', 'urban_demolition')
+
+
+def _class_counts(labels, classes, n_labels):
+    """(n_labels, 3) pixel count of each class per label, from one bincount"""
+    return np.bincount(labels * 3 + classes, minlength=n_labels * 3).reshape(n_labels, 3)
+
+
+def _ring(points, transform, decimals):
+    """Closed [[x, y], ...] ring from (n, 2) pixel-edge coordinates of the crop"""
+    points = points.astype(np.float64)
+    xs = transform.a * points[:, 0] + transform.b * points[:, 1] + transform.c
+    ys = transform.d * points[:, 0] + transform.e * points[:, 1] + transform.f
+    ring = np.round(np.stack([xs, ys], axis=1), decimals).tolist()
+    ring.append(ring[0])
+    return ring
+
+
+def _edge_outline(contour, simplify):
+    """
+    Pixel-edge vertices of a contour traced on the 2x upsampled mask
+
+    Every pixel is a 2x2 block there, so the traced border pixels sit on both
+    sides of each pixel edge and ceil(u / 2) is the edge they belong to.
+    """
+    points = (contour.reshape(-1, 2) + 1) // 2
+    points = points[np.any(points != np.roll(points, 1, axis=0), axis=1)]
+    if simplify > 0 and len(points) >= 3:
+        points = cv2.approxPolyDP(points.reshape(-1, 1, 2), simplify, True).reshape(-1, 2)
+    return points
+
+
+def _polygon(region_mask, transform, simplify, decimals):
+    """
+    GeoJSON geometry of one region, outlined along pixel edges so it covers
+    exactly the region's pixels (its area matches the region's area_km2)
+
+    Args:
+        region_mask: (h, w) uint8 crop of the region's bounding box (1 = region)
+        transform: Affine from crop pixels to output coordinates
+        simplify: Douglas-Peucker tolerance in pixels (0 = keep every vertex)
+        decimals: Coordinate rounding
+    """
+    upsampled = np.repeat(np.repeat(region_mask, 2, axis=0), 2, axis=1)
+    contours, hierarchy = cv2.findContours(upsampled, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    outlines = [_edge_outline(contour, simplify) for contour in contours]
+
+    # RETR_CCOMP: top-level contours are outlines, their children are holes
+    polygons = {}
+    for i, outline in enumerate(outlines):
+        if hierarchy[0][i][3] < 0 and len(outline) >= 3:
+            polygons[i] = [_ring(outline, transform, decimals)]
+    for i, outline in enumerate(outlines):
+        parent = hierarchy[0][i][3]
+        if parent in polygons and len(outline) >= 3:
+            polygons[parent].append(_ring(outline, transform, decimals))
+
+    if not polygons:
+        # Small regions can collapse under simplification: fall back to the box
+        h, w = region_mask.shape
+        box = np.array([[0, 0], [w, 0], [w, h], [0, h]])
+        return {'type': 'Polygon', 'coordinates': [_ring(box, transform, decimals)]}
+    if len(polygons) == 1:
+        return {'type': 'Polygon', 'coordinates': next(iter(polygons.values()))}
+    return {'type': 'MultiPolygon', 'coordinates': list(polygons.values())}
+
+
+def extract_change_regions(change_map, vegetation_map, urban_map, transform=None, crs=None,
+                           threshold=None, min_pixels=None, simplify=None, decimals=None):
+    """
+    Connected change regions as a GeoJSON FeatureCollection
+
+    Args:
+        change_map: (H, W) change probability
+        vegetation_map, urban_map: (3, H, W) class scores
+        transform: Affine from map pixels to output coordinates (default: pixel
+                   coordinates of the map; pass the window transform for ROI crops)
+        crs: CRS string recorded in the collection, if georeferenced
+        threshold: Change probability threshold (default config.CHANGE_THRESHOLD)
+        min_pixels: Smallest region kept (default config.REGION_MIN_PIXELS)
+        simplify: Outline tolerance in pixels (default config.REGION_SIMPLIFY_PIXELS)
+        decimals: Coordinate rounding (default config.REGION_COORD_DECIMALS)
+
+    Returns:
+        FeatureCollection dict, features sorted by area (largest first)
+    """
+    threshold = config.CHANGE_THRESHOLD if threshold is None else threshold
+    min_pixels = config.REGION_MIN_PIXELS if min_pixels is None else min_pixels
+    simplify = config.REGION_SIMPLIFY_PIXELS if simplify is None else simplify
+    decimals = config.REGION_COORD_DECIMALS if decimals is None else decimals
+    transform = transform or Affine.identity()
+
+    changed = change_map > threshold
+    n_labels, labels, stats, _ = cv2.connectedComponentsWithStats(
+        changed.view(np.uint8), connectivity=8, ltype=cv2.CV_32S
+    )
+    areas = stats[:, cv2.CC_STAT_AREA]
+    keep = np.flatnonzero(areas[1:] >= max(min_pixels, 1)) + 1
+
+    collection = {'type': 'FeatureCollection', 'features': []}
+    if crs:
+        collection['crs'] = {'type': 'name', 'properties': {'name': crs}}
+    if not len(keep):
+        return collection
+
+    # Per-region class counts and mean probability over the changed pixels only
+    region_labels = labels[changed]
+    vegetation_counts = _class_counts(region_labels, np.argmax(vegetation_map[:, changed], axis=0), n_labels)
+    urban_counts = _class_counts(region_labels, np.argmax(urban_map[:, changed], axis=0), n_labels)
+    probability_sums = np.bincount(region_labels, weights=change_map[changed], minlength=n_labels)
+    del region_labels
+
+    for label in keep[np.argsort(-areas[keep], kind='stable')]:
+        x, y, w, h = (int(v) for v in stats[label, :4])
+        pixels = int(areas[label])
+        region_mask = (labels[y:y + h, x:x + w] == label).view(np.uint8)
+        geometry = _polygon(region_mask, transform * Affine.translation(x, y), simplify, decimals)
+
+        corners = [transform * (cx, cy) for cx in (x, x + w) for cy in (y, y + h)]
+        bbox = [min(c[0] for c in corners), min(c[1] for c in corners),
+                max(c[0] for c in corners), max(c[1] for c in corners)]
+
+        vegetation, urban = vegetation_counts[label], urban_counts[label]
+        type_counts = (vegetation[1], vegetation[2], urban[1], urban[2])
+        dominant = CHANGE_TYPES[int(np.argmax(type_counts))] if max(type_counts) > 0 else 'unclassified'
+
+        collection['features'].append({
+            'type': 'Feature',
+            'id': len(collection['features']) + 1,
+            'bbox': [round(v, decimals) for v in bbox],
+            'geometry': geometry,
+            'properties': {
+                'pixels': pixels,
+                'area_km2': round(pixels * config.PIXEL_AREA_KM2, 6),
+                'pixel_bbox': [x, y, x + w, y + h],
+                'mean_change_probability': round(float(probability_sums[label] / pixels), 4),
+                'vegetation_class': VEGETATION_CLASSES[int(np.argmax(vegetation))],
+                'urban_class': URBAN_CLASSES[int(np.argmax(urban))],
+                'dominant_change': dominant
+            }
+        })
+    return collection
+
+
+def summarize_regions(collection):
+    """Compact report section for a region collection"""
+    features = collection['features']
+    by_change = {}
+    for feature in features:
+        change = feature['properties']['dominant_change']
+        by_change[change] = by_change.get(change, 0) + 1
+    return {
+        'count': len(features),
+        'total_area_km2': float(sum(f['properties']['area_km2'] for f in features)),
+        'largest_area_km2': features[0]['properties']['area_km2'] if features else 0.0,
+        'by_dominant_change': by_change
+    }
+
+
+def write_geojson(collection, output_path):
+    with open(output_path, 'w') as f:
+        json.dump(collection, f, separators=(',', ':'))
@@ -19,6 +19,51 @@ NUM_EPOCHS = 50
 LEARNING_RATE = 0.0001
 NUM_WORKERS = 4
 
+# Training engine
+GRAD_ACCUM_STEPS = 1  # Effective batch size = BATCH_SIZE * GRAD_ACCUM_STEPS
+# Opt-in per run (e.g. AMP_DTYPE=bf16 CHANNELS_LAST=1 python train.py); the defaults keep fp32 baseline numerics
+AMP_DTYPE = os.getenv('AMP_DTYPE') or None  # 'bf16' for autocast (CPU or CUDA), None for fp32
+CHANNELS_LAST = os.getenv('CHANNELS_LAST', '0') == '1'
+LOG_INTERVAL = 10  # Steps between host syncs for loss logging
+
+# Data pipeline
+PERSISTENT_WORKERS = True
+PREFETCH_FACTOR = 4  # Batches prefetched per worker
+DATASET_HANDLE_CACHE = 26  # Open rasterio band files per worker (13 bands x 2 dates)
+DATASET_STACK_CACHE = 4  # Decoded (13, H, W) stacks per worker
+
+# Patch sampling: many random crops per decoded city per epoch (opt-in: PATCH_SAMPLING=1 python train.py).
+# Decodes every city into RAM up front and bypasses the per-worker raster/stack caches above
+PATCH_SAMPLING = os.getenv('PATCH_SAMPLING', '0') == '1'
+PATCHES_PER_CITY = 64
+PATCH_GRID = 4  # Crops are stratified over a PATCH_GRID x PATCH_GRID grid
+PATCH_MMAP_DIR = None  # e.g. "cache/scenes" to memory-map decoded scenes instead of keeping them resident
+
+# Run flips/rot90 on whole (B, 13, H, W) batches after collation instead of per sample
+# (opt-in: BATCH_AUGMENT=1); random crops stay in the DataLoader workers either way
+BATCH_AUGMENT = os.getenv('BATCH_AUGMENT', '0') == '1'
+
+# Tiled inference / evaluation
+TILE_SIZE = 512
+TILE_OVERLAP = 32
+TILE_BATCH_SIZE = 4
+# Run the three task heads as one wide + grouped conv stack at inference (opt-in: FUSED_HEADS=1;
+# checked against the per-head path when fused). The per-head path stays the reference
+FUSED_HEADS = os.getenv('FUSED_HEADS', '0') == '1'
+
+# Validity masking: no-data pixels and clouds are left out of inference and statistics
+CLOUD_MASKING = True  # Never applied to band stacks synthesized from RGB uploads
+CLOUD_CIRRUS_THRESHOLD = 0.03  # B10 reflectance above which a pixel is cirrus
+CLOUD_BRIGHTNESS_THRESHOLD = 0.25  # B01 and B02 reflectance above which a pixel is thick cloud
+
+# Coarse-to-fine inference: run the model only on tiles with spectral change
+COARSE_TO_FINE = os.getenv('COARSE_TO_FINE', '0') == '1'
+PREFILTER_DELTA = 0.1  # |NDVI/NDBI/NDWI change| that makes a pixel a change candidate
+PREFILTER_MIN_PIXELS = 16  # Tiles with fewer candidate pixels are skipped
+# Also run dense inference and report how far the coarse-to-fine maps diverge (doubles the cost)
+COARSE_TO_FINE_VALIDATE = os.getenv('COARSE_TO_FINE_VALIDATE', '0') == '1'
+EVAL_ON_SAVE = False  # Evaluate on TEST_CITIES whenever train.py saves a checkpoint
+
 # Sentinel-2 band information
 BAND_NAMES = ['B01', 'B02', 'B03', 'B04', 'B05', 'B06', 'B07', 
               'B08', 'B09', 'B10', 'B11', 'B12', 'B8A']
@@ -32,6 +77,55 @@ URBAN_BANDS = [11, 7, 3]  # B12 (SWIR), B08 (NIR), B04 (Red)
 CHANGE_THRESHOLD = 0.5
 VEGETATION_THRESHOLD = 0.3
 URBAN_THRESHOLD = 0.4
+# Spectral-index change (NDVI/NDBI/NDWI difference) counted as increase/decrease,
+# shared by the scene report and the per-zone statistics
+INDEX_CHANGE_THRESHOLD = 0.1
+PIXEL_AREA_KM2 = 100 / 1e6  # 10 m Sentinel-2 pixels
+
+# Change-region vectorization (GeoJSON polygons of connected changed pixels)
+REGION_MIN_PIXELS = 25  # Smaller specks are dropped (25 px = 0.0025 km² at 10 m)
+REGION_SIMPLIFY_PIXELS = 1.0  # Douglas-Peucker outline tolerance; 0 keeps every vertex
+REGION_COORD_DECIMALS = 6
+
+# Storage retention for API uploads/results
+STORAGE_MAX_AGE_DAYS = 30
+STORAGE_MAX_TOTAL_GB = 20
+STORAGE_COMPRESS_AFTER_DAYS = 7
+STORAGE_SWEEP_INTERVAL_MINUTES = 60
+STORAGE_KEEP_RAW_BANDS = False  # Keep the 26 input .tif files after analysis
+
+# LLM explanation cache (LLM_CACHE_ENABLED=0 for load tests, so every analysis reaches Gemini)
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', '1') == '1'
+LLM_CACHE_PATH = str(BASE_DIR / "cache" / "llm_explanations.db")
+LLM_CACHE_TTL_HOURS = 24 * 7
+LLM_CACHE_MAX_ENTRIES = 1000
+LLM_CACHE_PRECISION = None  # e.g. 0.1 to share entries between near-identical metrics
+
+# Async LLM client (API server)
+LLM_MAX_CONCURRENCY = 4
+LLM_BREAKER_FAILURES = 3  # Consecutive overload errors before skipping Gemini
+LLM_BREAKER_RESET_SECONDS = 60
+# Alternative Gemini endpoint, e.g. the local stand-in from fake_gemini.py for load tests
+LLM_BASE_URL = os.getenv('GEMINI_BASE_URL')
+
+# Time series: |NDVI/NDBI/NDWI slope| per year above which a pixel counts as trending
+TREND_SLOPE_THRESHOLD = 0.05
+
+# Encoder features kept per scene, so one reference image compared against K dates is encoded once.
+# Off for the API (single-pair requests never reuse features, and each worker would pin its own copy);
+# predict.py enables it for several --img2 folders and --series
+FEATURE_CACHE_MB = 0
+CLI_FEATURE_CACHE_MB = 1024
+
+# Out-of-process inference (API server): 0 = run the model inside the API process
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', '0'))
+INFERENCE_WORKER_START_TIMEOUT = 300  # Seconds to wait for workers to load the model
+INFERENCE_LIVENESS_INTERVAL = 5  # Seconds between worker liveness checks while a job waits
+
+# Memory instrumentation: per-stage peaks in reports and /api/debug/memory (adds overhead)
+MEMORY_PROFILING = os.getenv('MEMORY_PROFILING', '0') == '1'
+MEMORY_TRACE_FRAMES = 1  # tracemalloc traceback depth
+MEMORY_TOP_ALLOCATIONS = 20
 
 # Output directories
 OUTPUT_DIR = "outputs"
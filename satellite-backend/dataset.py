@@ -1,12 +1,14 @@
 """Dataset loader for Onera Satellite Change Detection"""
 
 import os
+import time
 import numpy as np
 import warnings
+from collections import OrderedDict
 import rasterio
 from rasterio.errors import NotGeoreferencedWarning
 import torch
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, DataLoader, Sampler
 import albumentations as A
 from albumentations.pytorch import ToTensorV2
 import config
@@ -15,13 +17,52 @@ import config
 warnings.filterwarnings('ignore', category=NotGeoreferencedWarning)
 
 class OneraDataset(Dataset):
-    def __init__(self, cities, root_dir, transform=None, use_rect=True):
+    def __init__(self, cities, root_dir, transform=None, use_rect=True,
+                 handle_cache_size=None, stack_cache_size=None):
+        """
+        Args:
+            handle_cache_size: Open rasterio datasets kept per worker (default: config.DATASET_HANDLE_CACHE)
+            stack_cache_size: Decoded (13, H, W) stacks kept per worker (default: config.DATASET_STACK_CACHE)
+        
+        Each DataLoader worker gets its own copy of the dataset and therefore its
+        own caches; with persistent workers they survive across epochs.
+        """
         self.cities = cities
         self.root_dir = root_dir
         self.transform = transform
         self.use_rect = use_rect
+        self.handle_cache_size = (config.DATASET_HANDLE_CACHE if handle_cache_size is None
+                                  else handle_cache_size)
+        self.stack_cache_size = (config.DATASET_STACK_CACHE if stack_cache_size is None
+                                 else stack_cache_size)
+        self._handles = OrderedDict()
+        self._stacks = OrderedDict()
         self.samples = self._load_samples()
     
+    def __getstate__(self):
+        # Open rasterio handles can't be pickled to worker processes; workers start empty
+        state = self.__dict__.copy()
+        state['_handles'] = OrderedDict()
+        state['_stacks'] = OrderedDict()
+        return state
+    
+    def _open(self, band_path):
+        """Return an open rasterio dataset, reusing it from the per-worker LRU cache"""
+        if self.handle_cache_size <= 0:
+            return rasterio.open(band_path)
+        
+        src = self._handles.get(band_path)
+        if src is not None:
+            self._handles.move_to_end(band_path)
+            return src
+        
+        src = rasterio.open(band_path)
+        self._handles[band_path] = src
+        if len(self._handles) > self.handle_cache_size:
+            _, evicted = self._handles.popitem(last=False)
+            evicted.close()
+        return src
+    
     def _load_samples(self):
         samples = []
         for city in self.cities:
@@ -37,7 +78,22 @@ class OneraDataset(Dataset):
         return samples
     
     def _load_bands(self, city, time_idx):
-        """Load all 13 bands for a given city and time"""
+        """Load all 13 bands for a given city and time, via the decoded-stack cache"""
+        key = (city, time_idx)
+        stack = self._stacks.get(key)
+        if stack is not None:
+            self._stacks.move_to_end(key)
+            return stack
+        
+        stack = self._decode_bands(city, time_idx)
+        if self.stack_cache_size > 0:
+            self._stacks[key] = stack
+            if len(self._stacks) > self.stack_cache_size:
+                self._stacks.popitem(last=False)
+        return stack
+    
+    def _decode_bands(self, city, time_idx):
+        """Read and normalize all 13 bands from disk"""
         folder = f"imgs_{time_idx}_rect" if self.use_rect else f"imgs_{time_idx}"
         
         # Try nested folder structure first
@@ -49,11 +105,13 @@ class OneraDataset(Dataset):
         bands = []
         for band_name in config.BAND_NAMES:
             band_path = os.path.join(city_path, f"{band_name}.tif")
-            with rasterio.open(band_path) as src:
-                band_data = src.read(1).astype(np.float32)
-                # Normalize to 0-1 range
-                band_data = np.clip(band_data / 10000.0, 0, 1)
-                bands.append(band_data)
+            src = self._open(band_path)
+            band_data = src.read(1).astype(np.float32)
+            if self.handle_cache_size <= 0:
+                src.close()
+            # Normalize to 0-1 range
+            band_data = np.clip(band_data / 10000.0, 0, 1)
+            bands.append(band_data)
         
         return np.stack(bands, axis=0)  # Shape: (13, H, W)
     
@@ -62,10 +120,12 @@ class OneraDataset(Dataset):
     
     def __getitem__(self, idx):
         city = self.samples[idx]
+        start_time = time.perf_counter()
         
         # Load before and after images
         img1 = self._load_bands(city, 1)
         img2 = self._load_bands(city, 2)
+        load_time = time.perf_counter() - start_time
         
         # Apply transformations
         if self.transform:
@@ -83,10 +143,199 @@ class OneraDataset(Dataset):
         return {
             'img1': img1,
             'img2': img2,
-            'city': city
+            'city': city,
+            'load_time': load_time,
+            'transform_time': time.perf_counter() - start_time - load_time
+        }
+
+class PatchDataset(OneraDataset):
+    """Patch-level view of the Onera cities
+
+    Every city is decoded exactly once, either kept resident in memory or written
+    to ``mmap_dir`` as .npy and memory-mapped (shared between workers through the
+    page cache). Items are ``(city_idx, y, x)`` crop origins, normally produced by
+    StratifiedPatchSampler; plain integer indices pick a random crop of city
+    ``idx % num_cities``.
+    """
+    def __init__(self, cities, root_dir, transform=None, use_rect=True, patch_size=None,
+                 patches_per_city=None, mmap_dir=None):
+        super().__init__(cities, root_dir, transform=transform, use_rect=use_rect,
+                         handle_cache_size=0, stack_cache_size=0)
+        self.patch_size = patch_size or config.IMG_SIZE
+        self.patches_per_city = patches_per_city or config.PATCHES_PER_CITY
+        self.mmap_dir = mmap_dir
+        self.scenes = [self._decode_scene(city) for city in self.samples]
+        # Both dates are cropped at the same origin, so only the common extent is usable
+        self.scene_shapes = [
+            (min(img1.shape[1], img2.shape[1]), min(img1.shape[2], img2.shape[2]))
+            for img1, img2 in self.scenes
+        ]
+    
+    def _decode_scene(self, city):
+        if self.mmap_dir is None:
+            return self._decode_bands(city, 1), self._decode_bands(city, 2)
+        
+        os.makedirs(self.mmap_dir, exist_ok=True)
+        scene = []
+        for time_idx in (1, 2):
+            path = os.path.join(self.mmap_dir, f"{city}_{time_idx}{'_rect' if self.use_rect else ''}.npy")
+            if not os.path.exists(path):
+                tmp_path = path + '.tmp.npy'
+                np.save(tmp_path, self._decode_bands(city, time_idx))
+                os.replace(tmp_path, path)
+            scene.append(np.load(path, mmap_mode='r'))
+        return tuple(scene)
+    
+    def __getstate__(self):
+        state = super().__getstate__()
+        if self.mmap_dir is not None:
+            # Pickling a memmap copies its data; workers reopen the .npy files instead
+            state['scenes'] = None
+        return state
+    
+    def __len__(self):
+        return len(self.samples) * self.patches_per_city
+    
+    def __getitem__(self, idx):
+        if isinstance(idx, (tuple, list)):
+            city_idx, y, x = idx
+        else:
+            city_idx = idx % len(self.samples)
+            h, w = self.scene_shapes[city_idx]
+            # torch's RNG is reseeded per worker, numpy's global RNG is not
+            y = int(torch.randint(0, max(h - self.patch_size, 0) + 1, ()))
+            x = int(torch.randint(0, max(w - self.patch_size, 0) + 1, ()))
+        
+        start_time = time.perf_counter()
+        if self.scenes is None:
+            self.scenes = [self._decode_scene(city) for city in self.samples]
+        img1_full, img2_full = self.scenes[city_idx]
+        window = (slice(None), slice(y, y + self.patch_size), slice(x, x + self.patch_size))
+        # Copy the window out so memory-mapped scenes aren't referenced by the batch
+        img1 = np.ascontiguousarray(img1_full[window], dtype=np.float32)
+        img2 = np.ascontiguousarray(img2_full[window], dtype=np.float32)
+        load_time = time.perf_counter() - start_time
+        
+        if self.transform:
+            transformed = self.transform(image=np.transpose(img1, (1, 2, 0)),
+                                         image2=np.transpose(img2, (1, 2, 0)))
+            img1 = transformed['image']
+            img2 = transformed['image2']
+        else:
+            img1 = torch.from_numpy(img1)
+            img2 = torch.from_numpy(img2)
+        
+        return {
+            'img1': img1,
+            'img2': img2,
+            'city': self.samples[city_idx],
+            'load_time': load_time,
+            'transform_time': time.perf_counter() - start_time - load_time
         }
 
-def get_transforms(train=True):
+class StratifiedPatchSampler(Sampler):
+    """Draws patches_per_city crops per city per epoch, stratified over a spatial grid
+
+    Each city is split into grid x grid cells; crops cycle through the cells in a
+    shuffled order and the crop origin is uniform within its cell, so every part
+    of a scene is visited each epoch. Call set_epoch() for a new draw.
+    """
+    def __init__(self, dataset, patches_per_city=None, grid=None, shuffle=True, seed=0,
+                 num_replicas=1, rank=0):
+        self.dataset = dataset
+        self.patches_per_city = patches_per_city or dataset.patches_per_city
+        self.grid = grid or config.PATCH_GRID
+        self.shuffle = shuffle
+        self.seed = seed
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.epoch = 0
+    
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+    
+    def _origins(self, rng, city_idx):
+        h, w = self.dataset.scene_shapes[city_idx]
+        size = self.dataset.patch_size
+        max_y, max_x = max(h - size, 0), max(w - size, 0)
+        
+        # Cell edges in origin space
+        y_edges = np.linspace(0, max_y + 1, self.grid + 1).astype(int)
+        x_edges = np.linspace(0, max_x + 1, self.grid + 1).astype(int)
+        cells = rng.permutation(self.grid * self.grid)
+        cell_ids = np.resize(cells, self.patches_per_city)
+        
+        gy, gx = np.divmod(cell_ids, self.grid)
+        low_y, high_y = y_edges[gy], np.maximum(y_edges[gy + 1], y_edges[gy] + 1)
+        low_x, high_x = x_edges[gx], np.maximum(x_edges[gx + 1], x_edges[gx] + 1)
+        ys = rng.integers(low_y, high_y)
+        xs = rng.integers(low_x, high_x)
+        return [(city_idx, int(y), int(x)) for y, x in zip(ys, xs)]
+    
+    def _all_items(self):
+        rng = np.random.default_rng(self.seed + self.epoch)
+        items = []
+        for city_idx in range(len(self.dataset.samples)):
+            items.extend(self._origins(rng, city_idx))
+        if self.shuffle:
+            order = rng.permutation(len(items))
+            items = [items[i] for i in order]
+        return items
+    
+    def __iter__(self):
+        # Every rank draws the same list (same seed) and takes its own stride;
+        # pad to a multiple of num_replicas so all ranks run the same number of steps
+        items = self._all_items()
+        padding = len(self) * self.num_replicas - len(items)
+        items += items[:padding]
+        return iter(items[self.rank::self.num_replicas])
+    
+    def __len__(self):
+        total = len(self.dataset.samples) * self.patches_per_city
+        return (total + self.num_replicas - 1) // self.num_replicas
+
+def get_patch_transforms():
+    """Flips and 90° rotations only; PatchDataset has already cropped"""
+    return A.Compose([
+        A.HorizontalFlip(p=0.5),
+        A.VerticalFlip(p=0.5),
+        A.RandomRotate90(p=0.5),
+        ToTensorV2()
+    ], additional_targets={'image2': 'image'})
+
+def get_dataloader(dataset, batch_size=None, shuffle=True, sampler=None, num_workers=None,
+                   drop_last=False):
+    """
+    Build a DataLoader with the throughput settings from config
+    
+    Workers are persistent (no restart per epoch, so per-worker caches stay warm),
+    prefetch PREFETCH_FACTOR batches each, and pin memory when CUDA is available.
+    """
+    num_workers = config.NUM_WORKERS if num_workers is None else num_workers
+    kwargs = {}
+    if num_workers > 0:
+        kwargs['persistent_workers'] = config.PERSISTENT_WORKERS
+        kwargs['prefetch_factor'] = config.PREFETCH_FACTOR
+    
+    return DataLoader(
+        dataset,
+        batch_size=batch_size or config.BATCH_SIZE,
+        shuffle=shuffle if sampler is None else False,
+        sampler=sampler,
+        num_workers=num_workers,
+        pin_memory=torch.cuda.is_available(),
+        drop_last=drop_last,
+        **kwargs
+    )
+
+def get_transforms(train=True, batch_augment=False):
+    if train and batch_augment:
+        # Flips/rotations happen later on the collated batch (augmentation.BatchAugment);
+        # the crop stays here so samples of different scene sizes can be collated
+        return A.Compose([
+            A.RandomCrop(config.IMG_SIZE, config.IMG_SIZE),
+            ToTensorV2()
+        ], additional_targets={'image2': 'image'})
     if train:
         return A.Compose([
             A.RandomCrop(config.IMG_SIZE, config.IMG_SIZE),
@@ -100,3 +349,26 @@ def get_transforms(train=True):
             A.CenterCrop(config.IMG_SIZE, config.IMG_SIZE),
             ToTensorV2()
         ], additional_targets={'image2': 'image'})
+
+class SyntheticDataset(Dataset):
+    """Random 13-band image pairs with the same sample layout as OneraDataset
+
+    Used for benchmarking training throughput without the Onera download.
+    """
+    def __init__(self, num_samples=64, img_size=None, in_channels=13, seed=0):
+        self.num_samples = num_samples
+        self.img_size = img_size or config.IMG_SIZE
+        self.in_channels = in_channels
+        self.seed = seed
+    
+    def __len__(self):
+        return self.num_samples
+    
+    def __getitem__(self, idx):
+        generator = torch.Generator().manual_seed(self.seed + idx)
+        shape = (self.in_channels, self.img_size, self.img_size)
+        return {
+            'img1': torch.rand(shape, generator=generator),
+            'img2': torch.rand(shape, generator=generator),
+            'city': f"synthetic_{idx}"
+        }
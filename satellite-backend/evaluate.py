@@ -0,0 +1,218 @@
+"""Evaluation on the Onera test cities: change-map quality and inference speed"""
+
+import os
+import json
+import time
+import numpy as np
+import rasterio
+import torch
+from PIL import Image
+from datetime import datetime
+import config
+from dataset import OneraDataset
+from model import ChangeDetectionModel
+from tiling import run_tiled_inference
+from memory_tracker import peak_rss_mb, reset_peak_rss
+
+LABEL_FOLDERS = [
+    'Onera Satellite Change Detection dataset - Test Labels',
+    'Onera Satellite Change Detection dataset - Train Labels',
+    '',
+]
+
+
+def load_change_label(root_dir, city):
+    """
+    Load the binary ground-truth change map for a city
+
+    Onera ships ``cm/<city>-cm.tif`` (1 = no change, 2 = change) and
+    ``cm/cm.png`` (white = change); either is accepted.
+    """
+    for folder in LABEL_FOLDERS:
+        cm_dir = os.path.join(root_dir, folder, city, 'cm')
+        tif_path = os.path.join(cm_dir, f"{city}-cm.tif")
+        if os.path.exists(tif_path):
+            with rasterio.open(tif_path) as src:
+                return src.read(1) > 1
+        png_path = os.path.join(cm_dir, 'cm.png')
+        if os.path.exists(png_path):
+            label = np.array(Image.open(png_path).convert('L'))
+            return label > 127
+    return None
+
+
+def confusion(pred, label):
+    """Return (tp, fp, fn, tn) for boolean prediction and label maps"""
+    tp = int(np.count_nonzero(pred & label))
+    fp = int(np.count_nonzero(pred & ~label))
+    fn = int(np.count_nonzero(~pred & label))
+    tn = int(pred.size - tp - fp - fn)
+    return tp, fp, fn, tn
+
+
+def change_metrics(tp, fp, fn, tn):
+    """Precision, recall, F1, IoU, overall accuracy and Cohen's kappa for the change class"""
+    total = tp + fp + fn + tn
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    iou = tp / (tp + fp + fn) if tp + fp + fn else 0.0
+    accuracy = (tp + tn) / total if total else 0.0
+    expected = ((tp + fp) * (tp + fn) + (fn + tn) * (fp + tn)) / (total * total) if total else 0.0
+    kappa = (accuracy - expected) / (1 - expected) if expected < 1 else 0.0
+    return {
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'iou': iou,
+        'overall_accuracy': accuracy,
+        'kappa': kappa
+    }
+
+
+def load_model(checkpoint_path, device):
+    model = ChangeDetectionModel(in_channels=13).to(device)
+    checkpoint = torch.load(checkpoint_path, map_location=device)
+    model.load_state_dict(checkpoint['model_state_dict'])
+    model.eval()
+    if config.FUSED_HEADS:
+        model.fuse_heads()
+    return model, checkpoint
+
+
+def evaluate(model, device, cities=None, root_dir=None, tile_size=None, overlap=None,
+             threshold=None):
+    """
+    Run tiled inference over the test cities and score the change maps
+
+    Returns:
+        Dictionary with per-city metrics/latency and aggregate results
+    """
+    cities = cities or config.TEST_CITIES
+    root_dir = root_dir or config.DATASET_ROOT
+    threshold = config.CHANGE_THRESHOLD if threshold is None else threshold
+
+    dataset = OneraDataset(cities, root_dir, transform=None, stack_cache_size=0)
+    per_city = {}
+    totals = np.zeros(4, dtype=np.int64)
+    total_pixels = 0
+    total_inference = 0.0
+    peak_rss = peak_rss_mb()
+
+    for city in dataset.samples:
+        label = load_change_label(root_dir, city)
+        if label is None:
+            print(f"⚠️  No change label for {city}, skipping")
+            continue
+
+        # Per-city peak where the kernel supports resetting it, otherwise the process maximum so far
+        peak_is_per_city = reset_peak_rss()
+        load_start = time.perf_counter()
+        bands1 = dataset._load_bands(city, 1)
+        bands2 = dataset._load_bands(city, 2)
+        load_time = time.perf_counter() - load_start
+
+        infer_start = time.perf_counter()
+        # Only the change map is scored, so the vegetation/urban heads are not run
+        outputs = run_tiled_inference(model, bands1, bands2, device, tile_size, overlap, heads=('change',))
+        inference_time = time.perf_counter() - infer_start
+
+        change_map = outputs['change']
+        h = min(change_map.shape[0], label.shape[0])
+        w = min(change_map.shape[1], label.shape[1])
+        pred = change_map[:h, :w] > threshold
+        counts = confusion(pred, label[:h, :w])
+        totals += counts
+        pixels = change_map.size
+        total_pixels += pixels
+        total_inference += inference_time
+
+        per_city[city] = {
+            **change_metrics(*counts),
+            'confusion': dict(zip(('tp', 'fp', 'fn', 'tn'), counts)),
+            'height': int(change_map.shape[0]),
+            'width': int(change_map.shape[1]),
+            'load_seconds': load_time,
+            'inference_seconds': inference_time,
+            'pixels_per_second': pixels / inference_time if inference_time > 0 else 0.0,
+            'peak_rss_mb': peak_rss_mb(),
+            'peak_rss_scope': 'city' if peak_is_per_city else 'process'
+        }
+        if per_city[city]['peak_rss_mb'] is not None:
+            peak_rss = max(peak_rss or 0.0, per_city[city]['peak_rss_mb'])
+        print(f"  {city}: F1 {per_city[city]['f1']:.3f}, IoU {per_city[city]['iou']:.3f}, "
+              f"{inference_time:.2f}s ({per_city[city]['pixels_per_second'] / 1e6:.2f} Mpx/s)")
+
+    return {
+        'cities': per_city,
+        'aggregate': {
+            **change_metrics(*(int(v) for v in totals)),
+            'num_cities': len(per_city),
+            'total_pixels': total_pixels,
+            'inference_seconds': total_inference,
+            'pixels_per_second': total_pixels / total_inference if total_inference > 0 else 0.0,
+            'peak_rss_mb': peak_rss
+        }
+    }
+
+
+def evaluate_checkpoint(checkpoint_path, output_path=None, device=None, **kwargs):
+    """Evaluate one checkpoint and write the results JSON next to it (or to output_path)"""
+    device = device or torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    model, checkpoint = load_model(checkpoint_path, device)
+
+    print(f"Evaluating {checkpoint_path} on {len(kwargs.get('cities') or config.TEST_CITIES)} cities...")
+    results = evaluate(model, device, **kwargs)
+    results['checkpoint'] = {
+        'path': str(checkpoint_path),
+        'epoch': checkpoint.get('epoch'),
+        'train_loss': checkpoint.get('loss')
+    }
+    results['settings'] = {
+        'device': str(device),
+        'tile_size': kwargs.get('tile_size') or config.TILE_SIZE,
+        'tile_overlap': config.TILE_OVERLAP if kwargs.get('overlap') is None else kwargs['overlap'],
+        'threshold': config.CHANGE_THRESHOLD if kwargs.get('threshold') is None else kwargs['threshold'],
+        'torch_threads': torch.get_num_threads()
+    }
+    results['evaluated_at'] = datetime.now().isoformat()
+
+    if output_path is None:
+        output_path = os.path.splitext(str(checkpoint_path))[0] + '_eval.json'
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=4)
+
+    agg = results['aggregate']
+    print(f"F1 {agg['f1']:.3f} | IoU {agg['iou']:.3f} | kappa {agg['kappa']:.3f} | "
+          f"{agg['pixels_per_second'] / 1e6:.2f} Mpx/s | peak RSS {agg['peak_rss_mb'] or 0:.0f} MB")
+    print(f"Results saved to: {output_path}")
+    return results
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Evaluate change detection checkpoints on TEST_CITIES')
+    parser.add_argument('--model', nargs='+', default=[os.path.join(config.MODEL_DIR, 'best_model.pth')],
+                        help='Checkpoint path(s)')
+    parser.add_argument('--output', help='Results JSON (only with a single checkpoint)')
+    parser.add_argument('--cities', nargs='+', help='Cities to evaluate (default: config.TEST_CITIES)')
+    parser.add_argument('--tile-size', type=int, help='Inference tile size')
+    parser.add_argument('--overlap', type=int, help='Tile overlap in pixels')
+    parser.add_argument('--threshold', type=float, help='Change probability threshold')
+
+    args = parser.parse_args()
+
+    for checkpoint_path in args.model:
+        evaluate_checkpoint(
+            checkpoint_path,
+            output_path=args.output if len(args.model) == 1 else None,
+            cities=args.cities,
+            tile_size=args.tile_size,
+            overlap=args.overlap,
+            threshold=args.threshold
+        )
+
+
+if __name__ == '__main__':
+    main()
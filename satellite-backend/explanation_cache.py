@@ -0,0 +1,117 @@
+"""
+Persistent cache for LLM explanations
+SQLite-backed, with TTL expiry and LRU eviction
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS explanations (
+    cache_key   TEXT PRIMARY KEY,
+    model       TEXT NOT NULL,
+    value       TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits        INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+class ExplanationCache:
+    """Stores parsed LLM explanations keyed by a hash of the prompt"""
+
+    def __init__(self, db_path, ttl_seconds=None, max_entries=1000):
+        """
+        Args:
+            db_path: Path to the SQLite database file (created if missing)
+            ttl_seconds: Entries older than this are treated as missing (None = never expire)
+            max_entries: Least recently used entries are evicted above this count
+        """
+        self.db_path = str(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_explanations_access ON explanations (last_access)"
+        )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(prompt, model):
+        """Hash the prompt and model name into a cache key"""
+        return hashlib.sha256(f"{model}\n{prompt}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached explanation dict, or None if missing/expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM explanations WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            value, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM explanations WHERE cache_key = ?", (key,))
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE explanations SET last_access = ?, hits = hits + 1 WHERE cache_key = ?",
+                (now, key)
+            )
+            self.hits += 1
+        return json.loads(value)
+
+    def put(self, key, model, explanations):
+        """Store an explanation dict and evict LRU entries above max_entries"""
+        now = time.time()
+        value = json.dumps(explanations)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO explanations (cache_key, model, value, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, model, value, now, now)
+                )
+                if self.ttl_seconds is not None:
+                    self._conn.execute(
+                        "DELETE FROM explanations WHERE created_at < ?", (now - self.ttl_seconds,)
+                    )
+                if self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM explanations WHERE cache_key IN ("
+                        "SELECT cache_key FROM explanations ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def stats(self):
+        """Return hit/miss counters and the number of stored entries"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM explanations").fetchone()[0]
+        return {'entries': entries, 'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM explanations")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,135 @@
+"""
+Local stand-in for the Gemini API, for load tests
+Answers generateContent calls with a canned report after a configurable
+delay and fails a configurable fraction of them with 503 UNAVAILABLE
+
+    python fake_gemini.py --port 8090 --latency 1.5 --jitter 0.5 --error-rate 0.1
+    GEMINI_API_KEY=fake GEMINI_BASE_URL=http://127.0.0.1:8090 python main.py
+"""
+
+import asyncio
+import random
+import threading
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+CANNED_RESPONSE = """EXECUTIVE SUMMARY
+Synthetic explanation produced by the local Gemini stand-in.
+
+DETAILED ANALYSIS
+Vegetation, urban and water metrics were received.
+
+ENVIRONMENTAL IMPACT
+Not assessed (load test).
+
+RECOMMENDATIONS
+1. Ignore this text; it only exercises the response path
+
+KEY INSIGHTS
+• Response generated by fake_gemini.py"""
+
+
+class FakeGemini:
+    """Latency / failure model plus request counters"""
+
+    def __init__(self, latency=1.0, jitter=0.0, error_rate=0.0, seed=None):
+        """
+        Args:
+            latency: Mean response time in seconds
+            jitter: Half-width of the uniform noise added to the latency
+            error_rate: Fraction of calls answered with 503 UNAVAILABLE
+            seed: Seed for reproducible latencies/failures
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, model):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+            fail = self.rng.random() < self.error_rate
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        if fail:
+            with self._lock:
+                self.errors += 1
+            return JSONResponse(status_code=503, content={'error': {
+                'code': 503,
+                'message': 'The model is overloaded. Please try again later.',
+                'status': 'UNAVAILABLE'
+            }})
+
+        return JSONResponse(content={
+            'candidates': [{
+                'content': {'role': 'model', 'parts': [{'text': CANNED_RESPONSE}]},
+                'finishReason': 'STOP',
+                'index': 0
+            }],
+            'usageMetadata': {'promptTokenCount': 0, 'candidatesTokenCount': 0, 'totalTokenCount': 0},
+            'modelVersion': model
+        })
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'latency': self.latency,
+                'jitter': self.jitter,
+                'error_rate': self.error_rate
+            }
+
+
+def create_app(fake):
+    app = FastAPI(title="Fake Gemini API")
+
+    @app.post("/{version}/models/{model_action}")
+    async def generate_content(version: str, model_action: str):
+        # Path is e.g. /v1beta/models/gemini-2.5-flash-lite:generateContent
+        model = model_action.split(':', 1)[0]
+        return await fake.handle(model)
+
+    @app.get("/stats")
+    async def stats():
+        return fake.stats()
+
+    return app
+
+
+def main():
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='Local Gemini stand-in for load tests')
+    parser.add_argument('--host', default='127.0.0.1', help='Bind address')
+    parser.add_argument('--port', type=int, default=8090, help='Port')
+    parser.add_argument('--latency', type=float, default=1.0, help='Mean response time (s)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Uniform latency noise (± s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of 503 responses')
+    parser.add_argument('--seed', type=int, help='Random seed')
+
+    args = parser.parse_args()
+
+    fake = FakeGemini(args.latency, args.jitter, args.error_rate, args.seed)
+    print(f"🧪 Fake Gemini on http://{args.host}:{args.port} "
+          f"(latency {args.latency}±{args.jitter}s, {args.error_rate:.0%} errors)")
+    uvicorn.run(create_app(fake), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+In-memory LRU cache of encoder features per scene
+Lets one reference acquisition be compared against many dates while
+running the encoder on it only once
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def scene_key(bands):
+    """Content hash of a decoded (13, H, W) band stack"""
+    bands = np.ascontiguousarray(bands)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{bands.shape}{bands.dtype}".encode('utf-8'))
+    digest.update(memoryview(bands).cast('B'))
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """Encoder outputs keyed by scene hash, evicted least recently used above a byte budget"""
+
+    def __init__(self, max_bytes):
+        """
+        Args:
+            max_bytes: Total size of cached feature tensors (a 1024x1024 scene
+                       takes 256 MB at 64 float32 channels)
+        """
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(features):
+        return features.element_size() * features.nelement()
+
+    def get(self, key):
+        """Return the cached feature tensor, or None"""
+        with self._lock:
+            features = self.entries.get(key)
+            if features is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return features
+
+    def put(self, key, features):
+        """Store a feature tensor; tensors larger than the whole budget are not cached"""
+        size = self._size(features)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self.entries:
+                self.bytes -= self._size(self.entries.pop(key))
+            self.entries[key] = features
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= self._size(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self.entries),
+                'mb': self.bytes / (1024 * 1024),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
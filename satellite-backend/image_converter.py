@@ -19,19 +19,15 @@ class ImageConverter:
         ext = os.path.splitext(filename.lower())[1]
         return ext in self.supported_formats
     
-    def convert_rgb_to_multispectral(self, rgb_image_path, output_folder):
+    def synthesize_bands(self, rgb_image_path):
         """
-        Convert RGB image (PNG/JPEG) to simulated 13-band format
-        
-        This creates synthetic bands based on RGB data for demonstration.
-        For real satellite analysis, use actual multi-band satellite imagery.
+        Build the simulated 13-band dictionary for an RGB image
         
         Args:
             rgb_image_path: Path to RGB image (PNG/JPEG)
-            output_folder: Where to save the 13 .tif files
         
         Returns:
-            List of created .tif file paths
+            Dictionary mapping band name to float32 array in 0-1 range
         """
         # Load RGB image
         img = Image.open(rgb_image_path)
@@ -69,6 +65,24 @@ class ImageConverter:
             'B8A': (1.0 - red) * 0.75,  # Narrow NIR
         }
         
+        return bands
+    
+    def convert_rgb_to_multispectral(self, rgb_image_path, output_folder):
+        """
+        Convert RGB image (PNG/JPEG) to simulated 13-band format
+        
+        This creates synthetic bands based on RGB data for demonstration.
+        For real satellite analysis, use actual multi-band satellite imagery.
+        
+        Args:
+            rgb_image_path: Path to RGB image (PNG/JPEG)
+            output_folder: Where to save the 13 .tif files
+        
+        Returns:
+            List of created .tif file paths
+        """
+        bands = self.synthesize_bands(rgb_image_path)
+        
         # Create output folder
         os.makedirs(output_folder, exist_ok=True)
         
@@ -97,7 +111,51 @@ class ImageConverter:
             created_files.append(output_path)
         
         return created_files
-    
+
+    def convert_rgb_to_stack(self, rgb_image_path, output_path):
+        """
+        Convert RGB image (PNG/JPEG) to a single stacked 13-band GeoTIFF
+
+        The file is written next to its final location and renamed into
+        place once complete, so a partially written stack is never visible
+        under ``output_path``.
+
+        Args:
+            rgb_image_path: Path to RGB image (PNG/JPEG)
+            output_path: Where to save the stacked .tif file
+
+        Returns:
+            Path of the created .tif file
+        """
+        bands = self.synthesize_bands(rgb_image_path)
+        stack = np.stack([
+            (band_data * 10000).astype(np.uint16) for band_data in bands.values()
+        ], axis=0)
+
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        tmp_path = output_path + '.part'
+        with rasterio.open(
+            tmp_path,
+            'w',
+            driver='GTiff',
+            height=stack.shape[1],
+            width=stack.shape[2],
+            count=stack.shape[0],
+            dtype=stack.dtype,
+            crs=None,
+            transform=None,
+            compress='deflate'
+        ) as dst:
+            dst.write(stack)
+            for idx, band_name in enumerate(bands.keys(), start=1):
+                dst.set_band_description(idx, band_name)
+
+        os.replace(tmp_path, output_path)
+        return output_path
+
     def process_user_images(self, before_image, after_image, temp_dir):
         """
         Process user-uploaded images (PNG/JPEG or TIF)
@@ -0,0 +1,337 @@
+"""
+Out-of-process inference workers with shared-memory array handoff
+The API process decodes band stacks straight into shared memory and sends
+only (name, shape, dtype) handles to a pool of worker processes, which run
+the model, the analyzer and matplotlib rendering outside the API's
+interpreter and write the output maps back into shared memory.
+"""
+
+import os
+import queue
+import threading
+import itertools
+from datetime import datetime
+import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+import config
+from predict import ChangeDetectionPredictor, band_shape, band_georef, load_bands
+from memory_tracker import MemoryTracker
+from roi import resolve_roi
+from zonal_stats import load_zones
+
+
+def create_shared(shape, dtype=np.float32):
+    """Allocate a shared-memory block; returns (SharedMemory, ndarray view, handle)"""
+    dtype = np.dtype(dtype)
+    size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    return shm, array, (shm.name, tuple(shape), dtype.str)
+
+
+def attach_shared(handle):
+    """Map a block created by another process; returns (SharedMemory, ndarray view)"""
+    name, shape, dtype = handle
+    shm = shared_memory.SharedMemory(name=name)
+    # Only the creating process unlinks; keep this process's tracker from claiming it too
+    try:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def release_shared(shm, unlink=False):
+    try:
+        shm.close()
+    except BufferError:
+        pass  # A view is still alive; the mapping goes away with the process
+    if unlink:
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def split_maps(maps):
+    """Views of a (7, H, W) output block as change / vegetation / urban maps"""
+    return {'change': maps[0], 'vegetation': maps[1:4], 'urban': maps[4:7]}
+
+
+def _worker_main(model_path, threads, tasks, results):
+    """Worker process: load the model once, then serve jobs until a None sentinel"""
+    import torch
+    torch.set_num_threads(threads)
+    predictor = ChangeDetectionPredictor(model_path, use_llm=False)
+    results.put(('ready', None, os.getpid()))
+
+    while True:
+        job = tasks.get()
+        if job is None:
+            break
+
+        job_id = job['job_id']
+        results.put(('started', job_id, os.getpid()))
+        blocks = []
+        try:
+            shm1, bands1 = attach_shared(job['bands1'])
+            shm2, bands2 = attach_shared(job['bands2'])
+            shm_out, maps = attach_shared(job['maps'])
+            blocks = [shm1, shm2, shm_out]
+            zones = None
+            if job['zones'] is not None:
+                shm_zones, zones = attach_shared(job['zones'])
+                blocks.append(shm_zones)
+
+            report = predictor.predict_bands(
+                bands1, bands2, **job['kwargs'], zones=zones,
+                generate_llm=False,
+                on_event=lambda name, data: results.put(('event', job_id, (name, data))),
+                maps_out=split_maps(maps)
+            )
+            del bands1, bands2, maps, zones
+            results.put(('done', job_id, report))
+        except Exception as e:
+            results.put(('error', job_id, f"{type(e).__name__}: {e}"))
+        finally:
+            for shm in blocks:
+                release_shared(shm)
+
+
+class PooledPredictor(ChangeDetectionPredictor):
+    """
+    Drop-in ChangeDetectionPredictor that runs predictions in worker processes
+
+    predict() blocks the calling thread until a worker finishes, so the API
+    keeps calling it through asyncio.to_thread; LLM explanations stay in the
+    API process (attach_explanations() is inherited).
+    """
+
+    def __init__(self, model_path, workers=2, threads=None, use_llm=True):
+        """
+        Args:
+            model_path: Checkpoint loaded by every worker (None = untrained weights)
+            workers: Number of worker processes
+            threads: Torch threads per worker (default: cores / workers)
+            use_llm: Initialize the Gemini explainer in this process
+        """
+        self.model_path = model_path
+        self.workers = workers
+        self.threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        self.init_memory = MemoryTracker(enabled=False)
+        self.llm_explainer = None
+
+        # spawn: fork() would clone the API's event loop, sockets and torch thread pools
+        self._ctx = mp.get_context('spawn')
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._processes = []
+        self._jobs = {}      # job_id -> queue.Queue of (kind, payload) for the waiting thread
+        self._running = {}   # job_id -> worker pid
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._listener = None
+
+        for _ in range(workers):
+            self._spawn()
+        ready = 0
+        while ready < workers:
+            try:
+                kind, _, _ = self._results.get(timeout=config.INFERENCE_WORKER_START_TIMEOUT)
+            except queue.Empty:
+                self.close()
+                raise RuntimeError("Inference workers did not start (check the worker logs)")
+            ready += kind == 'ready'
+        print(f"✅ {workers} inference workers ready ({self.threads} threads each)")
+
+        self._listener = threading.Thread(target=self._listen, name='inference-pool', daemon=True)
+        self._listener.start()
+
+        if use_llm:
+            self.init_llm_explainer()
+
+    def _spawn(self):
+        process = self._ctx.Process(
+            target=_worker_main, args=(self.model_path, self.threads, self._tasks, self._results),
+            daemon=True
+        )
+        process.start()
+        self._processes.append(process)
+        return process
+
+    def _listen(self):
+        """Route worker messages to the threads waiting on each job"""
+        while not self._closed:
+            self._check_workers()
+            try:
+                kind, job_id, payload = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+            with self._lock:
+                if kind == 'started':
+                    self._running[job_id] = payload
+                    continue
+                if kind in ('done', 'error'):
+                    self._running.pop(job_id, None)
+                waiter = self._jobs.get(job_id)
+            if waiter is not None:
+                waiter.put((kind, payload))
+
+    def _check_workers(self):
+        """Fail the jobs of crashed workers and start replacements"""
+        for process in list(self._processes):
+            if process.is_alive() or self._closed:
+                continue
+            self._processes.remove(process)
+            print(f"⚠️  Inference worker {process.pid} exited with code {process.exitcode}, restarting")
+            with self._lock:
+                lost = [job_id for job_id, pid in self._running.items() if pid == process.pid]
+                for job_id in lost:
+                    del self._running[job_id]
+                    if job_id in self._jobs:
+                        self._jobs[job_id].put(('error', f"inference worker exited with code {process.exitcode}"))
+            self._spawn()
+
+    def _job_lost(self, job_id):
+        """Why a job can no longer get a reply, or None while it still can"""
+        if self._closed:
+            return "inference pool was closed"
+        if self._listener is None or not self._listener.is_alive():
+            return "inference pool listener stopped"
+        with self._lock:
+            pid = self._running.get(job_id)
+        if pid is not None and not any(p.pid == pid and p.is_alive() for p in self._processes):
+            return f"inference worker {pid} exited before replying"
+        return None
+
+    def predict(self, img1_folder, img2_folder, date1=None, date2=None, location="Unknown",
+                output_dir=None, generate_llm=True, on_event=None, memory_tracker=None, roi=None,
+                zones=None, coarse_to_fine=None, mask_clouds=None):
+        """Same contract as ChangeDetectionPredictor.predict, executed by a worker"""
+        report, _ = self.predict_with_maps(img1_folder, img2_folder, date1, date2, location,
+                                           output_dir=output_dir, generate_llm=generate_llm,
+                                           on_event=on_event, memory_tracker=memory_tracker, roi=roi,
+                                           zones=zones, coarse_to_fine=coarse_to_fine,
+                                           mask_clouds=mask_clouds)
+        return report
+
+    def predict_with_maps(self, img1_folder, img2_folder, date1=None, date2=None, location="Unknown",
+                          output_dir=None, generate_llm=True, on_event=None, memory_tracker=None,
+                          roi=None, zones=None, coarse_to_fine=None, mask_clouds=None, return_maps=False):
+        """
+        Run one prediction in a worker
+
+        Returns:
+            (report, maps) where maps is None unless return_maps is set, in which
+            case it is a dict of 'change' / 'vegetation' / 'urban' arrays copied
+            out of the shared output block
+        """
+        if self._closed:
+            raise RuntimeError("Inference pool is closed")
+        memory = memory_tracker or MemoryTracker(enabled=False)
+        if output_dir is None:
+            output_dir = os.path.join(config.RESULTS_DIR, f"{location}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+        # Only the ROI window is decoded; its (small) mask travels with the job
+        region = resolve_roi(roi, img1_folder) if roi is not None else None
+        window = region.window if region is not None else None
+
+        blocks = []
+        job_id = next(self._job_ids)
+        waiter = queue.Queue()
+        try:
+            # Decode straight into shared memory: the worker maps the same pages
+            with memory.stage('load_bands'):
+                if region is not None:
+                    h1 = h2 = region.height
+                    w1 = w2 = region.width
+                else:
+                    h1, w1 = band_shape(img1_folder)
+                    h2, w2 = band_shape(img2_folder)
+                shm1, bands1, handle1 = create_shared((len(config.BAND_NAMES), h1, w1))
+                blocks.append(shm1)
+                shm2, bands2, handle2 = create_shared((len(config.BAND_NAMES), h2, w2))
+                blocks.append(shm2)
+                load_bands(img1_folder, out=bands1, window=window)
+                load_bands(img2_folder, out=bands2, window=window)
+                handle_zones = None
+                if zones is not None:
+                    labels, zone_names = load_zones(zones, img1_folder, window)
+                    shm_zones, zone_block, handle_zones = create_shared(labels.shape, np.int32)
+                    blocks.append(shm_zones)
+                    zone_block[:] = labels
+                    del labels, zone_block
+            shm_out, maps, handle_out = create_shared((7, h1, w1))
+            blocks.append(shm_out)
+            del bands1, bands2
+
+            with self._lock:
+                self._jobs[job_id] = waiter
+            self._tasks.put({
+                'job_id': job_id,
+                'bands1': handle1,
+                'bands2': handle2,
+                'maps': handle_out,
+                'zones': handle_zones,
+                'kwargs': {'date1': date1, 'date2': date2, 'location': location, 'output_dir': output_dir,
+                           'roi': region, 'zone_names': zone_names if zones is not None else None,
+                           'georef': band_georef(img1_folder, window), 'coarse_to_fine': coarse_to_fine,
+                           'mask_clouds': mask_clouds}
+            })
+
+            while True:
+                try:
+                    kind, payload = waiter.get(timeout=config.INFERENCE_LIVENESS_INTERVAL)
+                except queue.Empty:
+                    # The listener fails jobs of crashed workers, but never wait on it blindly
+                    lost = self._job_lost(job_id)
+                    if lost is not None:
+                        raise RuntimeError(lost)
+                    continue
+                if kind == 'event':
+                    self._emit(on_event, *payload)
+                elif kind == 'error':
+                    raise RuntimeError(payload)
+                else:
+                    report = payload
+                    break
+
+            result_maps = None
+            if return_maps:
+                result_maps = {name: array.copy() for name, array in split_maps(maps).items()}
+            del maps
+        finally:
+            with self._lock:
+                self._jobs.pop(job_id, None)
+                self._running.pop(job_id, None)
+            for shm in blocks:
+                release_shared(shm, unlink=True)
+
+        if memory.enabled:
+            report['api_memory_profile'] = memory.summary()
+
+        if generate_llm and self.llm_explainer:
+            try:
+                explanations = self.llm_explainer.generate_explanation(report)
+                self.attach_explanations(report, explanations, output_dir)
+            except Exception as e:
+                print(f"⚠️  Could not generate LLM explanations: {e}")
+
+        return report, result_maps
+
+    def close(self):
+        """Stop the workers after their current job"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
@@ -3,7 +3,10 @@ LLM-powered explanation generator for satellite analysis results
 Uses Google Gemini API for high-quality explanations
 """
 
+import asyncio
 import json
+import re
+import time
 from typing import Dict
 import os
 
@@ -17,16 +20,24 @@ except ImportError:
 class LLMExplainer:
     """Generates natural language explanations from analysis results using Gemini"""
     
-    def __init__(self, api_key=None, model='gemini-2.5-flash-lite'):
+    def __init__(self, api_key=None, model='gemini-2.5-flash-lite', cache=None, cache_precision=None,
+                 base_url=None):
         """
         Initialize LLM explainer with Gemini
         
         Args:
             api_key: Gemini API key (or set GEMINI_API_KEY env variable)
             model: Gemini model name (default: 'gemini-2.5-flash-lite')
+            cache: Optional ExplanationCache for reusing earlier explanations
+            cache_precision: Optional bucket size for metric values in the cache key
+                             (e.g. 0.1 makes 12.34% and 12.31% share an entry)
+            base_url: Optional API endpoint override (e.g. a local fake server)
         """
         self.api_key = api_key or os.getenv('GEMINI_API_KEY')
         self.model = model
+        self.cache = cache
+        self.cache_precision = cache_precision
+        self.base_url = base_url
         
         if not self.api_key:
             raise ValueError("Gemini API key required. Set GEMINI_API_KEY environment variable or pass api_key parameter.")
@@ -36,9 +47,10 @@ class LLMExplainer:
             from google import genai
             from google.genai import types
             
-            self.client = genai.Client(api_key=self.api_key)
+            http_options = types.HttpOptions(base_url=base_url) if base_url else None
+            self.client = genai.Client(api_key=self.api_key, http_options=http_options)
             self.types = types
-            print(f"✓ Gemini initialized ({model})")
+            print(f"✓ Gemini initialized ({model}{f' at {base_url}' if base_url else ''})")
         except ImportError:
             raise ImportError("Please install: pip install google-genai")
         except Exception as e:
@@ -54,6 +66,19 @@ class LLMExplainer:
         Returns:
             Dictionary with different explanation types
         """
+        prompt, cache_key, cached = self._prepare(analysis_report)
+        if cached is not None:
+            return cached
+        
+        print("🤖 Generating LLM explanation...")
+        
+        # Get LLM response
+        explanation_text = self._call_gemini(prompt)
+        
+        return self._finish(explanation_text, cache_key)
+    
+    def _prepare(self, analysis_report):
+        """Build the prompt and look it up in the cache; returns (prompt, cache_key, cached)"""
         # Extract key metrics
         metadata = analysis_report['metadata']
         veg = analysis_report['vegetation_analysis']
@@ -64,16 +89,42 @@ class LLMExplainer:
         # Create prompt
         prompt = self._create_prompt(metadata, veg, urban, water, summary)
         
-        print("🤖 Generating LLM explanation...")
-        
-        # Get LLM response
-        explanation_text = self._call_gemini(prompt)
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self._cache_key(prompt, metadata, veg, urban, water, summary)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print("✓ LLM explanation served from cache")
+                return prompt, cache_key, cached
         
-        # Parse into sections
+        return prompt, cache_key, None
+    
+    def _finish(self, explanation_text, cache_key):
+        """Parse the LLM response into sections and store it in the cache"""
         explanations = self._parse_response(explanation_text)
         
+        # Never cache the fallback, so the next request retries Gemini
+        if cache_key is not None and explanation_text != self._generate_fallback_response():
+            self.cache.put(cache_key, self.model, explanations)
+        
         return explanations
     
+    def _cache_key(self, prompt, metadata, veg, urban, water, summary):
+        """Build the cache key, bucketing metric values when cache_precision is set"""
+        if not self.cache_precision:
+            return self.cache.make_key(prompt, self.model)
+        
+        step = self.cache_precision
+        
+        def bucket(section):
+            return {k: round(round(v / step) * step, 10) if isinstance(v, (int, float)) else v
+                    for k, v in section.items()}
+        
+        # Summary lines embed the raw numbers; keep only which statements were made
+        summary_shape = [re.sub(r'\d+(\.\d+)?', '#', item) for item in summary]
+        key_prompt = self._create_prompt(metadata, bucket(veg), bucket(urban), bucket(water), summary_shape)
+        return self.cache.make_key(key_prompt, self.model)
+    
     def _create_prompt(self, metadata, veg, urban, water, summary):
         """Create structured prompt for LLM"""
         
@@ -147,7 +198,7 @@ Use the exact percentages and areas from the data. Be specific and quantitative.
                 print(f"  ⚠️  Attempt {attempt + 1} failed: {error_str}")
                 
                 # Check if it's a 503 (overloaded) or rate limit error
-                if '503' in error_str or 'overloaded' in error_str.lower() or 'UNAVAILABLE' in error_str:
+                if self._is_overloaded(error_str):
                     if attempt < max_retries - 1:
                         # Exponential backoff
                         delay = base_delay * (2 ** attempt)
@@ -165,6 +216,11 @@ Use the exact percentages and areas from the data. Be specific and quantitative.
         
         return self._generate_fallback_response()
     
+    @staticmethod
+    def _is_overloaded(error_str):
+        """Whether an API error means the provider is overloaded (worth retrying)"""
+        return '503' in error_str or 'overloaded' in error_str.lower() or 'UNAVAILABLE' in error_str
+    
     def _generate_fallback_response(self):
         """Generate a fallback response when LLM is unavailable"""
         return """EXECUTIVE SUMMARY
@@ -253,6 +309,129 @@ KEY INSIGHTS
         return sections
 
 
+class CircuitBreaker:
+    """Stops calling a failing provider for a cooldown period"""
+    
+    def __init__(self, failure_threshold=3, reset_timeout=60.0):
+        """
+        Args:
+            failure_threshold: Consecutive overload failures before the circuit opens
+            reset_timeout: Seconds to wait before letting a trial call through
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+    
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+    
+    def allow_request(self):
+        """
+        Closed circuits let calls through and open ones don't; a half-open
+        circuit admits a single trial call and stays open for everyone else
+        until it reports back (or another reset_timeout passes, in case the
+        trial call was cancelled)
+        """
+        state = self.state
+        if state == 'half_open':
+            self.probing = True
+            self.opened_at = time.monotonic()
+            return True
+        return state == 'closed'
+    
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+    
+    def record_failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+
+class AsyncLLMExplainer(LLMExplainer):
+    """Non-blocking LLMExplainer for use inside the FastAPI event loop"""
+    
+    def __init__(self, api_key=None, model='gemini-2.5-flash-lite', cache=None, cache_precision=None,
+                 base_url=None, max_concurrency=4, breaker=None):
+        """
+        Args:
+            max_concurrency: Maximum number of in-flight Gemini calls
+            breaker: CircuitBreaker shared across calls (default: a new one)
+            (other arguments as in LLMExplainer)
+        """
+        super().__init__(api_key=api_key, model=model, cache=cache, cache_precision=cache_precision,
+                         base_url=base_url)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.breaker = breaker or CircuitBreaker()
+    
+    async def generate_explanation(self, analysis_report: Dict) -> Dict[str, str]:
+        """Async version of LLMExplainer.generate_explanation"""
+        # The sqlite cache blocks, so its lookup and store run off the event loop
+        prompt, cache_key, cached = await asyncio.to_thread(self._prepare, analysis_report)
+        if cached is not None:
+            return cached
+        
+        print("🤖 Generating LLM explanation...")
+        
+        explanation_text = await self._call_gemini_async(prompt)
+        
+        return await asyncio.to_thread(self._finish, explanation_text, cache_key)
+    
+    async def _call_gemini_async(self, prompt):
+        """Call Gemini through the async client with retry logic and a circuit breaker"""
+        max_retries = 3
+        base_delay = 2  # seconds
+        
+        for attempt in range(max_retries):
+            if not self.breaker.allow_request():
+                print("  ⚡ Gemini circuit open, using fallback response")
+                return self._generate_fallback_response()
+            
+            try:
+                async with self.semaphore:
+                    print(f"  Calling Gemini API (attempt {attempt + 1}/{max_retries})...")
+                    response = await self.client.aio.models.generate_content(
+                        model=self.model,
+                        contents=prompt,
+                        config=self.types.GenerateContentConfig(
+                            temperature=0.3,
+                            top_p=0.9,
+                            max_output_tokens=2000
+                        )
+                    )
+                
+                self.breaker.record_success()
+                print("  ✓ Gemini response received")
+                return response.text
+                
+            except Exception as e:
+                error_str = str(e)
+                print(f"  ⚠️  Attempt {attempt + 1} failed: {error_str}")
+                
+                if not self._is_overloaded(error_str):
+                    print(f"  ❌ Non-retryable error: {error_str}")
+                    return self._generate_fallback_response()
+                
+                self.breaker.record_failure()
+                if attempt < max_retries - 1:
+                    delay = base_delay * (2 ** attempt)
+                    print(f"  ⏳ Waiting {delay}s before retry...")
+                    await asyncio.sleep(delay)
+        
+        print("  ❌ All retries exhausted, using fallback response")
+        return self._generate_fallback_response()
+
+
 def test_explainer():
     """Test the LLM explainer with sample data"""
     
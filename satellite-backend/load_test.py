@@ -0,0 +1,259 @@
+"""
+Load generator for the FastAPI service
+Drives /api/analyze followed by the results endpoints, either with a fixed
+number of concurrent clients (closed loop) or at a fixed arrival rate
+(open loop, Poisson arrivals), and reports latency percentiles, error rate
+and throughput for every level
+
+    python fake_gemini.py --latency 1.5 --error-rate 0.1 &
+    GEMINI_API_KEY=fake GEMINI_BASE_URL=http://127.0.0.1:8090 LLM_CACHE_ENABLED=0 python main.py &
+    python load_test.py --concurrency 1,2,4,8 --duration 60
+    python load_test.py --rates 0.1,0.25,0.5 --payload bands --size 256
+
+Run the server with the explanation cache disabled: with only --variants
+distinct payloads, a cached server answers every later analysis from the
+cache and the fake Gemini's latency and errors are never exercised.
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import tempfile
+import numpy as np
+import httpx
+from datetime import datetime
+import config
+from benchmark import write_synthetic_scene, write_synthetic_rgb
+
+ENDPOINTS = ['analyze', 'results', 'visualizations', 'image']
+
+
+def build_payloads(kind, size, variants, seed=0):
+    """
+    Pre-generate upload bodies so payload creation is not part of the measurement
+
+    Several variants are built so the server does not see one repeated upload.
+
+    Returns:
+        List of multipart ``files`` lists for httpx
+    """
+    payloads = []
+    with tempfile.TemporaryDirectory(prefix='terratrack_load_') as work_dir:
+        for variant in range(variants):
+            files = []
+            for field, offset in (('before_images', 0), ('after_images', 1)):
+                variant_seed = seed + 2 * variant + offset
+                if kind == 'rgb':
+                    path = os.path.join(work_dir, f"{variant}_{field}.png")
+                    write_synthetic_rgb(path, size, variant_seed)
+                    with open(path, 'rb') as f:
+                        files.append((field, (f"{field}.png", f.read(), 'image/png')))
+                else:
+                    folder = os.path.join(work_dir, f"{variant}_{field}")
+                    write_synthetic_scene(folder, size, variant_seed)
+                    for band_name in config.BAND_NAMES:
+                        with open(os.path.join(folder, f"{band_name}.tif"), 'rb') as f:
+                            files.append((field, (f"{band_name}.tif", f.read(), 'image/tiff')))
+            payloads.append(files)
+    return payloads
+
+
+class LoadTest:
+    """Runs analysis scenarios against one server and collects per-endpoint samples"""
+
+    def __init__(self, base_url, payloads, timeout=600.0, location='loadtest'):
+        self.base_url = base_url.rstrip('/')
+        self.payloads = payloads
+        self.timeout = timeout
+        self.location = location
+        self._next_payload = 0
+
+    def _payload(self):
+        files = self.payloads[self._next_payload % len(self.payloads)]
+        self._next_payload += 1
+        return files
+
+    async def _timed(self, samples, endpoint, request):
+        start = time.perf_counter()
+        try:
+            response = await request
+            ok = response.status_code == 200
+        except httpx.HTTPError as e:
+            response, ok = e, False
+        samples.append({'endpoint': endpoint, 'latency': time.perf_counter() - start, 'ok': ok,
+                        'status': getattr(response, 'status_code', None)})
+        return response if ok else None
+
+    async def scenario(self, client, samples):
+        """Upload one pair, then read back the results like the frontend does"""
+        response = await self._timed(samples, 'analyze', client.post(
+            f"{self.base_url}/api/analyze", params={'location': self.location}, files=self._payload()
+        ))
+        if response is None:
+            return False
+        analysis_id = response.json()['analysis_id']
+        ok = True
+        for endpoint, path in (('results', ''), ('visualizations', '/visualizations'), ('image', '/image')):
+            ok &= await self._timed(samples, endpoint, client.get(
+                f"{self.base_url}/api/results/{analysis_id}{path}"
+            )) is not None
+        return ok
+
+    async def closed_loop(self, concurrency, duration):
+        """``concurrency`` clients issue scenarios back to back for ``duration`` seconds"""
+        samples = []
+        deadline = time.perf_counter() + duration
+
+        async def client_loop(client):
+            while time.perf_counter() < deadline:
+                await self.scenario(client, samples)
+
+        limits = httpx.Limits(max_connections=concurrency * 2)
+        async with httpx.AsyncClient(timeout=self.timeout, limits=limits) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+        return samples, elapsed
+
+    async def open_loop(self, rate, duration, seed=0):
+        """Start scenarios at Poisson arrivals of ``rate`` per second, regardless of completions"""
+        samples = []
+        rng = random.Random(seed)
+        tasks = []
+        async with httpx.AsyncClient(timeout=self.timeout, limits=httpx.Limits(max_connections=None)) as client:
+            start = time.perf_counter()
+            next_arrival = start
+            while next_arrival < start + duration:
+                await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+                tasks.append(asyncio.create_task(self.scenario(client, samples)))
+                next_arrival += rng.expovariate(rate)
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - start
+        return samples, elapsed
+
+
+def summarize(samples, elapsed):
+    """Latency percentiles per endpoint, error rate and throughput for one level"""
+    endpoints = {}
+    for endpoint in ENDPOINTS:
+        latencies = np.array([s['latency'] for s in samples if s['endpoint'] == endpoint and s['ok']])
+        requests = sum(1 for s in samples if s['endpoint'] == endpoint)
+        if not requests:
+            continue
+        errors = requests - len(latencies)
+        endpoints[endpoint] = {
+            'requests': requests,
+            'errors': errors,
+            'error_rate': errors / requests,
+            'p50': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'p95': float(np.percentile(latencies, 95)) if len(latencies) else None,
+            'p99': float(np.percentile(latencies, 99)) if len(latencies) else None,
+            'mean': float(latencies.mean()) if len(latencies) else None
+        }
+    analyses = endpoints.get('analyze', {'requests': 0, 'errors': 0})
+    completed = analyses['requests'] - analyses['errors']
+    return {
+        'elapsed_seconds': elapsed,
+        'analyses_started': analyses['requests'],
+        'analyses_completed': completed,
+        'error_rate': analyses['errors'] / analyses['requests'] if analyses['requests'] else 0.0,
+        'throughput_per_second': completed / elapsed if elapsed > 0 else 0.0,
+        'endpoints': endpoints,
+        'status_codes': {str(code): sum(1 for s in samples if s['status'] == code)
+                         for code in sorted({s['status'] for s in samples}, key=str)}
+    }
+
+
+def fetch_llm_stats(url):
+    """Counters from fake_gemini.py (/stats), if it is reachable"""
+    try:
+        return httpx.get(f"{url.rstrip('/')}/stats", timeout=5).json()
+    except (httpx.HTTPError, ValueError):
+        return None
+
+
+def print_level(label, summary):
+    analyze = summary['endpoints'].get('analyze', {})
+    fmt = lambda v: f"{v:8.2f}" if v is not None else f"{'-':>8}"
+    print(f"{label:>12} {summary['analyses_completed']:>6} {summary['error_rate']:>7.1%} "
+          f"{summary['throughput_per_second']:>9.3f} {fmt(analyze.get('p50'))} "
+          f"{fmt(analyze.get('p95'))} {fmt(analyze.get('p99'))}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Load test the satellite change detection API')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='API base URL')
+    parser.add_argument('--concurrency', help='Comma-separated client counts (closed loop), e.g. 1,2,4,8')
+    parser.add_argument('--rates', help='Comma-separated arrival rates in analyses/s (open loop)')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds per level')
+    parser.add_argument('--payload', choices=['rgb', 'bands'], default='rgb',
+                        help='Upload one RGB PNG pair or 2 x 13 band GeoTIFFs')
+    parser.add_argument('--size', type=int, default=256, help='Scene size in pixels')
+    parser.add_argument('--variants', type=int, default=8, help='Distinct payloads to cycle through')
+    parser.add_argument('--timeout', type=float, default=600, help='Per-request timeout (s)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for payloads and arrivals')
+    parser.add_argument('--llm-url', default=config.LLM_BASE_URL,
+                        help='fake_gemini.py URL to collect LLM call counters from')
+    parser.add_argument('--output', default='load_test_results.json', help='Results file')
+
+    args = parser.parse_args()
+
+    if not args.concurrency and not args.rates:
+        args.concurrency = '1,2,4'
+
+    print(f"Generating {args.variants} {args.payload} payloads ({args.size}x{args.size})...")
+    payloads = build_payloads(args.payload, args.size, args.variants, args.seed)
+    load_test = LoadTest(args.url, payloads, timeout=args.timeout)
+
+    levels = [('concurrency', int(n)) for n in (args.concurrency or '').split(',') if n]
+    levels += [('rate', float(r)) for r in (args.rates or '').split(',') if r]
+
+    results = []
+    print(f"\n{'level':>12} {'done':>6} {'errors':>7} {'thru/s':>9} {'p50 (s)':>8} {'p95 (s)':>8} {'p99 (s)':>8}")
+    for mode, value in levels:
+        llm_before = fetch_llm_stats(args.llm_url) if args.llm_url else None
+        if mode == 'concurrency':
+            samples, elapsed = asyncio.run(load_test.closed_loop(value, args.duration))
+            label = f"c={value}"
+        else:
+            samples, elapsed = asyncio.run(load_test.open_loop(value, args.duration, args.seed))
+            label = f"{value}/s"
+        summary = summarize(samples, elapsed)
+        summary[mode] = value
+
+        llm_after = fetch_llm_stats(args.llm_url) if args.llm_url else None
+        if llm_before and llm_after:
+            summary['llm'] = {
+                'calls': llm_after['requests'] - llm_before['requests'],
+                'errors': llm_after['errors'] - llm_before['errors'],
+                'max_in_flight': llm_after['max_in_flight']
+            }
+            if summary['llm']['calls'] < summary['analyses_completed']:
+                print(f"⚠️  Only {summary['llm']['calls']} LLM calls for {summary['analyses_completed']} analyses: "
+                      f"is the server's explanation cache on? (start it with LLM_CACHE_ENABLED=0)")
+
+        results.append(summary)
+        print_level(label, summary)
+
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'url': args.url,
+        'settings': {
+            'payload': args.payload,
+            'size': args.size,
+            'variants': args.variants,
+            'duration': args.duration
+        },
+        'levels': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"\nResults saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
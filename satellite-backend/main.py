@@ -5,7 +5,7 @@ Handles image upload, model inference, and LLM-powered analysis
 
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, List
 import os
@@ -14,6 +14,7 @@ import shutil
 import uuid
 from datetime import datetime
 import json
+import asyncio
 import torch
 from pathlib import Path
 
@@ -26,6 +27,12 @@ from dotenv import load_dotenv
 load_dotenv(BASE_DIR.parent / '.env')
 
 from predict import ChangeDetectionPredictor
+from llm_explainer import AsyncLLMExplainer, CircuitBreaker
+from analysis_index import AnalysisIndex, STATUS_COMPLETED
+from storage_manager import StorageManager
+from inference_pool import PooledPredictor
+from roi import parse_roi
+import memory_tracker
 import config
 
 app = FastAPI(
@@ -43,10 +50,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global predictor instance
+# Global predictor instance (serve.py sets it before startup when pre-forking workers)
 predictor = None
+llm_explainer = None
+
+# Only one process of a pre-fork server runs the storage sweeper
+run_storage_sweeper = True
+
+# matplotlib/pyplot in the predictor is not thread-safe; run one prediction at a time
+# (with INFERENCE_WORKERS, one per worker process)
+predict_lock = asyncio.Lock()
+
+# Strong references to streamed analyses so they finish even if the client disconnects
+background_tasks = set()
 UPLOAD_DIR = BASE_DIR / "backend" / "uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+RESULTS_DIR = BASE_DIR / "results"
+RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Persistent analysis_id -> upload dir / result folder lookup
+analysis_index = AnalysisIndex(BASE_DIR / "backend" / "analysis_index.db")
+storage_manager = StorageManager(analysis_index, UPLOAD_DIR, RESULTS_DIR)
 
 class AnalysisRequest(BaseModel):
     location: Optional[str] = "Unknown"
@@ -56,19 +80,72 @@ class AnalysisRequest(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     """Initialize model on startup"""
-    global predictor
-    model_path = BASE_DIR / 'models' / 'best_model.pth'
-    
-    if not model_path.exists():
-        print(f"⚠️  Model not found at {model_path}")
-        print("API will run in limited mode (indices only)")
-        return
-    
-    print("🚀 Loading AI model...")
-    # Set memory optimization
-    os.environ['PYTORCH_CUDA_ALLOC_CONF'] = 'expandable_segments:True'
-    predictor = ChangeDetectionPredictor(str(model_path))
-    print("✅ Model loaded successfully")
+    global predictor, llm_explainer, predict_lock
+    if config.MEMORY_PROFILING:
+        memory_tracker.start_tracing(config.MEMORY_TRACE_FRAMES)
+        print("🧠 Memory profiling enabled (/api/debug/memory)")
+    imported = analysis_index.import_legacy(UPLOAD_DIR)
+    if imported:
+        print(f"📇 Indexed {imported} existing analyses")
+    
+    # Retention/compaction runs in the background for the lifetime of the app
+    if run_storage_sweeper:
+        asyncio.create_task(storage_sweep_loop())
+    
+    if predictor is not None:
+        # Weights were loaded once by the pre-fork parent and are shared with this worker
+        print(f"✅ Using pre-loaded model (worker pid {os.getpid()})")
+    else:
+        model_path = BASE_DIR / 'models' / 'best_model.pth'
+        
+        if not model_path.exists():
+            print(f"⚠️  Model not found at {model_path}")
+            print("API will run in limited mode (indices only)")
+            return
+        
+        print("🚀 Loading AI model...")
+        # Set memory optimization
+        os.environ['PYTORCH_CUDA_ALLOC_CONF'] = 'expandable_segments:True'
+        if config.INFERENCE_WORKERS > 0:
+            # Inference, analysis and rendering run in separate processes; bands travel via shared memory
+            predictor = await asyncio.to_thread(PooledPredictor, str(model_path), config.INFERENCE_WORKERS)
+            predict_lock = asyncio.Semaphore(config.INFERENCE_WORKERS)
+        else:
+            predictor = ChangeDetectionPredictor(str(model_path))
+        print("✅ Model loaded successfully")
+    
+    if predictor.llm_explainer is not None:
+        llm_explainer = AsyncLLMExplainer(
+            api_key=predictor.llm_explainer.api_key,
+            model=predictor.llm_explainer.model,
+            cache=predictor.llm_explainer.cache,
+            cache_precision=predictor.llm_explainer.cache_precision,
+            base_url=predictor.llm_explainer.base_url,
+            max_concurrency=config.LLM_MAX_CONCURRENCY,
+            breaker=CircuitBreaker(
+                failure_threshold=config.LLM_BREAKER_FAILURES,
+                reset_timeout=config.LLM_BREAKER_RESET_SECONDS
+            )
+        )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop out-of-process inference workers"""
+    if isinstance(predictor, PooledPredictor):
+        await asyncio.to_thread(predictor.close)
+
+async def storage_sweep_loop():
+    """Periodically enforce storage retention without blocking requests"""
+    interval = config.STORAGE_SWEEP_INTERVAL_MINUTES * 60
+    while True:
+        try:
+            stats = await asyncio.to_thread(storage_manager.sweep)
+            if stats['deleted'] or stats['compressed'] or stats['orphans_deleted']:
+                print(f"🧹 Storage sweep: {stats['deleted']} deleted, {stats['compressed']} compressed, "
+                      f"{stats['bytes_freed'] / 1e6:.1f} MB freed")
+        except Exception as e:
+            print(f"⚠️  Storage sweep failed: {e}")
+        await asyncio.sleep(interval)
 
 @app.get("/")
 async def root():
@@ -81,7 +158,8 @@ async def root():
             "health": "/health",
             "analyze": "/api/analyze",
             "results": "/api/results/{analysis_id}",
-            "visualization": "/api/results/{analysis_id}/image"
+            "visualization": "/api/results/{analysis_id}/image",
+            "storage": "/api/storage"
         }
     }
 
@@ -102,7 +180,12 @@ async def analyze_images(
     after_images: List[UploadFile] = File(...),
     location: str = "Unknown",
     date_before: Optional[str] = None,
-    date_after: Optional[str] = None
+    date_after: Optional[str] = None,
+    stream: Optional[str] = None,
+    roi: Optional[str] = None,
+    roi_mask: Optional[UploadFile] = File(None),
+    zones: Optional[UploadFile] = File(None),
+    coarse_to_fine: Optional[bool] = None
 ):
     """
     Analyze satellite image changes with AI model and LLM
@@ -110,7 +193,32 @@ async def analyze_images(
     Accepts:
     - 13 .tif files for before and 13 .tif files for after (original format)
     - OR 1 PNG/JPEG for before and 1 PNG/JPEG for after (user-friendly)
+    
+    With stream=ndjson or stream=sse, partial results (model predictions and
+    analyzer sections first, then visualizations and LLM explanations) are
+    streamed as they finish instead of returned in one response.
+    
+    Optional region of interest: roi={"bbox": [x0, y0, x1, y1]} (pixels) or a
+    GeoJSON polygon, or a roi_mask image (non-zero = inside) of the scene's size.
+    Only that region is read, inferred and included in the statistics.
+    
+    Optional zones: a label raster (integer zone ids, 0 = none) or a GeoJSON
+    FeatureCollection; every metric is then also reported per zone
+    ('zonal_analysis' in the report, zonal_stats.csv in the results).
+    
+    coarse_to_fine=true runs the model only on tiles whose spectral indices
+    changed (default: COARSE_TO_FINE); the report states the tiles skipped.
     """
+    if stream is not None and stream not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="stream must be 'ndjson' or 'sse'")
+    
+    roi_value = None
+    if roi is not None:
+        try:
+            roi_value = parse_roi(roi)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid roi: {e}")
+    
     if predictor is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
     
@@ -148,15 +256,15 @@ async def analyze_images(
     before_dir.mkdir(parents=True, exist_ok=True)
     after_dir.mkdir(parents=True, exist_ok=True)
     
+    # Result folder is unique per analysis, so concurrent runs for the same location can't collide
+    result_folder = f"{location}_{timestamp}_{analysis_id}"
+    analysis_index.register(analysis_id, analysis_dir, location, result_folder)
+    
     try:
-        # Save uploaded files
+        # Save uploaded files before any streaming starts, while the upload is still open
         print(f"📁 Saving uploaded files for analysis {analysis_id}...")
         
         if is_rgb_mode:
-            # Save RGB images and convert
-            from image_converter import ImageConverter
-            converter = ImageConverter()
-            
             # Save original RGB files
             before_rgb_path = analysis_dir / f"before_rgb{Path(before_images[0].filename).suffix}"
             after_rgb_path = analysis_dir / f"after_rgb{Path(after_images[0].filename).suffix}"
@@ -165,12 +273,6 @@ async def analyze_images(
                 shutil.copyfileobj(before_images[0].file, f)
             with open(after_rgb_path, "wb") as f:
                 shutil.copyfileobj(after_images[0].file, f)
-            
-            # Convert to multi-band
-            print("🔄 Converting RGB to multi-band format...")
-            converter.convert_rgb_to_multispectral(str(before_rgb_path), str(before_dir))
-            converter.convert_rgb_to_multispectral(str(after_rgb_path), str(after_dir))
-            print("✓ Conversion complete")
         else:
             # Save multi-band TIF files
             for file in before_images:
@@ -183,6 +285,53 @@ async def analyze_images(
                 with open(file_path, "wb") as f:
                     shutil.copyfileobj(file.file, f)
         
+        if roi_mask is not None:
+            roi_mask_path = analysis_dir / f"roi_mask{Path(roi_mask.filename).suffix}"
+            with open(roi_mask_path, "wb") as f:
+                shutil.copyfileobj(roi_mask.file, f)
+            roi_value = str(roi_mask_path)
+        
+        zones_value = None
+        if zones is not None:
+            zones_value = str(analysis_dir / f"zones{Path(zones.filename).suffix}")
+            with open(zones_value, "wb") as f:
+                shutil.copyfileobj(zones.file, f)
+    except Exception as e:
+        _cleanup_failed_analysis(analysis_id, analysis_dir, e)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def analyze(emit=None):
+        """Convert, predict and explain; emit(name, data) receives partial results"""
+        def on_event(name, data):
+            if emit is None:
+                return
+            if name == 'visualization':
+                data = {**data, 'url': f"/api/results/{analysis_id}/visualizations/{data['filename']}"}
+            emit(name, data)
+        
+        memory = memory_tracker.MemoryTracker(enabled=config.MEMORY_PROFILING,
+                                              trace_frames=config.MEMORY_TRACE_FRAMES)
+        
+        if is_rgb_mode:
+            from image_converter import ImageConverter
+            converter = ImageConverter()
+            
+            # Convert to multi-band
+            print("🔄 Converting RGB to multi-band format...")
+            # Stage figures are process-wide, so while profiling the conversion holds
+            # predict_lock like the prediction stages; otherwise concurrent requests
+            # would show up in its numbers
+            if memory.enabled:
+                await predict_lock.acquire()
+            try:
+                with memory.stage('convert_rgb'):
+                    await asyncio.to_thread(converter.convert_rgb_to_multispectral, str(before_rgb_path), str(before_dir))
+                    await asyncio.to_thread(converter.convert_rgb_to_multispectral, str(after_rgb_path), str(after_dir))
+            finally:
+                if memory.enabled:
+                    predict_lock.release()
+            print("✓ Conversion complete")
+        
         print(f"🤖 Running AI analysis...")
         start_time = datetime.now()
         
@@ -190,14 +339,32 @@ async def analyze_images(
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
         
-        # Run prediction with LLM
-        report = predictor.predict(
-            str(before_dir),
-            str(after_dir),
-            date_before or "Unknown",
-            date_after or "Unknown",
-            location
-        )
+        # Run prediction off the event loop; the LLM call is awaited separately below
+        async with predict_lock:
+            report = await asyncio.to_thread(
+                predictor.predict,
+                str(before_dir),
+                str(after_dir),
+                date_before or "Unknown",
+                date_after or "Unknown",
+                location,
+                output_dir=str(RESULTS_DIR / result_folder),
+                generate_llm=False,
+                on_event=on_event,
+                memory_tracker=memory,
+                roi=roi_value,
+                zones=zones_value,
+                coarse_to_fine=coarse_to_fine,
+                mask_clouds=False if is_rgb_mode else None
+            )
+        
+        if llm_explainer is not None:
+            try:
+                explanations = await llm_explainer.generate_explanation(report)
+                predictor.attach_explanations(report, explanations, str(RESULTS_DIR / result_folder))
+                on_event('llm_explanations', explanations)
+            except Exception as e:
+                print(f"⚠️  Could not generate LLM explanations: {e}")
         
         # Clear GPU cache after inference
         if torch.cuda.is_available():
@@ -205,12 +372,6 @@ async def analyze_images(
         
         processing_time = (datetime.now() - start_time).total_seconds()
         
-        # Find the generated results
-        results_dir = BASE_DIR / 'results'
-        result_folders = [f for f in results_dir.iterdir() 
-                         if f.is_dir() and f.name.startswith(location)]
-        result_folder = sorted(result_folders)[-1].name if result_folders else None
-        
         response = {
             "status": "success",
             "analysis_id": analysis_id,
@@ -220,42 +381,126 @@ async def analyze_images(
             "data": report,
             "result_folder": result_folder,
             "has_llm": "llm_explanations" in report,
-            "visualization_available": result_folder is not None
+            "visualization_available": (RESULTS_DIR / result_folder).exists()
         }
         
-        # Save response for later retrieval
+        # Save response for later retrieval (write-then-rename so readers never see a partial file)
         response_path = analysis_dir / "response.json"
-        with open(response_path, 'w') as f:
+        tmp_path = analysis_dir / "response.json.tmp"
+        with open(tmp_path, 'w') as f:
             json.dump(response, f, indent=4)
+        os.replace(tmp_path, response_path)
+        # Index write and raw-band cleanup both block, so keep them off the event loop
+        await asyncio.to_thread(analysis_index.complete, analysis_id, result_folder)
+        await asyncio.to_thread(storage_manager.finalize_analysis, analysis_id)
         
         print(f"✅ Analysis complete in {processing_time:.2f}s")
-        
+        return response
+    
+    async def run_analysis(emit=None):
+        """analyze() with failure cleanup, which must also run after a streaming client left"""
+        try:
+            return await analyze(emit)
+        except Exception as e:
+            _cleanup_failed_analysis(analysis_id, analysis_dir, e)
+            raise
+    
+    if stream:
+        return _stream_analysis(run_analysis, analysis_id, stream)
+    
+    try:
+        response = await run_analysis()
         return JSONResponse(content=response)
-        
     except Exception as e:
-        # Cleanup on error
-        if analysis_dir.exists():
-            shutil.rmtree(analysis_dir)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _cleanup_failed_analysis(analysis_id: str, analysis_dir: Path, error: Exception):
+    """Remove uploads of a failed analysis and record the failure"""
+    if analysis_dir.exists():
+        shutil.rmtree(analysis_dir)
+    analysis_index.fail(analysis_id, error)
+    
+    # Clear GPU cache on error
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+def _format_event(name: str, data, stream: str) -> str:
+    """Serialize one progress event as an SSE message or an NDJSON line"""
+    if stream == "sse":
+        return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": name, "data": data}) + "\n"
+
+def _finish_background_task(task: asyncio.Task):
+    """Drop a finished analysis task, retrieving its exception so it is never left unobserved"""
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"❌ Analysis failed: {task.exception()}")
+
+def _stream_analysis(run_analysis, analysis_id: str, stream: str):
+    """
+    Run an analysis and stream partial results as they become available
+    
+    Events: started, model_predictions, metadata, vegetation_analysis, urban_analysis,
+    water_analysis, summary, visualization (one per image), report, llm_explanations,
+    then complete (the full response, same as the non-streaming endpoint) or error.
+    run_analysis records failures itself, so they are cleaned up even when the
+    client has disconnected and this generator was closed.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    
+    def emit(name, data):
+        # predict() runs in a worker thread, so hand events back to the loop
+        loop.call_soon_threadsafe(queue.put_nowait, (name, data))
+    
+    async def event_stream():
+        # The analysis keeps running (and stays retrievable) if the client disconnects
+        task = asyncio.create_task(run_analysis(emit))
+        background_tasks.add(task)
+        task.add_done_callback(_finish_background_task)
         
-        # Clear GPU cache on error
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
+        yield _format_event("started", {"analysis_id": analysis_id}, stream)
         
-        raise HTTPException(status_code=500, detail=str(e))
+        getter = None
+        try:
+            while True:
+                getter = asyncio.create_task(queue.get())
+                done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    yield _format_event(*getter.result(), stream)
+                    continue
+                while not queue.empty():
+                    yield _format_event(*queue.get_nowait(), stream)
+                break
+        finally:
+            # Also reached when the client disconnects and the generator is closed
+            if getter is not None and not getter.done():
+                getter.cancel()
+        
+        if task.exception() is not None:
+            error = task.exception()
+            yield _format_event("error", {"analysis_id": analysis_id, "detail": str(error)}, stream)
+        else:
+            yield _format_event("complete", task.result(), stream)
+    
+    media_type = "text/event-stream" if stream == "sse" else "application/x-ndjson"
+    return StreamingResponse(event_stream(), media_type=media_type,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _get_analysis(analysis_id: str) -> Dict:
+    """Look up an analysis in the index or raise 404"""
+    entry = analysis_index.get(analysis_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return entry
 
 @app.get("/api/results/{analysis_id}")
 async def get_results(analysis_id: str):
     """Get analysis results by ID"""
-    # Find analysis directory
-    analysis_dirs = [d for d in UPLOAD_DIR.iterdir() if d.is_dir() and d.name.startswith(analysis_id)]
-    
-    if not analysis_dirs:
-        raise HTTPException(status_code=404, detail="Analysis not found")
-    
-    analysis_dir = analysis_dirs[0]
-    response_path = analysis_dir / "response.json"
+    entry = _get_analysis(analysis_id)
+    response_path = Path(entry['upload_dir']) / "response.json"
     
-    if not response_path.exists():
+    if entry['status'] != STATUS_COMPLETED or not response_path.exists():
         raise HTTPException(status_code=404, detail="Results not found")
     
     with open(response_path, 'r') as f:
@@ -266,23 +511,12 @@ async def get_results(analysis_id: str):
 @app.get("/api/results/{analysis_id}/image")
 async def get_visualization(analysis_id: str):
     """Get visualization image for analysis"""
-    # Find analysis directory
-    analysis_dirs = [d for d in UPLOAD_DIR.iterdir() if d.is_dir() and d.name.startswith(analysis_id)]
-    
-    if not analysis_dirs:
-        raise HTTPException(status_code=404, detail="Analysis not found")
-    
-    analysis_dir = analysis_dirs[0]
-    response_path = analysis_dir / "response.json"
-    
-    with open(response_path, 'r') as f:
-        response = json.load(f)
-    
-    result_folder = response.get('result_folder')
+    entry = _get_analysis(analysis_id)
+    result_folder = entry['result_folder']
     if not result_folder:
         raise HTTPException(status_code=404, detail="Visualization not found")
     
-    image_path = BASE_DIR / 'results' / result_folder / "change_analysis.png"
+    image_path = RESULTS_DIR / result_folder / "change_analysis.png"
     
     if not image_path.exists():
         raise HTTPException(status_code=404, detail="Visualization image not found")
@@ -292,23 +526,12 @@ async def get_visualization(analysis_id: str):
 @app.get("/api/results/{analysis_id}/visualizations")
 async def get_visualization_list(analysis_id: str):
     """Get list of individual visualization images"""
-    # Find analysis directory
-    analysis_dirs = [d for d in UPLOAD_DIR.iterdir() if d.is_dir() and d.name.startswith(analysis_id)]
-    
-    if not analysis_dirs:
-        raise HTTPException(status_code=404, detail="Analysis not found")
-    
-    analysis_dir = analysis_dirs[0]
-    response_path = analysis_dir / "response.json"
-    
-    with open(response_path, 'r') as f:
-        response = json.load(f)
-    
-    result_folder = response.get('result_folder')
+    entry = _get_analysis(analysis_id)
+    result_folder = entry['result_folder']
     if not result_folder:
         raise HTTPException(status_code=404, detail="Visualizations not found")
     
-    viz_dir = BASE_DIR / 'results' / result_folder / 'visualizations'
+    viz_dir = RESULTS_DIR / result_folder / 'visualizations'
     
     if not viz_dir.exists():
         raise HTTPException(status_code=404, detail="Visualizations directory not found")
@@ -326,29 +549,58 @@ async def get_visualization_list(analysis_id: str):
 @app.get("/api/results/{analysis_id}/visualizations/{filename}")
 async def get_individual_visualization(analysis_id: str, filename: str):
     """Get a specific visualization image"""
-    # Find analysis directory
-    analysis_dirs = [d for d in UPLOAD_DIR.iterdir() if d.is_dir() and d.name.startswith(analysis_id)]
-    
-    if not analysis_dirs:
-        raise HTTPException(status_code=404, detail="Analysis not found")
-    
-    analysis_dir = analysis_dirs[0]
-    response_path = analysis_dir / "response.json"
-    
-    with open(response_path, 'r') as f:
-        response = json.load(f)
-    
-    result_folder = response.get('result_folder')
+    entry = _get_analysis(analysis_id)
+    result_folder = entry['result_folder']
     if not result_folder:
         raise HTTPException(status_code=404, detail="Visualization not found")
     
-    image_path = BASE_DIR / 'results' / result_folder / 'visualizations' / filename
+    image_path = RESULTS_DIR / result_folder / 'visualizations' / filename
     
     if not image_path.exists():
         raise HTTPException(status_code=404, detail=f"Visualization {filename} not found")
     
     return FileResponse(str(image_path), media_type="image/png")
 
+@app.get("/api/results/{analysis_id}/regions")
+async def get_change_regions(analysis_id: str):
+    """Get the change regions of an analysis as GeoJSON polygons"""
+    entry = _get_analysis(analysis_id)
+    result_folder = entry['result_folder']
+    if not result_folder:
+        raise HTTPException(status_code=404, detail="Change regions not found")
+    
+    regions_path = RESULTS_DIR / result_folder / "change_regions.geojson"
+    
+    if not regions_path.exists():
+        raise HTTPException(status_code=404, detail="Change regions not found")
+    
+    return FileResponse(str(regions_path), media_type="application/geo+json")
+
+@app.get("/api/storage")
+async def get_storage_usage():
+    """Get disk usage and retention status for uploads/results"""
+    return JSONResponse(content=storage_manager.usage())
+
+@app.get("/api/debug/memory")
+async def get_memory_debug(limit: int = config.MEMORY_TOP_ALLOCATIONS):
+    """Dump process memory and the largest live allocations (needs MEMORY_PROFILING=1)"""
+    if not config.MEMORY_PROFILING:
+        raise HTTPException(status_code=404, detail="Memory profiling disabled (set MEMORY_PROFILING=1)")
+    
+    # Scanning the heap walks every live object, so keep it off the event loop
+    allocations, tensors = await asyncio.to_thread(
+        lambda: (memory_tracker.top_allocations(limit), memory_tracker.largest_tensors(limit))
+    )
+    return JSONResponse(content={
+        "rss_mb": memory_tracker.current_rss_mb(),
+        "peak_rss_mb": memory_tracker.peak_rss_mb(),
+        "model_load": predictor.init_memory.summary() if predictor is not None else None,
+        "cuda": memory_tracker.cuda_memory(),
+        "top_allocations": allocations,
+        "largest_tensors": tensors,
+        "timestamp": datetime.now().isoformat()
+    })
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
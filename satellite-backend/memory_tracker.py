@@ -0,0 +1,205 @@
+"""
+Opt-in memory instrumentation (config.MEMORY_PROFILING)
+Records RSS, Python/numpy heap (tracemalloc) and torch CUDA allocator peaks
+per pipeline stage, and lists the largest live allocations for debugging
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+import torch
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+MB = 1024 * 1024
+
+
+def _read_status_kb(field):
+    """Value of a /proc/self/status field in KB (Linux only), or None"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def current_rss_mb():
+    """Current resident set size in MB, or None if unavailable"""
+    rss = _read_status_kb('VmRSS')
+    return rss / 1024 if rss is not None else None
+
+
+def process_memory_mb(pid='self'):
+    """
+    RSS and PSS of a process in MB (Linux only), or None
+
+    PSS splits shared pages between the processes mapping them, so summing
+    it over pre-fork workers gives the real cost of each added worker.
+    """
+    values = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if parts[0] in ('Rss:', 'Pss:', 'Shared_Clean:', 'Shared_Dirty:'):
+                    values[parts[0][:-1].lower()] = int(parts[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return values
+
+
+def peak_rss_mb():
+    """Peak resident set size in MB since start (or the last reset_peak_rss())"""
+    hwm = _read_status_kb('VmHWM')
+    if hwm is not None:
+        return hwm / 1024
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / MB if sys.platform == 'darwin' else peak / 1024
+
+
+def reset_peak_rss():
+    """
+    Reset the kernel's RSS high-water mark so the next peak is per stage
+
+    Only possible on Linux (writing 5 to /proc/self/clear_refs); returns
+    False elsewhere, in which case peaks are process-lifetime maxima.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def start_tracing(frames=1):
+    """Start tracemalloc if it is not running yet"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def top_allocations(limit=20, group_by='lineno'):
+    """Largest live Python/numpy allocations by source location (needs tracing)"""
+    if not tracemalloc.is_tracing():
+        return []
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ])
+    return [
+        {
+            'location': str(stat.traceback),
+            'size_mb': stat.size / MB,
+            'count': stat.count
+        }
+        for stat in snapshot.statistics(group_by)[:limit]
+    ]
+
+
+def largest_tensors(limit=20):
+    """
+    Largest live torch tensors, found by scanning the garbage collector
+
+    tracemalloc does not see torch's CPU allocator, so this is the way to
+    find model weights, activations or cached feature maps that are alive.
+    """
+    tensors = {}
+    for obj in gc.get_objects():
+        try:
+            if isinstance(obj, torch.Tensor):
+                tensors[obj.data_ptr()] = obj  # Views share storage; count each buffer once
+        except ReferenceError:
+            continue
+    largest = sorted(tensors.values(), key=lambda t: t.element_size() * t.nelement(), reverse=True)
+    return [
+        {
+            'shape': list(t.shape),
+            'dtype': str(t.dtype),
+            'device': str(t.device),
+            'size_mb': t.element_size() * t.nelement() / MB
+        }
+        for t in largest[:limit]
+    ]
+
+
+def cuda_memory():
+    """Torch CUDA allocator counters in MB, or None without a GPU"""
+    if not torch.cuda.is_available():
+        return None
+    return {
+        'allocated_mb': torch.cuda.memory_allocated() / MB,
+        'reserved_mb': torch.cuda.memory_reserved() / MB,
+        'peak_allocated_mb': torch.cuda.max_memory_allocated() / MB
+    }
+
+
+class MemoryTracker:
+    """Per-stage memory peaks for one request; a no-op when disabled"""
+
+    def __init__(self, enabled=True, trace_frames=1):
+        """
+        Args:
+            enabled: Record anything at all (stage() is free when False)
+            trace_frames: Traceback depth for tracemalloc (started on first use)
+        """
+        self.enabled = enabled
+        self.stages = {}
+        if enabled:
+            start_tracing(trace_frames)
+            self.start_rss = current_rss_mb()
+
+    @contextmanager
+    def stage(self, name):
+        """Measure the block as one stage; figures are process-wide"""
+        if not self.enabled:
+            yield
+            return
+
+        gc.collect()
+        rss_before = current_rss_mb()
+        per_stage_peak = reset_peak_rss()
+        tracemalloc.reset_peak()
+        py_before, _ = tracemalloc.get_traced_memory()
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            py_after, py_peak = tracemalloc.get_traced_memory()
+            entry = {
+                'seconds': time.perf_counter() - start,
+                'rss_before_mb': rss_before,
+                'rss_after_mb': current_rss_mb(),
+                'peak_rss_mb': peak_rss_mb(),
+                'peak_rss_is_per_stage': per_stage_peak,
+                'python_peak_mb': py_peak / MB,
+                'python_delta_mb': (py_after - py_before) / MB
+            }
+            if torch.cuda.is_available():
+                entry['cuda_peak_mb'] = torch.cuda.max_memory_allocated() / MB
+            self.stages[name] = entry
+
+    def summary(self):
+        """Per-stage figures plus the overall peak, for inclusion in the report"""
+        if not self.enabled:
+            return None
+        peaks = [s['peak_rss_mb'] for s in self.stages.values() if s['peak_rss_mb'] is not None]
+        return {
+            'stages': self.stages,
+            'start_rss_mb': self.start_rss,
+            'peak_rss_mb': max(peaks) if peaks else None,
+            'peak_stage': max(self.stages, key=lambda k: self.stages[k]['peak_rss_mb'] or 0) if self.stages else None,
+            'python_peak_mb': max((s['python_peak_mb'] for s in self.stages.values()), default=None)
+        }
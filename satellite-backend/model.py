@@ -5,6 +5,15 @@ import torch.nn as nn
 import torch.nn.functional as F
 import segmentation_models_pytorch as smp
 
+HEADS = ('change', 'vegetation', 'urban')
+
+def _fold_bn(conv, bn):
+    """Weight and bias of a conv followed by an eval-mode BatchNorm, as one conv"""
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    weight = conv.weight * scale.view(-1, 1, 1, 1)
+    bias = (conv.bias - bn.running_mean) * scale + bn.bias
+    return weight, bias
+
 class AttentionBlock(nn.Module):
     def __init__(self, in_channels):
         super().__init__()
@@ -14,6 +23,62 @@ class AttentionBlock(nn.Module):
         attention = torch.sigmoid(self.conv(x))
         return x * attention
 
+class FusedHeads(nn.Module):
+    """
+    Inference-only merge of the three task heads
+    
+    The heads' first 3x3 convs become one 128 -> 192 conv, their second convs
+    one 192 -> 96 conv with groups=3 and their 1x1 classifiers one grouped
+    1x1 conv (the change classifier padded to 3 outputs), with eval-mode
+    BatchNorm folded into the weights. The weights are non-persistent
+    buffers, so checkpoints keep the per-head layout.
+    """
+    def __init__(self, heads):
+        """
+        Args:
+            heads: The change, vegetation and urban head Sequentials, in HEADS order
+        """
+        super().__init__()
+        first, second, classifier = [], [], []
+        for head in heads:
+            first.append(_fold_bn(head[0], head[1]))
+            second.append(_fold_bn(head[3], head[4]))
+            weight, bias = head[6].weight, head[6].bias
+            missing = 3 - weight.shape[0]
+            classifier.append((F.pad(weight, (0, 0, 0, 0, 0, 0, 0, missing)), F.pad(bias, (0, missing))))
+        
+        for name, layers in (('first', first), ('second', second), ('classifier', classifier)):
+            self.register_buffer(f'{name}_weight', torch.cat([w for w, _ in layers]).detach(), persistent=False)
+            self.register_buffer(f'{name}_bias', torch.cat([b for _, b in layers]).detach(), persistent=False)
+    
+    def _weights(self, name, index):
+        weight = getattr(self, f'{name}_weight')
+        bias = getattr(self, f'{name}_bias')
+        if index is None:
+            return weight, bias
+        per_head = weight.shape[0] // len(HEADS)
+        return (weight.view(len(HEADS), per_head, *weight.shape[1:])[index].flatten(0, 1),
+                bias.view(len(HEADS), per_head)[index].flatten())
+    
+    def forward(self, x, heads=HEADS):
+        # Slice out the requested heads' filters; all three use the buffers as they are
+        index = None if len(heads) == len(HEADS) else torch.tensor([HEADS.index(h) for h in heads],
+                                                                     device=x.device)
+        groups = len(heads)
+        
+        weight, bias = self._weights('first', index)
+        x = F.relu(F.conv2d(x, weight, bias, padding=1), inplace=True)
+        weight, bias = self._weights('second', index)
+        x = F.relu(F.conv2d(x, weight, bias, padding=1, groups=groups), inplace=True)
+        weight, bias = self._weights('classifier', index)
+        x = F.conv2d(x, weight, bias, groups=groups)
+        
+        outputs = {}
+        for i, name in enumerate(heads):
+            logits = x[:, 3 * i:3 * i + 3]
+            outputs[name] = torch.sigmoid(logits[:, :1]) if name == 'change' else torch.softmax(logits, dim=1)
+        return outputs
+
 class ChangeDetectionModel(nn.Module):
     def __init__(self, in_channels=13, encoder_name='resnet34'):
         super().__init__()
@@ -65,11 +130,32 @@ class ChangeDetectionModel(nn.Module):
             nn.Conv2d(32, 3, kernel_size=1),  # 3 classes: no change, construction, demolition
             nn.Softmax(dim=1)
         )
+        
+        # Built by fuse_heads() for inference
+        self.fused_heads = None
     
-    def forward(self, img1, img2):
+    def forward(self, img1, img2, heads=None):
         # Extract features from both images
-        feat1 = self.encoder(img1)
-        feat2 = self.encoder(img2)
+        return self.compare(self.encode(img1), self.encode(img2), heads)
+    
+    def encode(self, img):
+        """Siamese branch: (B, C, H, W) image -> (B, 64, H, W) features, reusable across comparisons"""
+        return self.encoder(img)
+    
+    def compare(self, feat1, feat2, heads=None):
+        """
+        Predict change maps from the encoded features of two acquisitions
+        
+        Args:
+            heads: Names from HEADS to compute (default: all); only those keys are returned
+        """
+        if heads is None:
+            heads = HEADS
+        else:
+            unknown = set(heads) - set(HEADS)
+            if unknown:
+                raise ValueError(f"Unknown heads {sorted(unknown)}, expected a subset of {HEADS}")
+            heads = tuple(h for h in HEADS if h in heads)
         
         # Concatenate features
         combined = torch.cat([feat1, feat2], dim=1)
@@ -78,12 +164,34 @@ class ChangeDetectionModel(nn.Module):
         attended = self.attention(combined)
         
         # Generate predictions
-        change_map = self.change_head(attended)
-        vegetation_map = self.vegetation_head(attended)
-        urban_map = self.urban_head(attended)
+        if self.fused_heads is not None and not self.training:
+            return self.fused_heads(attended, heads)
+        return {name: getattr(self, f'{name}_head')(attended) for name in heads}
+    
+    def fuse_heads(self, tolerance=1e-4):
+        """
+        Build the fused inference heads from the current weights (after loading a checkpoint)
         
-        return {
-            'change': change_map,
-            'vegetation': vegetation_map,
-            'urban': urban_map
-        }
+        The fused heads are checked against the per-head path on a random input;
+        a difference above tolerance raises instead of silently changing outputs.
+        """
+        fused = FusedHeads([self.change_head, self.vegetation_head, self.urban_head])
+        was_training = self.training
+        self.eval()
+        try:
+            with torch.no_grad():
+                reference = self.change_head[0].weight
+                probe = torch.randn(1, reference.shape[1], 32, 32, device=reference.device, dtype=reference.dtype)
+                separate = {name: getattr(self, f'{name}_head')(probe) for name in HEADS}
+                difference = max(float((fused(probe)[name] - separate[name]).abs().max()) for name in HEADS)
+        finally:
+            self.train(was_training)
+        if difference > tolerance:
+            raise RuntimeError(f"Fused heads differ from the separate heads by {difference:.2e} "
+                               f"(tolerance {tolerance:.0e})")
+        self.fused_heads = fused
+        return self
+    
+    def unfuse_heads(self):
+        self.fused_heads = None
+        return self
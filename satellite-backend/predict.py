@@ -3,18 +3,33 @@
 import torch
 import numpy as np
 import rasterio
+import rasterio.windows
 import matplotlib.pyplot as plt
 import json
 import os
 from datetime import datetime
 import config
 from model import ChangeDetectionModel
-from analyzer import EnvironmentalAnalyzer
+from analyzer import EnvironmentalAnalyzer, TrendAccumulator
 from visualization import ChangeVisualizer
 from llm_explainer import LLMExplainer
+from explanation_cache import ExplanationCache
+from memory_tracker import MemoryTracker
+from feature_cache import FeatureCache, scene_key
+from tiling import tile_windows, run_tiled_inference, candidate_windows, map_divergence
+from roi import resolve_roi
+from zonal_stats import load_zones, write_zonal_csv
+from change_regions import extract_change_regions, summarize_regions, write_geojson
+from validity import validity_mask
 
 class ChangeDetectionPredictor:
-    def __init__(self, model_path):
+    def __init__(self, model_path, use_llm=True, feature_cache_mb=None):
+        """
+        Args:
+            model_path: Trained checkpoint, or None for untrained weights (benchmarks/load tests)
+            use_llm: Initialize the Gemini explainer
+            feature_cache_mb: Encoder feature cache budget, 0 = off (default config.FEATURE_CACHE_MB)
+        """
         # Try GPU first, fallback to CPU if memory issues
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         
@@ -26,13 +41,12 @@ class ChangeDetectionPredictor:
         else:
             print("💻 Using CPU (GPU not available)")
         
+        # Model loading is measured once so worker pools can be sized from it
+        self.init_memory = MemoryTracker(enabled=config.MEMORY_PROFILING,
+                                         trace_frames=config.MEMORY_TRACE_FRAMES)
         try:
-            self.model = ChangeDetectionModel(in_channels=13).to(self.device)
-            
-            # Load trained model
-            checkpoint = torch.load(model_path, map_location=self.device)
-            self.model.load_state_dict(checkpoint['model_state_dict'])
-            self.model.eval()
+            with self.init_memory.stage('load_model'):
+                self.model = self._load_model(model_path)
             
             # Enable memory efficient mode
             if torch.cuda.is_available():
@@ -43,37 +57,89 @@ class ChangeDetectionPredictor:
                 print("⚠️  GPU out of memory, switching to CPU...")
                 torch.cuda.empty_cache()
                 self.device = torch.device('cpu')
-                self.model = ChangeDetectionModel(in_channels=13).to(self.device)
-                checkpoint = torch.load(model_path, map_location=self.device)
-                self.model.load_state_dict(checkpoint['model_state_dict'])
-                self.model.eval()
+                self.model = self._load_model(model_path)
             else:
                 raise
         
         self.analyzer = EnvironmentalAnalyzer()
         self.visualizer = ChangeVisualizer()
+        if feature_cache_mb is None:
+            feature_cache_mb = config.FEATURE_CACHE_MB
+        self.feature_cache = FeatureCache(feature_cache_mb * 1024 * 1024) if feature_cache_mb else None
+        
+        self.llm_explainer = None
+        if use_llm:
+            self.init_llm_explainer()
+    
+    def init_llm_explainer(self):
+        """
+        Initialize the optional Gemini explainer and its cache
         
-        # Initialize LLM explainer (optional)
+        Pre-fork servers call this in each worker, so the SQLite cache
+        connection is never inherited across fork().
+        """
         try:
-            self.llm_explainer = LLMExplainer(model='gemini-2.5-flash-lite')
+            cache = None
+            if config.LLM_CACHE_ENABLED:
+                cache = ExplanationCache(
+                    config.LLM_CACHE_PATH,
+                    ttl_seconds=config.LLM_CACHE_TTL_HOURS * 3600,
+                    max_entries=config.LLM_CACHE_MAX_ENTRIES
+                )
+            self.llm_explainer = LLMExplainer(
+                model='gemini-2.5-flash-lite',
+                cache=cache,
+                cache_precision=config.LLM_CACHE_PRECISION,
+                base_url=config.LLM_BASE_URL
+            )
             print("✓ LLM explainer initialized")
         except Exception as e:
             print(f"⚠️  LLM explainer not available: {e}")
             self.llm_explainer = None
     
-    def load_image_bands(self, image_folder):
-        """Load all 13 bands from a folder"""
-        bands = []
-        for band_name in config.BAND_NAMES:
-            band_path = os.path.join(image_folder, f"{band_name}.tif")
-            with rasterio.open(band_path) as src:
-                band_data = src.read(1).astype(np.float32)
-                band_data = np.clip(band_data / 10000.0, 0, 1)
-                bands.append(band_data)
+    def _load_model(self, model_path):
+        """Build the model on self.device and load the trained checkpoint"""
+        model = ChangeDetectionModel(in_channels=13).to(self.device)
+        
+        if model_path is None:
+            print("⚠️  No checkpoint given, using untrained weights")
+        else:
+            # Load trained model
+            checkpoint = torch.load(model_path, map_location=self.device)
+            model.load_state_dict(checkpoint['model_state_dict'])
+        
+        model.eval()
+        if config.FUSED_HEADS:
+            model.fuse_heads()
+        return model
+    
+    def encode_scene(self, bands, tensor=None):
+        """
+        Encoder features for a (13, H, W) band stack, reused from the cache when
+        the same scene was encoded before
+        """
+        key = scene_key(bands) if self.feature_cache is not None else None
+        if key is not None:
+            features = self.feature_cache.get(key)
+            if features is not None:
+                return features
+        
+        if tensor is None:
+            tensor = torch.from_numpy(bands).unsqueeze(0).to(self.device)
+        with torch.no_grad():
+            features = self.model.encode(tensor)
         
-        return np.stack(bands, axis=0)
+        if key is not None:
+            self.feature_cache.put(key, features)
+        return features
     
-    def predict(self, img1_folder, img2_folder, date1=None, date2=None, location="Unknown"):
+    def load_image_bands(self, image_folder, out=None, window=None):
+        """Load all 13 bands from a folder (see load_bands)"""
+        return load_bands(image_folder, out, window)
+    
+    def predict(self, img1_folder, img2_folder, date1=None, date2=None, location="Unknown",
+                output_dir=None, generate_llm=True, on_event=None, memory_tracker=None, roi=None,
+                zones=None, coarse_to_fine=None, mask_clouds=None):
         """
         Predict changes between two satellite images
         
@@ -83,51 +149,156 @@ class ChangeDetectionPredictor:
             date1: Date of first image (YYYYMMDD format)
             date2: Date of second image (YYYYMMDD format)
             location: Name of the location
+            output_dir: Folder for results (default: results/<location>_<timestamp>)
+            generate_llm: Call the LLM explainer here; callers with their own (async)
+                          explainer pass False and use attach_explanations()
+            on_event: Optional callback ``on_event(name, data)`` invoked as soon as each
+                      part of the result exists ('model_predictions', one event per
+                      analyzer section, 'visualization' per saved image, 'report')
+            memory_tracker: MemoryTracker to record stages into (default: a new one
+                            when config.MEMORY_PROFILING is set)
+            roi: Optional region of interest (see roi.resolve_roi): a pixel bbox dict,
+                 GeoJSON polygon, bool mask or mask raster path. Only its window is
+                 read, only tiles touching it are inferred and statistics cover
+                 only its pixels.
+            zones: Optional label raster path, GeoJSON FeatureCollection (dict, string or
+                   file) or int array for per-zone statistics (see zonal_stats.load_zones)
+            coarse_to_fine: Infer only tiles whose spectral indices changed; the rest
+                            count as "no change" (default config.COARSE_TO_FINE)
+            mask_clouds: Leave cloudy pixels out along with no-data pixels (default
+                         config.CLOUD_MASKING; pass False for bands synthesized from RGB)
         
         Returns:
             Dictionary containing predictions and analysis
         """
+        memory = memory_tracker or MemoryTracker(enabled=config.MEMORY_PROFILING,
+                                                 trace_frames=config.MEMORY_TRACE_FRAMES)
+        region = resolve_roi(roi, img1_folder) if roi is not None else None
+        window = region.window if region is not None else None
+        
         print("Loading images...")
-        bands1 = self.load_image_bands(img1_folder)
-        bands2 = self.load_image_bands(img2_folder)
+        with memory.stage('load_bands'):
+            bands1 = self.load_image_bands(img1_folder, window=window)
+            bands2 = self.load_image_bands(img2_folder, window=window)
+            labels, zone_names = load_zones(zones, img1_folder, window) if zones is not None else (None, None)
+        
+        return self.predict_bands(bands1, bands2, date1, date2, location, output_dir=output_dir,
+                                  generate_llm=generate_llm, on_event=on_event, memory_tracker=memory,
+                                  roi=region, zones=labels, zone_names=zone_names,
+                                  georef=band_georef(img1_folder, window), coarse_to_fine=coarse_to_fine,
+                                  mask_clouds=mask_clouds)
+    
+    def predict_bands(self, bands1, bands2, date1=None, date2=None, location="Unknown",
+                      output_dir=None, generate_llm=True, on_event=None, memory_tracker=None,
+                      maps_out=None, roi=None, zones=None, zone_names=None, georef=None,
+                      coarse_to_fine=None, mask_clouds=None):
+        """
+        Predict changes between two already decoded (13, H, W) band stacks
+        
+        Args:
+            maps_out: Optional dict of preallocated 'change' (H, W), 'vegetation' and
+                      'urban' (3, H, W) arrays that receive the model output maps
+            roi: Optional roi.Region the bands were cropped to
+            zones: Optional (H, W) int label raster matching the bands; zone_names maps ids to names
+            georef: Optional (transform, crs) of the bands for the change-region polygons
+                    (default: pixel coordinates)
+            (other arguments as in predict)
         
-        # Convert to tensors
-        img1_tensor = torch.from_numpy(bands1).unsqueeze(0).to(self.device)
-        img2_tensor = torch.from_numpy(bands2).unsqueeze(0).to(self.device)
+        Returns:
+            Dictionary containing predictions and analysis
+        """
+        memory = memory_tracker or MemoryTracker(enabled=config.MEMORY_PROFILING,
+                                                 trace_frames=config.MEMORY_TRACE_FRAMES)
+        if coarse_to_fine is None:
+            coarse_to_fine = config.COARSE_TO_FINE
+        
+        # Pixels outside the ROI, no-data and cloudy pixels are neither inferred nor counted
+        roi_mask = roi.mask if roi is not None else None
+        with memory.stage('validity'):
+            valid, invalid_counts = validity_mask(
+                bands1, bands2, clouds=config.CLOUD_MASKING if mask_clouds is None else mask_clouds,
+                within=roi_mask
+            )
+        mask = roi_mask
+        if not valid.all():
+            mask = valid if mask is None else mask & valid
+        del valid
+        pixels = roi.pixels if roi is not None else bands1.shape[1] * bands1.shape[2]
+        valid_pixels = int(np.count_nonzero(mask)) if mask is not None else pixels
+        if valid_pixels == 0:
+            raise ValueError("No valid pixels: the scenes are entirely no-data or cloud covered")
         
         print("Running model inference...")
-        with torch.no_grad():
-            predictions = self.model(img1_tensor, img2_tensor)
+        with memory.stage('inference'):
+            change_map, vegetation_map, urban_map, tiles = self._run_model(
+                bands1, bands2, mask, coarse_to_fine, tiled=roi is not None
+            )
+        
+        if maps_out is not None:
+            maps_out['change'][...] = change_map
+            maps_out['vegetation'][...] = vegetation_map
+            maps_out['urban'][...] = urban_map
+        
+        if mask is not None:
+            model_predictions = self._summarize_maps(change_map[mask], vegetation_map[:, mask], urban_map[:, mask])
+        else:
+            model_predictions = self._summarize_maps(change_map, vegetation_map, urban_map)
+        self._emit(on_event, 'model_predictions', model_predictions)
         
-        # Convert predictions to numpy
-        change_map = predictions['change'].cpu().numpy()[0, 0]
-        vegetation_map = predictions['vegetation'].cpu().numpy()[0]
-        urban_map = predictions['urban'].cpu().numpy()[0]
+        with memory.stage('regions'):
+            transform, crs = georef or (None, None)
+            change_regions = extract_change_regions(change_map, vegetation_map, urban_map,
+                                                    transform=transform, crs=crs)
+        self._emit(on_event, 'change_regions', change_regions)
         
         print("Analyzing environmental changes...")
         # Generate detailed analysis
-        report = self.analyzer.generate_report(
-            bands1, bands2, date1, date2, location
-        )
+        with memory.stage('analysis'):
+            report = self.analyzer.generate_report(
+                bands1, bands2, date1, date2, location, mask=mask,
+                zones=zones, zone_names=zone_names
+            )
+        for section in ('metadata', 'vegetation_analysis', 'urban_analysis', 'water_analysis', 'summary',
+                        'zonal_analysis'):
+            if section in report:
+                self._emit(on_event, section, report[section])
         
         # Add model predictions to report
-        report['model_predictions'] = {
-            'total_change_percent': float(np.mean(change_map > config.CHANGE_THRESHOLD) * 100),
-            'vegetation_increase_pixels': int(np.sum(np.argmax(vegetation_map, axis=0) == 1)),
-            'vegetation_decrease_pixels': int(np.sum(np.argmax(vegetation_map, axis=0) == 2)),
-            'urban_construction_pixels': int(np.sum(np.argmax(urban_map, axis=0) == 1)),
-            'urban_demolition_pixels': int(np.sum(np.argmax(urban_map, axis=0) == 2))
+        report['model_predictions'] = model_predictions
+        report['change_regions'] = summarize_regions(change_regions)
+        report['validity'] = {
+            'valid_fraction': valid_pixels / pixels,
+            'valid_pixels': valid_pixels,
+            **invalid_counts,
+            'tiles_skipped_invalid': tiles['invalid'] if tiles is not None else 0
         }
+        self._emit(on_event, 'validity', report['validity'])
+        if roi is not None:
+            report['roi'] = {**roi.to_dict(), 'tiles': tiles['inferred']}
+        if coarse_to_fine:
+            report['coarse_to_fine'] = tiles
+            print(f"⏩ Coarse-to-fine: inferred {tiles['inferred']}/{tiles['total']} tiles "
+                  f"({tiles['skipped_fraction'] * 100:.1f}% skipped)")
         
         print("Generating visualizations...")
         # Create visualizations
-        output_dir = os.path.join(config.RESULTS_DIR, f"{location}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        if output_dir is None:
+            output_dir = os.path.join(config.RESULTS_DIR, f"{location}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
         os.makedirs(output_dir, exist_ok=True)
         
-        self.visualizer.create_change_visualization(
-            bands1, bands2, change_map, vegetation_map, urban_map,
-            output_path=os.path.join(output_dir, 'change_analysis.png')
-        )
+        with memory.stage('visualization'):
+            self.visualizer.create_change_visualization(
+                bands1, bands2, change_map, vegetation_map, urban_map,
+                output_path=os.path.join(output_dir, 'change_analysis.png'),
+                on_saved=lambda filename: self._emit(on_event, 'visualization', {'filename': filename})
+            )
+        
+        if memory.enabled:
+            report['memory_profile'] = memory.summary()
+        
+        write_geojson(change_regions, os.path.join(output_dir, 'change_regions.geojson'))
+        if 'zonal_analysis' in report:
+            write_zonal_csv(report['zonal_analysis'], os.path.join(output_dir, 'zonal_stats.csv'))
         
         # Save report
         report_path = os.path.join(output_dir, 'analysis_report.json')
@@ -136,17 +307,14 @@ class ChangeDetectionPredictor:
         
         # Generate text report
         self._generate_text_report(report, os.path.join(output_dir, 'report.txt'))
+        self._emit(on_event, 'report', {'output_dir': output_dir})
         
         # Generate LLM explanation if available
-        if self.llm_explainer:
+        if generate_llm and self.llm_explainer:
             try:
                 print("Generating LLM explanations...")
                 explanations = self.llm_explainer.generate_explanation(report)
-                report['llm_explanations'] = explanations
-                
-                # Save LLM report
-                self._generate_llm_report(report, explanations, 
-                                         os.path.join(output_dir, 'llm_report.txt'))
+                self.attach_explanations(report, explanations, output_dir)
                 print("✓ LLM explanations generated")
             except Exception as e:
                 print(f"⚠️  Could not generate LLM explanations: {e}")
@@ -154,6 +322,211 @@ class ChangeDetectionPredictor:
         print(f"\nResults saved to: {output_dir}")
         return report
     
+    def predict_series(self, image_folders, dates=None, location="Unknown", output_dir=None,
+                       on_event=None):
+        """
+        Analyze N acquisitions of one location in a single pass over the date stack
+        
+        Every scene is loaded, indexed and encoded exactly once. Each date is
+        compared with the previous one (consecutive) and with the first one
+        (cumulative), and per-pixel NDVI/NDBI/NDWI trends are accumulated on
+        the fly, so only the first and previous scenes' indices/features are
+        kept in memory.
+        
+        Args:
+            image_folders: Band folders in chronological order (at least 2)
+            dates: Matching dates (YYYYMMDD); trend time axis falls back to the index
+            location: Name of the location
+            output_dir: Folder for results (default: results/<location>_series_<timestamp>)
+            on_event: Optional callback ``on_event(name, data)`` per finished comparison
+                      ('consecutive', 'cumulative') and for 'trends' / 'report'
+        
+        Returns:
+            Dictionary with per-date statistics, consecutive/cumulative reports and trends
+        """
+        if len(image_folders) < 2:
+            raise ValueError("A time series needs at least two acquisitions")
+        dates = list(dates) if dates else [None] * len(image_folders)
+        if len(dates) != len(image_folders):
+            raise ValueError("Need one date per acquisition")
+        
+        years = _years_since_first(dates)
+        trends = {name: TrendAccumulator() for name in ('ndvi', 'ndbi', 'ndwi')}
+        acquisitions, consecutive, cumulative = [], [], []
+        first = previous = None
+        
+        for i, (folder, date) in enumerate(zip(image_folders, dates)):
+            print(f"Processing acquisition {i + 1}/{len(image_folders)} ({date or folder})...")
+            bands = self.load_image_bands(folder)
+            indices = self.analyzer.calculate_indices(bands)
+            features = self.encode_scene(bands)
+            del bands
+            
+            for name, accumulator in trends.items():
+                accumulator.update(years[i], indices[name])
+            acquisitions.append({
+                'date': date,
+                'mean_ndvi': float(np.mean(indices['ndvi'])),
+                'mean_ndbi': float(np.mean(indices['ndbi'])),
+                'mean_ndwi': float(np.mean(indices['ndwi']))
+            })
+            
+            current = {'date': date, 'indices': indices, 'features': features}
+            if previous is not None:
+                entry = self._compare_scenes(previous, current, location)
+                consecutive.append(entry)
+                self._emit(on_event, 'consecutive', entry)
+                # For the second date, first-vs-current is the consecutive comparison
+                if previous is not first:
+                    entry = self._compare_scenes(first, current, location)
+                cumulative.append(entry)
+                self._emit(on_event, 'cumulative', entry)
+            if first is None:
+                first = current
+            previous = current
+        
+        threshold = config.TREND_SLOPE_THRESHOLD
+        trend_summary = {name: accumulator.summary(threshold) for name, accumulator in trends.items()}
+        self._emit(on_event, 'trends', trend_summary)
+        
+        if output_dir is None:
+            output_dir = os.path.join(config.RESULTS_DIR,
+                                      f"{location}_series_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        os.makedirs(output_dir, exist_ok=True)
+        
+        for name, label, cmap in (('ndvi', 'NDVI', 'RdYlGn'), ('ndbi', 'NDBI', 'RdBu_r'), ('ndwi', 'NDWI', 'BrBG')):
+            slope = trends[name].slope()
+            np.save(os.path.join(output_dir, f"{name}_slope.npy"), slope)
+            limit = max(float(np.percentile(np.abs(slope), 99)), 1e-6)
+            self.visualizer._save_single_viz_with_colorbar(
+                slope, f"{label} trend (per year)", os.path.join(output_dir, f"{name}_trend.png"),
+                cmap=cmap, vmin=-limit, vmax=limit
+            )
+        
+        report = {
+            'metadata': {
+                'location': location,
+                'dates': dates,
+                'num_acquisitions': len(image_folders),
+                'analysis_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'image_resolution': '10m per pixel',
+                'trend_slope_threshold_per_year': threshold
+            },
+            'acquisitions': acquisitions,
+            'consecutive': consecutive,
+            'cumulative': cumulative,
+            'trends': trend_summary
+        }
+        
+        with open(os.path.join(output_dir, 'time_series_report.json'), 'w') as f:
+            json.dump(report, f, indent=4)
+        self._emit(on_event, 'report', {'output_dir': output_dir})
+        
+        print(f"\nResults saved to: {output_dir}")
+        return report
+    
+    def _run_model(self, bands1, bands2, mask=None, coarse_to_fine=False, tiled=False):
+        """
+        Change / vegetation / urban maps for two band stacks
+        
+        Whole scenes go through one forward pass (with cached encoder features)
+        unless tiled is set or some tiles hold no pixel of the mask (ROI and
+        validity); then only the tiles with mask pixels are inferred. Pixels
+        outside the mask are set to "no change". In coarse-to-fine mode a
+        spectral-index prefilter also drops the tiles without candidate change
+        pixels, and skipped tiles count as "no change".
+        
+        Returns:
+            (change (H, W), vegetation (3, H, W), urban (3, H, W), tile counts or None);
+            the tile counts dict has 'total', 'invalid' (no mask pixel), 'inferred' and
+            'skipped_fraction', in coarse-to-fine mode 'unchanged' (dropped by the
+            prefilter) and with config.COARSE_TO_FINE_VALIDATE 'divergence' from dense inference
+        """
+        all_windows = tile_windows(bands1.shape[1], bands1.shape[2])
+        windows = all_windows
+        if mask is not None:
+            windows = candidate_windows(mask, all_windows, threshold=0, min_pixels=1)
+        tiles = {'total': len(all_windows), 'invalid': len(all_windows) - len(windows)}
+        
+        if not (tiled or coarse_to_fine or tiles['invalid']):
+            img1_tensor = torch.from_numpy(bands1).unsqueeze(0).to(self.device)
+            img2_tensor = torch.from_numpy(bands2).unsqueeze(0).to(self.device)
+            with torch.no_grad():
+                feat1 = self.encode_scene(bands1, img1_tensor)
+                feat2 = self.encode_scene(bands2, img2_tensor)
+                predictions = self.model.compare(feat1, feat2)
+            change_map = predictions['change'].cpu().numpy()[0, 0]
+            vegetation_map = predictions['vegetation'].cpu().numpy()[0]
+            urban_map = predictions['urban'].cpu().numpy()[0]
+            tiles = None
+        else:
+            if coarse_to_fine:
+                score = self.analyzer.spectral_change(bands1, bands2)
+                if mask is not None:
+                    score[~mask] = 0
+                candidates = candidate_windows(score, windows)
+                del score
+                tiles['unchanged'] = len(windows) - len(candidates)
+                windows = candidates
+            tiles['inferred'] = len(windows)
+            tiles['skipped_fraction'] = 1 - len(windows) / tiles['total'] if tiles['total'] else 0.0
+            
+            outputs = run_tiled_inference(self.model, bands1, bands2, self.device, windows=windows)
+            change_map, vegetation_map, urban_map = outputs['change'], outputs['vegetation'], outputs['urban']
+        
+        if mask is not None:
+            outside = ~mask
+            change_map[outside] = 0
+            vegetation_map[:, outside] = 0
+            vegetation_map[0, outside] = 1
+            urban_map[:, outside] = 0
+            urban_map[0, outside] = 1
+        
+        if coarse_to_fine and config.COARSE_TO_FINE_VALIDATE:
+            dense = self._run_model(bands1, bands2, mask, coarse_to_fine=False, tiled=tiled)
+            tiles['divergence'] = map_divergence(
+                {'change': change_map, 'vegetation': vegetation_map, 'urban': urban_map},
+                {'change': dense[0], 'vegetation': dense[1], 'urban': dense[2]}
+            )
+        return change_map, vegetation_map, urban_map, tiles
+    
+    def _compare_scenes(self, before, after, location):
+        """Index report plus model predictions for two already processed acquisitions"""
+        report = self.analyzer.generate_report_from_indices(
+            before['indices'], after['indices'], before['date'], after['date'], location
+        )
+        with torch.no_grad():
+            predictions = self.model.compare(before['features'], after['features'])
+        report['model_predictions'] = self._summarize_maps(
+            predictions['change'].cpu().numpy()[0, 0],
+            predictions['vegetation'].cpu().numpy()[0],
+            predictions['urban'].cpu().numpy()[0]
+        )
+        return report
+    
+    @staticmethod
+    def _summarize_maps(change_map, vegetation_map, urban_map):
+        """Scene-level figures from the model's output maps"""
+        return {
+            'total_change_percent': float(np.mean(change_map > config.CHANGE_THRESHOLD) * 100),
+            'vegetation_increase_pixels': int(np.sum(np.argmax(vegetation_map, axis=0) == 1)),
+            'vegetation_decrease_pixels': int(np.sum(np.argmax(vegetation_map, axis=0) == 2)),
+            'urban_construction_pixels': int(np.sum(np.argmax(urban_map, axis=0) == 1)),
+            'urban_demolition_pixels': int(np.sum(np.argmax(urban_map, axis=0) == 2))
+        }
+    
+    @staticmethod
+    def _emit(on_event, name, data):
+        """Forward a partial result to the caller's callback, if any"""
+        if on_event is not None:
+            on_event(name, data)
+    
+    def attach_explanations(self, report, explanations, output_dir):
+        """Add LLM explanations to a report and save the LLM text report"""
+        report['llm_explanations'] = explanations
+        self._generate_llm_report(report, explanations,
+                                  os.path.join(output_dir, 'llm_report.txt'))
+    
     def _generate_text_report(self, report, output_path):
         """Generate human-readable text report"""
         with open(output_path, 'w') as f:
@@ -199,6 +572,42 @@ class ChangeDetectionPredictor:
             f.write(f"Water Loss Area: {water['water_loss_area_km2']:.2f} km²\n")
             f.write("\n")
             
+            # Pixel validity
+            if 'validity' in report:
+                f.write("PIXEL VALIDITY\n")
+                f.write("-" * 80 + "\n")
+                validity = report['validity']
+                f.write(f"Valid Pixels: {validity['valid_fraction'] * 100:.2f}%\n")
+                f.write(f"No-Data Pixels: {validity['nodata_pixels']}\n")
+                f.write(f"Cloud Pixels: {validity['cloud_pixels']}\n")
+                f.write(f"Tiles Skipped (no valid pixels): {validity['tiles_skipped_invalid']}\n")
+                f.write("\n")
+            
+            # Coarse-to-fine inference
+            if 'coarse_to_fine' in report:
+                f.write("COARSE-TO-FINE INFERENCE\n")
+                f.write("-" * 80 + "\n")
+                tiles = report['coarse_to_fine']
+                f.write(f"Tiles Inferred: {tiles['inferred']} of {tiles['total']} "
+                        f"({tiles['skipped_fraction'] * 100:.1f}% skipped)\n")
+                if 'divergence' in tiles:
+                    divergence = tiles['divergence']
+                    f.write(f"Change Mask IoU vs Dense: {divergence['change_mask_iou']:.4f}\n")
+                    f.write(f"Change Mask Disagreement: {divergence['change_mask_disagreement_percent']:.3f}%\n")
+                    f.write(f"Mean |Change Probability Difference|: {divergence['mean_abs_change_diff']:.5f}\n")
+                f.write("\n")
+            
+            # Change regions
+            if 'change_regions' in report:
+                f.write("CHANGE REGIONS\n")
+                f.write("-" * 80 + "\n")
+                regions = report['change_regions']
+                f.write(f"Regions: {regions['count']} ({regions['total_area_km2']:.2f} km² total, "
+                        f"largest {regions['largest_area_km2']:.2f} km²)\n")
+                for change, count in regions['by_dominant_change'].items():
+                    f.write(f"  {change.replace('_', ' ').title()}: {count}\n")
+                f.write("\n")
+            
             # Summary
             f.write("SUMMARY\n")
             f.write("-" * 80 + "\n")
@@ -272,32 +681,131 @@ class ChangeDetectionPredictor:
             
             f.write("=" * 80 + "\n")
 
+def _years_since_first(dates):
+    """Time axis for trends: years since the first date, or the acquisition index if dates are missing"""
+    try:
+        parsed = [datetime.strptime(str(d), '%Y%m%d') for d in dates]
+    except (TypeError, ValueError):
+        return [float(i) for i in range(len(dates))]
+    return [(d - parsed[0]).days / 365.25 for d in parsed]
+
+def band_shape(image_folder):
+    """(height, width) of a band folder, read from the first band's header"""
+    with rasterio.open(os.path.join(image_folder, f"{config.BAND_NAMES[0]}.tif")) as src:
+        return src.height, src.width
+
+def band_georef(image_folder, window=None):
+    """(transform, crs string or None) of a band folder, or of a window of it"""
+    with rasterio.open(os.path.join(image_folder, f"{config.BAND_NAMES[0]}.tif")) as src:
+        transform = rasterio.windows.transform(window, src.transform) if window is not None else src.transform
+        return transform, src.crs.to_string() if src.crs else None
+
+def load_bands(image_folder, out=None, window=None):
+    """
+    Load all 13 bands from a folder, scaled to [0, 1]
+    
+    Args:
+        image_folder: Folder with one <band>.tif per band
+        out: Optional preallocated (13, H, W) float32 array (e.g. in shared memory)
+             to decode into instead of allocating a new stack
+        window: Optional rasterio Window; only that part of each band is read
+    
+    Pixels equal to a band's raster nodata value are zeroed in every band, so
+    validity.nodata_mask sees them like zero-filled borders.
+    """
+    bands = []
+    nodata = None
+    for i, band_name in enumerate(config.BAND_NAMES):
+        band_path = os.path.join(image_folder, f"{band_name}.tif")
+        with rasterio.open(band_path) as src:
+            raw = src.read(1, window=window)
+            if src.nodata is not None:
+                missing = raw == src.nodata
+                nodata = missing if nodata is None else nodata | missing
+            band_data = np.clip(raw.astype(np.float32) / 10000.0, 0, 1)
+            if out is not None:
+                out[i] = band_data
+            else:
+                bands.append(band_data)
+    
+    stack = out if out is not None else np.stack(bands, axis=0)
+    if nodata is not None and nodata.any():
+        stack[:, nodata] = 0
+    return stack
+
 def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Satellite Change Detection and Analysis')
-    parser.add_argument('--img1', required=True, help='Path to before image folder')
-    parser.add_argument('--img2', required=True, help='Path to after image folder')
+    parser.add_argument('--img1', help='Path to before image folder')
+    parser.add_argument('--img2', nargs='+',
+                        help='Path to after image folder(s); several dates reuse the encoded before image')
     parser.add_argument('--date1', help='Date of first image (YYYYMMDD)')
-    parser.add_argument('--date2', help='Date of second image (YYYYMMDD)')
+    parser.add_argument('--date2', nargs='+', help='Date of each after image (YYYYMMDD)')
     parser.add_argument('--location', default='Unknown', help='Location name')
     parser.add_argument('--model', default='models/best_model.pth', help='Path to trained model')
+    parser.add_argument('--coarse-to-fine', action='store_true',
+                        help='Infer only tiles with spectral change (skipped tiles count as no change)')
+    parser.add_argument('--zones', help='Label raster or GeoJSON of zones for per-zone statistics')
+    parser.add_argument('--series', nargs='+', help='Time-series mode: band folders in chronological order')
+    parser.add_argument('--dates', nargs='+', help='Date of each --series folder (YYYYMMDD)')
     
     args = parser.parse_args()
     
-    predictor = ChangeDetectionPredictor(args.model)
-    report = predictor.predict(
-        args.img1, args.img2,
-        args.date1, args.date2,
-        args.location
+    if args.series:
+        predictor = ChangeDetectionPredictor(args.model, feature_cache_mb=config.CLI_FEATURE_CACHE_MB)
+        report = predictor.predict_series(args.series, args.dates, args.location)
+        print("\n" + "=" * 80)
+        print(f"TIME SERIES COMPLETE ({report['metadata']['num_acquisitions']} acquisitions)")
+        print("=" * 80)
+        for entry in report['consecutive']:
+            print(f"\n{entry['metadata']['date_before']} -> {entry['metadata']['date_after']}:")
+            for item in entry['summary']:
+                print(f"  • {item}")
+        ndvi = report['trends']['ndvi']
+        print(f"\nNDVI trend: {ndvi['mean_slope_per_year']:+.4f}/year "
+              f"({ndvi['increasing_percent']:.1f}% greening, {ndvi['decreasing_percent']:.1f}% browning)")
+        return
+    
+    if not args.img1 or not args.img2:
+        parser.error('--img1 and --img2 are required (or use --series)')
+    
+    dates2 = args.date2 or [None] * len(args.img2)
+    if len(dates2) != len(args.img2):
+        parser.error('--date2 needs one date per --img2 folder')
+    
+    # Several after images share the before image's encoder pass through the cache
+    predictor = ChangeDetectionPredictor(
+        args.model, feature_cache_mb=config.CLI_FEATURE_CACHE_MB if len(args.img2) > 1 else 0
     )
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    for i, (img2, date2) in enumerate(zip(args.img2, dates2)):
+        output_dir = None
+        if len(args.img2) > 1:
+            output_dir = os.path.join(config.RESULTS_DIR, f"{args.location}_{timestamp}_{date2 or i}")
+        report = predictor.predict(
+            args.img1, img2,
+            args.date1, date2,
+            args.location,
+            output_dir=output_dir,
+            zones=args.zones,
+            coarse_to_fine=args.coarse_to_fine or None
+        )
+        
+        print("\n" + "=" * 80)
+        print(f"ANALYSIS COMPLETE{f' ({date2 or img2})' if len(args.img2) > 1 else ''}")
+        print("=" * 80)
+        print("\nKey Findings:")
+        for item in report['summary']:
+            print(f"  • {item}")
+        for zone in report.get('zonal_analysis', {}).values():
+            print(f"  {zone['name']}: NDVI {zone['vegetation_analysis']['mean_ndvi_change']:+.3f}, "
+                  f"construction {zone['urban_analysis']['construction_area_km2']:.2f} km²")
     
-    print("\n" + "=" * 80)
-    print("ANALYSIS COMPLETE")
-    print("=" * 80)
-    print("\nKey Findings:")
-    for item in report['summary']:
-        print(f"  • {item}")
+    if predictor.feature_cache is not None and len(args.img2) > 1:
+        stats = predictor.feature_cache.stats()
+        print(f"\nEncoder passes: {stats['misses']} for {len(args.img2)} comparisons "
+              f"({stats['hits']} served from the feature cache)")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,169 @@
+"""
+Region-of-interest handling
+Turns a pixel bbox, a GeoJSON polygon or a mask into the smallest pixel
+window of the scene plus a mask inside it, so only that window is read,
+inferred and analyzed
+"""
+
+import os
+import json
+import math
+import numpy as np
+import rasterio
+from rasterio import features
+from rasterio.windows import Window
+import rasterio.windows
+import config
+
+GEOJSON_TYPES = ('Polygon', 'MultiPolygon', 'Feature', 'FeatureCollection')
+
+
+class Region:
+    """Pixel window (row, col, height, width) of a scene plus an optional mask inside it"""
+
+    def __init__(self, row, col, height, width, mask=None, scene_shape=None):
+        """
+        Args:
+            row, col, height, width: Window in scene pixels
+            mask: Optional (height, width) bool array; None means the whole window
+            scene_shape: (H, W) of the full scene, for reporting
+        """
+        self.row = row
+        self.col = col
+        self.height = height
+        self.width = width
+        self.mask = mask
+        self.scene_shape = scene_shape
+
+    @property
+    def window(self):
+        return Window(self.col, self.row, self.width, self.height)
+
+    @property
+    def pixels(self):
+        return int(self.mask.sum()) if self.mask is not None else self.height * self.width
+
+    def to_dict(self):
+        info = {
+            'bbox': [self.col, self.row, self.col + self.width, self.row + self.height],
+            'pixels': self.pixels,
+            'masked': self.mask is not None
+        }
+        if self.scene_shape is not None:
+            scene_pixels = self.scene_shape[0] * self.scene_shape[1]
+            info['scene_pixels'] = scene_pixels
+            info['scene_fraction'] = self.pixels / scene_pixels if scene_pixels else 0.0
+        return info
+
+
+def parse_roi(value):
+    """
+    Validate an ROI given as a JSON string or dict (API query parameter)
+
+    Accepted: {"bbox": [x0, y0, x1, y1]} in pixels, or a GeoJSON Polygon,
+    MultiPolygon, Feature or FeatureCollection.
+
+    Raises:
+        ValueError: if the value is not a supported ROI
+    """
+    roi = json.loads(value) if isinstance(value, str) else value
+    if not isinstance(roi, dict):
+        raise ValueError("ROI must be a JSON object")
+    if 'bbox' in roi and roi.get('type') not in GEOJSON_TYPES:
+        bbox = roi['bbox']
+        if len(bbox) != 4 or not all(isinstance(v, (int, float)) for v in bbox):
+            raise ValueError("bbox must be [x0, y0, x1, y1] in pixels")
+        if bbox[2] <= bbox[0] or bbox[3] <= bbox[1]:
+            raise ValueError("bbox must have x1 > x0 and y1 > y0")
+        return roi
+    if roi.get('type') in GEOJSON_TYPES:
+        if not _geometries(roi):
+            raise ValueError("GeoJSON ROI contains no geometry")
+        return roi
+    raise ValueError("ROI must be a {'bbox': [...]} object or a GeoJSON polygon")
+
+
+def _geometries(geojson):
+    if geojson['type'] == 'FeatureCollection':
+        return [f['geometry'] for f in geojson.get('features', []) if f.get('geometry')]
+    if geojson['type'] == 'Feature':
+        return [geojson['geometry']] if geojson.get('geometry') else []
+    return [geojson]
+
+
+def _bounds_to_window(bounds, transform, height, width):
+    """Pixel (row, col, h, w) covering map-space bounds, clipped to the scene"""
+    inverse = ~transform
+    corners = [inverse * (x, y) for x in (bounds[0], bounds[2]) for y in (bounds[1], bounds[3])]
+    cols = [c for c, _ in corners]
+    rows = [r for _, r in corners]
+    col0 = max(int(math.floor(min(cols))), 0)
+    row0 = max(int(math.floor(min(rows))), 0)
+    col1 = min(int(math.ceil(max(cols))), width)
+    row1 = min(int(math.ceil(max(rows))), height)
+    return row0, col0, max(row1 - row0, 0), max(col1 - col0, 0)
+
+
+def _region_from_mask(mask, scene_shape):
+    """Crop a full-scene mask to the bbox of its True pixels"""
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if not len(rows):
+        raise ValueError("ROI mask selects no pixels")
+    row0, row1 = rows[0], rows[-1] + 1
+    col0, col1 = cols[0], cols[-1] + 1
+    crop = mask[row0:row1, col0:col1]
+    return Region(int(row0), int(col0), int(row1 - row0), int(col1 - col0),
+                  None if crop.all() else crop.copy(), scene_shape)
+
+
+def resolve_roi(roi, image_folder):
+    """
+    Resolve an ROI against a band folder's size and georeferencing
+
+    Args:
+        roi: Region, {"bbox": [x0, y0, x1, y1]} (pixels), GeoJSON dict (scene CRS,
+             or pixel x/y for rasters without georeferencing), JSON string of
+             either, bool mask array of the scene's shape, or a path to a mask raster
+        image_folder: Band folder the ROI refers to
+
+    Returns:
+        Region clipped to the scene
+    """
+    if isinstance(roi, Region):
+        return roi
+
+    with rasterio.open(os.path.join(image_folder, f"{config.BAND_NAMES[0]}.tif")) as src:
+        height, width, transform = src.height, src.width, src.transform
+    scene_shape = (height, width)
+
+    if isinstance(roi, str) and os.path.exists(roi):
+        with rasterio.open(roi) as src:
+            roi = src.read(1) > 0
+    if isinstance(roi, np.ndarray):
+        if roi.shape != scene_shape:
+            raise ValueError(f"ROI mask is {roi.shape[1]}x{roi.shape[0]}, scene is {width}x{height}")
+        return _region_from_mask(roi.astype(bool), scene_shape)
+
+    roi = parse_roi(roi)
+    if roi.get('type') not in GEOJSON_TYPES:
+        x0, y0, x1, y1 = (int(round(v)) for v in roi['bbox'])
+        col0, row0 = max(x0, 0), max(y0, 0)
+        col1, row1 = min(x1, width), min(y1, height)
+        if col1 <= col0 or row1 <= row0:
+            raise ValueError("ROI bbox does not intersect the scene")
+        return Region(row0, col0, row1 - row0, col1 - col0, None, scene_shape)
+
+    # Rasterize only inside the polygons' bounding window, not over the whole scene
+    geometries = _geometries(roi)
+    bounds = [features.bounds(geometry) for geometry in geometries]
+    total = (min(b[0] for b in bounds), min(b[1] for b in bounds),
+             max(b[2] for b in bounds), max(b[3] for b in bounds))
+    row, col, h, w = _bounds_to_window(total, transform, height, width)
+    if h == 0 or w == 0:
+        raise ValueError("ROI polygon does not intersect the scene")
+    window_transform = rasterio.windows.transform(Window(col, row, w, h), transform)
+    mask = features.rasterize([(g, 1) for g in geometries], out_shape=(h, w),
+                              transform=window_transform, fill=0, dtype='uint8').astype(bool)
+    region = _region_from_mask(mask, (h, w))
+    return Region(row + region.row, col + region.col, region.height, region.width, region.mask, scene_shape)
@@ -0,0 +1,187 @@
+"""
+Pre-fork API server: load the model once, share it with N workers
+The parent process loads the checkpoint, moves the weights into shared
+memory and forks worker processes that all accept on one listening socket.
+Workers inherit the weights instead of loading their own copy, so each
+added worker costs only its activations and Python heap.
+
+    python serve.py --workers 4 --port 8000
+
+Linux/macOS only (needs os.fork). Inference runs on CPU, since CUDA
+contexts do not survive fork(); use `python main.py` for GPU serving.
+"""
+
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+sys.path.append(str(BASE_DIR))
+
+from dotenv import load_dotenv
+load_dotenv(BASE_DIR.parent / '.env')
+
+# Hide GPUs before torch initializes: workers share CPU weights
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import torch
+import uvicorn  # Imported before fork so its pages are shared too
+from predict import ChangeDetectionPredictor
+from memory_tracker import process_memory_mb
+
+
+def load_shared_predictor(model_path):
+    """Build the predictor in the parent and place its weights in shared memory"""
+    # No intra-op thread pool in the parent: OpenMP pools do not survive fork()
+    torch.set_num_threads(1)
+    predictor = ChangeDetectionPredictor(model_path, use_llm=False)
+    predictor.model.share_memory()
+    for param in predictor.model.parameters():
+        param.requires_grad_(False)
+    return predictor
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(worker_id, predictor, sock, threads):
+    """Body of a forked worker: attach the shared predictor to the app and serve"""
+    torch.set_num_threads(threads)
+    # The SQLite-backed caches/indexes are opened here, after fork()
+    predictor.init_llm_explainer()
+
+    import main
+    main.predictor = predictor
+    main.run_storage_sweeper = worker_id == 0
+
+    server = uvicorn.Server(uvicorn.Config(main.app, log_level='info'))
+    server.run(sockets=[sock])
+
+
+class PreforkServer:
+    """Forks workers, restarts the ones that die and forwards shutdown signals"""
+
+    def __init__(self, predictor, sock, workers, threads):
+        self.predictor = predictor
+        self.sock = sock
+        self.workers = workers
+        self.threads = threads
+        self.children = {}  # pid -> worker_id
+        self.stopping = False
+
+    def spawn(self, worker_id):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            exit_code = 0
+            try:
+                run_worker(worker_id, self.predictor, self.sock, self.threads)
+            except BaseException as e:
+                print(f"❌ Worker {worker_id} crashed: {e}")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        self.children[pid] = worker_id
+        print(f"👷 Worker {worker_id} started (pid {pid}, {self.threads} threads)")
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def memory_report(self):
+        """Parent and worker RSS/PSS; PSS counts the shared weights once overall"""
+        rows = [('parent', os.getpid())]
+        rows += sorted(((f"worker {w}", pid) for pid, w in self.children.items()))
+        print(f"\n{'process':>10} {'pid':>8} {'RSS (MB)':>10} {'PSS (MB)':>10} {'shared (MB)':>12}")
+        total_pss = 0.0
+        for name, pid in rows:
+            mem = process_memory_mb(pid)
+            if not mem:
+                print(f"{name:>10} {pid:>8}   (memory figures need Linux /proc)")
+                continue
+            shared = mem.get('shared_clean', 0.0) + mem.get('shared_dirty', 0.0)
+            total_pss += mem.get('pss', 0.0)
+            print(f"{name:>10} {pid:>8} {mem.get('rss', 0.0):>10.0f} {mem.get('pss', 0.0):>10.0f} {shared:>12.0f}")
+        print(f"{'total PSS':>10} {'':>8} {'':>10} {total_pss:>10.0f}\n")
+
+    def run(self, memory_report_after=None):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        # Freeze everything allocated so far so the collector never writes to the shared pages
+        gc.collect()
+        gc.freeze()
+
+        for worker_id in range(self.workers):
+            self.spawn(worker_id)
+
+        report_at = time.monotonic() + memory_report_after if memory_report_after else None
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                if report_at is not None and time.monotonic() >= report_at:
+                    self.memory_report()
+                    report_at = None
+                time.sleep(0.5)
+                continue
+
+            worker_id = self.children.pop(pid)
+            if not self.stopping:
+                print(f"⚠️  Worker {worker_id} (pid {pid}) exited with status {status}, restarting")
+                self.spawn(worker_id)
+
+        print("👋 All workers stopped")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve the API from N pre-forked workers sharing one model')
+    parser.add_argument('--host', default='0.0.0.0', help='Bind address')
+    parser.add_argument('--port', type=int, default=8000, help='Port')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes')
+    parser.add_argument('--threads', type=int, help='Torch threads per worker (default: cores / workers)')
+    parser.add_argument('--model', default=str(BASE_DIR / 'models' / 'best_model.pth'), help='Checkpoint')
+    parser.add_argument('--memory-report', type=float, default=15,
+                        help='Print per-process RSS/PSS this many seconds after startup (0 = off)')
+
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        raise SystemExit("serve.py needs os.fork(); use `python main.py` on this platform")
+
+    if not os.path.exists(args.model):
+        print(f"⚠️  Model not found at {args.model}")
+        raise SystemExit(1)
+
+    print("🚀 Loading AI model once for all workers...")
+    predictor = load_shared_predictor(args.model)
+    print("✅ Model loaded into shared memory")
+
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+    sock = bind_socket(args.host, args.port)
+    print(f"🌐 Listening on http://{args.host}:{args.port} with {args.workers} workers")
+
+    PreforkServer(predictor, sock, args.workers, threads).run(args.memory_report or None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+Retention and compaction for the uploads/ and results/ storage
+Keeps disk usage bounded by age and total size
+"""
+
+import gzip
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+import config
+
+# Derived reports that are only downloaded by humans, never read back by the API
+COMPRESSIBLE_REPORTS = ('analysis_report.json', 'report.txt', 'llm_report.txt')
+
+# Raw inputs written by /api/analyze; everything else in an upload folder is derived
+RAW_BAND_DIRS = ('before', 'after')
+
+
+def directory_size(path):
+    """Total size in bytes of all files below path"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class StorageManager:
+    """Enforces retention and compaction for analysis uploads and results"""
+
+    def __init__(self, index, upload_dir, results_dir,
+                 max_age_days=None, max_total_bytes=None, compress_after_days=None):
+        """
+        Args:
+            index: AnalysisIndex tracking every analysis
+            upload_dir: Root of backend/uploads
+            results_dir: Root of results/
+            max_age_days: Delete analyses older than this (default: config.STORAGE_MAX_AGE_DAYS)
+            max_total_bytes: Delete oldest analyses above this size (default: config.STORAGE_MAX_TOTAL_GB)
+            compress_after_days: Gzip reports older than this (default: config.STORAGE_COMPRESS_AFTER_DAYS)
+        """
+        self.index = index
+        self.upload_dir = Path(upload_dir)
+        self.results_dir = Path(results_dir)
+        self.max_age_days = max_age_days if max_age_days is not None else config.STORAGE_MAX_AGE_DAYS
+        self.max_total_bytes = (max_total_bytes if max_total_bytes is not None
+                                else int(config.STORAGE_MAX_TOTAL_GB * 1024 ** 3))
+        self.compress_after_days = (compress_after_days if compress_after_days is not None
+                                    else config.STORAGE_COMPRESS_AFTER_DAYS)
+        self.last_sweep = None
+
+    def analysis_size(self, entry):
+        """Measure the on-disk size of one indexed analysis"""
+        size = 0
+        if entry['upload_dir'] and os.path.isdir(entry['upload_dir']):
+            size += directory_size(entry['upload_dir'])
+        if entry['result_folder']:
+            result_path = self.results_dir / entry['result_folder']
+            if result_path.is_dir():
+                size += directory_size(result_path)
+        return size
+
+    def finalize_analysis(self, analysis_id, keep_raw_bands=None):
+        """
+        Post-process a finished analysis
+
+        Removes the raw band inputs (the 26 uploaded or converted .tif files)
+        unless configured otherwise, then records the remaining size.
+        """
+        if keep_raw_bands is None:
+            keep_raw_bands = config.STORAGE_KEEP_RAW_BANDS
+
+        entry = self.index.get(analysis_id)
+        if entry is None:
+            return
+
+        if not keep_raw_bands:
+            for name in RAW_BAND_DIRS:
+                raw_dir = Path(entry['upload_dir']) / name
+                if raw_dir.is_dir():
+                    shutil.rmtree(raw_dir, ignore_errors=True)
+
+        self.index.set_size(analysis_id, self.analysis_size(entry))
+
+    def delete_analysis(self, entry):
+        """Remove an analysis from disk and from the index; returns freed bytes"""
+        freed = 0
+        paths = [Path(entry['upload_dir'])]
+        if entry['result_folder']:
+            paths.append(self.results_dir / entry['result_folder'])
+
+        for path in paths:
+            if path.is_dir():
+                freed += directory_size(path)
+                shutil.rmtree(path, ignore_errors=True)
+
+        self.index.remove(entry['analysis_id'])
+        return freed
+
+    def compress_reports(self, result_path):
+        """Gzip the text/JSON reports in a result folder; returns bytes saved"""
+        saved = 0
+        for name in COMPRESSIBLE_REPORTS:
+            src = Path(result_path) / name
+            if not src.exists():
+                continue
+            dst = src.with_name(src.name + '.gz')
+            before = src.stat().st_size
+            with open(src, 'rb') as f_in, gzip.open(dst, 'wb') as f_out:
+                shutil.copyfileobj(f_in, f_out)
+            src.unlink()
+            saved += before - dst.stat().st_size
+        return saved
+
+    def sweep(self):
+        """
+        Run one retention/compaction pass
+
+        0. Measure analyses whose size is not recorded yet
+        1. Delete finished analyses older than max_age_days
+        2. Gzip reports of analyses older than compress_after_days
+        3. Delete the oldest finished analyses until the total fits max_total_bytes
+        4. Delete result folders older than max_age_days that no analysis references
+           (e.g. runs of predict.py from the command line)
+
+        Returns:
+            Dictionary summarizing what was removed or compacted
+        """
+        start_time = time.perf_counter()
+        now = datetime.now()
+        stats = {'deleted': 0, 'compressed': 0, 'orphans_deleted': 0, 'bytes_freed': 0}
+
+        # Analyses imported from before sizes were tracked start at 0 bytes
+        for entry in self.index.list_finished():
+            if not entry['size_bytes']:
+                self.index.set_size(entry['analysis_id'], self.analysis_size(entry))
+
+        if self.max_age_days:
+            cutoff = (now - timedelta(days=self.max_age_days)).isoformat()
+            for entry in self.index.list_finished(older_than=cutoff):
+                stats['bytes_freed'] += self.delete_analysis(entry)
+                stats['deleted'] += 1
+
+        if self.compress_after_days is not None:
+            cutoff = (now - timedelta(days=self.compress_after_days)).isoformat()
+            for entry in self.index.list_finished(older_than=cutoff):
+                if not entry['result_folder']:
+                    continue
+                result_path = self.results_dir / entry['result_folder']
+                if not result_path.is_dir():
+                    continue
+                saved = self.compress_reports(result_path)
+                if saved:
+                    stats['compressed'] += 1
+                    stats['bytes_freed'] += saved
+                    self.index.set_size(entry['analysis_id'], self.analysis_size(entry))
+
+        if self.max_total_bytes:
+            total = self.index.usage()['size_bytes']
+            if total > self.max_total_bytes:
+                for entry in self.index.list_finished():
+                    if total <= self.max_total_bytes:
+                        break
+                    freed = self.delete_analysis(entry)
+                    total -= max(entry['size_bytes'], freed)
+                    stats['bytes_freed'] += freed
+                    stats['deleted'] += 1
+
+        if self.max_age_days and self.results_dir.is_dir():
+            referenced = self.index.result_folders()
+            cutoff_ts = (now - timedelta(days=self.max_age_days)).timestamp()
+            for entry in os.scandir(self.results_dir):
+                if (entry.is_dir() and entry.name not in referenced
+                        and entry.stat().st_mtime < cutoff_ts):
+                    stats['bytes_freed'] += directory_size(entry.path)
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    stats['orphans_deleted'] += 1
+
+        stats['duration_seconds'] = time.perf_counter() - start_time
+        self.last_sweep = {'finished_at': datetime.now().isoformat(), **stats}
+        return stats
+
+    def usage(self):
+        """Disk usage summary for the API"""
+        usage = self.index.usage()
+        disk = shutil.disk_usage(self.upload_dir)
+        return {
+            'analyses': usage['analyses'],
+            'size_bytes': usage['size_bytes'],
+            'by_status': usage['by_status'],
+            'limits': {
+                'max_age_days': self.max_age_days,
+                'max_total_bytes': self.max_total_bytes,
+                'compress_after_days': self.compress_after_days
+            },
+            'disk': {
+                'total_bytes': disk.total,
+                'used_bytes': disk.used,
+                'free_bytes': disk.free
+            },
+            'last_sweep': self.last_sweep
+        }
@@ -0,0 +1,167 @@
+"""Tiled inference for scenes larger than one model input"""
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+import config
+
+# The U-Net encoder downsamples 5 times, so inputs must be a multiple of 32
+MODEL_STRIDE = 32
+
+
+def tile_windows(height, width, tile_size=None, overlap=None):
+    """
+    Split a scene into (y, x, h, w) windows of at most tile_size pixels
+
+    Consecutive windows overlap by ``overlap`` pixels and the last row/column
+    is shifted back to end exactly on the scene border, so every window is
+    full-size whenever the scene is at least one tile large.
+    """
+    tile_size = tile_size or config.TILE_SIZE
+    overlap = config.TILE_OVERLAP if overlap is None else overlap
+    step = max(tile_size - overlap, 1)
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        positions.append(length - tile_size)
+        return positions
+
+    return [
+        (y, x, min(tile_size, height - y), min(tile_size, width - x))
+        for y in starts(height)
+        for x in starts(width)
+    ]
+
+
+def candidate_windows(score, windows, threshold=None, min_pixels=None):
+    """
+    Keep the windows with at least min_pixels pixels whose score exceeds threshold
+
+    Per-window counts come from a summed-area table, so the cost is one pass
+    over the scene regardless of the number of windows.
+
+    Args:
+        score: (H, W) per-pixel change score (e.g. EnvironmentalAnalyzer.spectral_change)
+        windows: (y, x, h, w) windows to filter
+        threshold: Score above which a pixel is a candidate (default config.PREFILTER_DELTA)
+        min_pixels: Candidates a window needs (default config.PREFILTER_MIN_PIXELS)
+    """
+    threshold = config.PREFILTER_DELTA if threshold is None else threshold
+    min_pixels = config.PREFILTER_MIN_PIXELS if min_pixels is None else min_pixels
+
+    table = np.zeros((score.shape[0] + 1, score.shape[1] + 1), dtype=np.int32)
+    np.cumsum(score > threshold, axis=0, dtype=np.int32, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+
+    def count(y, x, h, w):
+        return table[y + h, x + w] - table[y, x + w] - table[y + h, x] + table[y, x]
+
+    return [window for window in windows if count(*window) >= max(min_pixels, 1)]
+
+
+def map_divergence(sparse, dense, threshold=None):
+    """
+    How far coarse-to-fine output maps are from dense inference
+
+    Args:
+        sparse, dense: Output dicts with 'change' (H, W), 'vegetation' and 'urban' (3, H, W)
+        threshold: Change threshold (default config.CHANGE_THRESHOLD)
+    """
+    threshold = config.CHANGE_THRESHOLD if threshold is None else threshold
+    change_diff = np.abs(sparse['change'] - dense['change'])
+    sparse_mask = sparse['change'] > threshold
+    dense_mask = dense['change'] > threshold
+    union = np.count_nonzero(sparse_mask | dense_mask)
+    return {
+        'mean_abs_change_diff': float(change_diff.mean()),
+        'max_abs_change_diff': float(change_diff.max()),
+        'change_mask_disagreement_percent': float(np.mean(sparse_mask != dense_mask) * 100),
+        'change_mask_iou': float(np.count_nonzero(sparse_mask & dense_mask) / union) if union else 1.0,
+        'missed_change_pixels': int(np.count_nonzero(dense_mask & ~sparse_mask)),
+        'vegetation_class_disagreement_percent': float(np.mean(
+            np.argmax(sparse['vegetation'], axis=0) != np.argmax(dense['vegetation'], axis=0)) * 100),
+        'urban_class_disagreement_percent': float(np.mean(
+            np.argmax(sparse['urban'], axis=0) != np.argmax(dense['urban'], axis=0)) * 100)
+    }
+
+
+def _pad_to_stride(tensor):
+    h, w = tensor.shape[-2:]
+    pad_h = (-h) % MODEL_STRIDE
+    pad_w = (-w) % MODEL_STRIDE
+    if pad_h or pad_w:
+        mode = 'reflect' if pad_h < h and pad_w < w else 'replicate'
+        tensor = F.pad(tensor, (0, pad_w, 0, pad_h), mode=mode)
+    return tensor
+
+
+def run_tiled_inference(model, bands1, bands2, device, tile_size=None, overlap=None,
+                        windows=None, batch_size=None, heads=None):
+    """
+    Run the change detection model tile by tile and stitch the outputs
+
+    Args:
+        model: ChangeDetectionModel in eval mode
+        bands1, bands2: (13, H, W) float32 numpy arrays
+        device: torch device for inference
+        tile_size, overlap: Window geometry (default: config.TILE_SIZE / TILE_OVERLAP)
+        windows: Optional subset of (y, x, h, w) windows to evaluate; pixels that
+                 no window covers are left at 0 (change) / "no change" class
+        batch_size: Tiles per forward pass (default: config.TILE_BATCH_SIZE)
+        heads: Model heads to run (default: all); only their maps are returned
+
+    Returns:
+        Dictionary with 'change' (H, W), 'vegetation' (3, H, W), 'urban' (3, H, W)
+        numpy arrays, plus 'coverage' (H, W) with the number of tiles per pixel
+    """
+    batch_size = batch_size or config.TILE_BATCH_SIZE
+    height = min(bands1.shape[1], bands2.shape[1])
+    width = min(bands1.shape[2], bands2.shape[2])
+    if windows is None:
+        windows = tile_windows(height, width, tile_size, overlap)
+
+    heads = heads or ('change', 'vegetation', 'urban')
+    maps = {name: np.zeros((height, width) if name == 'change' else (3, height, width), dtype=np.float32)
+            for name in heads}
+    coverage = np.zeros((height, width), dtype=np.float32)
+
+    # Windows of equal size are batched together; edge windows may be smaller
+    by_shape = {}
+    for window in windows:
+        by_shape.setdefault(window[2:], []).append(window)
+
+    with torch.no_grad():
+        for group in by_shape.values():
+            for start in range(0, len(group), batch_size):
+                chunk = group[start:start + batch_size]
+                img1 = torch.stack([torch.from_numpy(np.ascontiguousarray(bands1[:, y:y + h, x:x + w]))
+                                    for y, x, h, w in chunk])
+                img2 = torch.stack([torch.from_numpy(np.ascontiguousarray(bands2[:, y:y + h, x:x + w]))
+                                    for y, x, h, w in chunk])
+                img1 = _pad_to_stride(img1).to(device)
+                img2 = _pad_to_stride(img2).to(device)
+
+                outputs = model(img1, img2, heads=heads)
+                outputs = {name: outputs[name].float().cpu().numpy() for name in heads}
+
+                for i, (y, x, h, w) in enumerate(chunk):
+                    for name, out in outputs.items():
+                        if name == 'change':
+                            maps[name][y:y + h, x:x + w] += out[i, 0, :h, :w]
+                        else:
+                            maps[name][:, y:y + h, x:x + w] += out[i, :, :h, :w]
+                    coverage[y:y + h, x:x + w] += 1
+
+    # Average overlapping tiles
+    covered = coverage > 0
+    for name, stitched in maps.items():
+        if name == 'change':
+            stitched[covered] /= coverage[covered]
+        else:
+            stitched[:, covered] /= coverage[covered]
+            # Uncovered pixels default to the "no change" class
+            stitched[0, ~covered] = 1.0
+
+    return {**maps, 'coverage': coverage}
@@ -3,68 +3,174 @@
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import DataLoader
 from tqdm import tqdm
 import os
+import time
+from contextlib import nullcontext
 import config
-from dataset import OneraDataset, get_transforms
+from dataset import (OneraDataset, PatchDataset, StratifiedPatchSampler, get_transforms,
+                     get_patch_transforms, get_dataloader)
 from model import ChangeDetectionModel
+from augmentation import BatchAugment
+from evaluate import evaluate_checkpoint
 
-def train_epoch(model, dataloader, optimizer, device):
+# Heads the training loss uses; the others are not run during training
+LOSS_HEADS = ('change',)
+
+def train_epoch(model, dataloader, optimizer, device, accum_steps=None, amp_dtype=None,
+                channels_last=None, log_interval=None, show_progress=True, augment=None):
+    """
+    Train for one epoch
+    
+    Args:
+        accum_steps: Micro-batches per optimizer step (default: config.GRAD_ACCUM_STEPS)
+        amp_dtype: 'bf16' to run forward passes under autocast, None for fp32
+                   (default: config.AMP_DTYPE)
+        channels_last: Use channels_last memory format (default: config.CHANNELS_LAST)
+        log_interval: Steps between progress bar updates; the loss is only copied
+                      to the host at these points (default: config.LOG_INTERVAL)
+        show_progress: Display the tqdm progress bar (off on non-zero distributed ranks)
+        augment: Optional batched augmentation ``augment(img1, img2)`` applied after
+                 the batch is on the device (see augmentation.BatchAugment)
+    
+    Returns:
+        Tuple of (mean loss, stats) where stats holds samples_per_sec and the
+        per-stage timing: data_wait_seconds (loop blocked on the DataLoader),
+        compute_seconds (forward/backward/step), and decode/transform seconds
+        summed over samples as reported by the dataset workers
+    """
+    accum_steps = accum_steps or config.GRAD_ACCUM_STEPS
+    amp_dtype = config.AMP_DTYPE if amp_dtype is None else amp_dtype
+    channels_last = config.CHANNELS_LAST if channels_last is None else channels_last
+    log_interval = log_interval or config.LOG_INTERVAL
+    
+    memory_format = torch.channels_last if channels_last else torch.contiguous_format
+    use_amp = amp_dtype == 'bf16'
+    
     model.train()
-    total_loss = 0
+    # Running loss stays on the device; .item() would force a sync every step
+    total_loss = torch.zeros((), device=device)
+    window_loss = torch.zeros((), device=device)
+    num_samples = 0
+    data_time = 0.0
+    compute_time = 0.0
+    decode_time = 0.0
+    transform_time = 0.0
+    start_time = time.perf_counter()
+    
+    optimizer.zero_grad(set_to_none=True)
     
-    pbar = tqdm(dataloader, desc='Training')
-    for batch in pbar:
-        img1 = batch['img1'].to(device)
-        img2 = batch['img2'].to(device)
+    pbar = tqdm(dataloader, desc='Training', disable=not show_progress)
+    fetch_start = time.perf_counter()
+    for step, batch in enumerate(pbar, start=1):
+        compute_start = time.perf_counter()
+        data_time += compute_start - fetch_start
+        if 'load_time' in batch:
+            decode_time += float(batch['load_time'].sum())
+            transform_time += float(batch['transform_time'].sum())
+        
+        img1 = batch['img1'].to(device, non_blocking=True)
+        img2 = batch['img2'].to(device, non_blocking=True)
+        if augment is not None:
+            img1, img2 = augment(img1, img2)
+        img1 = img1.contiguous(memory_format=memory_format)
+        img2 = img2.contiguous(memory_format=memory_format)
+        num_samples += img1.shape[0]
+        
+        is_update_step = step % accum_steps == 0 or step == len(dataloader)
         
-        optimizer.zero_grad()
+        # Under DistributedDataParallel, only all-reduce gradients on update steps
+        sync_context = nullcontext()
+        if not is_update_step and hasattr(model, 'no_sync'):
+            sync_context = model.no_sync()
         
-        # Forward pass
-        outputs = model(img1, img2)
+        with sync_context:
+            # Forward pass
+            with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=use_amp):
+                outputs = model(img1, img2, heads=LOSS_HEADS)
+                
+                # For unsupervised learning, use reconstruction loss
+                # In practice, you'd use labeled data if available
+                loss = torch.mean(outputs['change'].float())  # Placeholder loss
+            
+            (loss / accum_steps).backward()
         
-        # For unsupervised learning, use reconstruction loss
-        # In practice, you'd use labeled data if available
-        loss = torch.mean(outputs['change'])  # Placeholder loss
+        if is_update_step:
+            optimizer.step()
+            optimizer.zero_grad(set_to_none=True)
         
-        loss.backward()
-        optimizer.step()
+        total_loss += loss.detach()
+        window_loss += loss.detach()
+        if step % log_interval == 0:
+            pbar.set_postfix({'loss': (window_loss / log_interval).item()})
+            window_loss.zero_()
         
-        total_loss += loss.item()
-        pbar.set_postfix({'loss': loss.item()})
+        # On CUDA this includes only kernel launch time between host syncs
+        compute_time += time.perf_counter() - compute_start
+        fetch_start = time.perf_counter()
     
-    return total_loss / len(dataloader)
+    elapsed = time.perf_counter() - start_time
+    stats = {
+        'samples_per_sec': num_samples / elapsed if elapsed > 0 else 0.0,
+        'epoch_seconds': elapsed,
+        'data_wait_seconds': data_time,
+        'compute_seconds': compute_time,
+        'decode_seconds': decode_time,
+        'transform_seconds': transform_time,
+        'data_wait_fraction': data_time / elapsed if elapsed > 0 else 0.0
+    }
+    return (total_loss / max(len(dataloader), 1)).item(), stats
 
 def main():
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     print(f"Using device: {device}")
+    print(f"Effective batch size: {config.BATCH_SIZE * config.GRAD_ACCUM_STEPS} "
+          f"({config.BATCH_SIZE} x {config.GRAD_ACCUM_STEPS} accumulation steps), "
+          f"precision: {config.AMP_DTYPE or 'fp32'}, channels_last: {config.CHANNELS_LAST}")
     
     # Create datasets
-    train_dataset = OneraDataset(
-        cities=config.TRAIN_CITIES,
-        root_dir=config.DATASET_ROOT,
-        transform=get_transforms(train=True)
-    )
+    train_sampler = None
+    # With BATCH_AUGMENT, workers only crop (a cheap slice) and flips/rotations run on whole batches
+    augment = BatchAugment() if config.BATCH_AUGMENT else None
+    if config.PATCH_SAMPLING:
+        # Decode every city once and draw PATCHES_PER_CITY crops from it per epoch
+        train_dataset = PatchDataset(
+            cities=config.TRAIN_CITIES,
+            root_dir=config.DATASET_ROOT,
+            transform=None if augment else get_patch_transforms(),
+            mmap_dir=config.PATCH_MMAP_DIR
+        )
+        train_sampler = StratifiedPatchSampler(train_dataset)
+        print(f"Patch sampling: {len(train_dataset.samples)} cities x "
+              f"{train_sampler.patches_per_city} patches per epoch")
+    else:
+        train_dataset = OneraDataset(
+            cities=config.TRAIN_CITIES,
+            root_dir=config.DATASET_ROOT,
+            transform=get_transforms(train=True, batch_augment=augment is not None)
+        )
     
-    train_loader = DataLoader(
-        train_dataset,
-        batch_size=config.BATCH_SIZE,
-        shuffle=True,
-        num_workers=config.NUM_WORKERS
-    )
+    train_loader = get_dataloader(train_dataset, batch_size=config.BATCH_SIZE, shuffle=True,
+                                  sampler=train_sampler)
     
     # Initialize model
     model = ChangeDetectionModel(in_channels=13).to(device)
+    if config.CHANNELS_LAST:
+        model = model.to(memory_format=torch.channels_last)
     optimizer = optim.Adam(model.parameters(), lr=config.LEARNING_RATE)
     
     # Training loop
     best_loss = float('inf')
     for epoch in range(config.NUM_EPOCHS):
         print(f"\nEpoch {epoch+1}/{config.NUM_EPOCHS}")
+        if train_sampler is not None:
+            train_sampler.set_epoch(epoch)
         
-        train_loss = train_epoch(model, train_loader, optimizer, device)
-        print(f"Train Loss: {train_loss:.4f}")
+        train_loss, stats = train_epoch(model, train_loader, optimizer, device, augment=augment)
+        print(f"Train Loss: {train_loss:.4f} ({stats['samples_per_sec']:.2f} samples/s)")
+        print(f"  Waiting on data: {stats['data_wait_seconds']:.1f}s "
+              f"({stats['data_wait_fraction']:.0%}), compute: {stats['compute_seconds']:.1f}s, "
+              f"worker decode: {stats['decode_seconds']:.1f}s, transforms: {stats['transform_seconds']:.1f}s")
         
         # Save best model
         if train_loss < best_loss:
@@ -76,6 +182,11 @@ def main():
                 'loss': train_loss,
             }, os.path.join(config.MODEL_DIR, 'best_model.pth'))
             print("Model saved!")
+            
+            if config.EVAL_ON_SAVE:
+                evaluate_checkpoint(os.path.join(config.MODEL_DIR, 'best_model.pth'),
+                                    output_path=os.path.join(config.MODEL_DIR, f'eval_epoch_{epoch+1:03d}.json'),
+                                    device=device)
     
     print("\nTraining completed!")
 
@@ -0,0 +1,186 @@
+"""Multi-process data-parallel training (torch.distributed, gloo backend)
+
+Single machine:   python train_distributed.py --nproc 4
+Multiple nodes:   torchrun --nnodes 2 --nproc-per-node 4 ... train_distributed.py
+Scaling check:    python train_distributed.py --benchmark 1,2,4,8 --synthetic 64
+"""
+
+import os
+import json
+import time
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.optim as optim
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data.distributed import DistributedSampler
+import config
+from dataset import (OneraDataset, PatchDataset, StratifiedPatchSampler, SyntheticDataset,
+                     get_transforms, get_patch_transforms, get_dataloader)
+from model import ChangeDetectionModel
+from train import train_epoch
+from augmentation import BatchAugment
+
+
+def setup(rank, world_size, master_addr='127.0.0.1', master_port='29500'):
+    """Join the process group; torchrun provides MASTER_ADDR/PORT itself"""
+    os.environ.setdefault('MASTER_ADDR', master_addr)
+    os.environ.setdefault('MASTER_PORT', master_port)
+    dist.init_process_group('gloo', rank=rank, world_size=world_size)
+
+
+def cleanup():
+    dist.destroy_process_group()
+
+
+def build_dataset(synthetic=0):
+    if synthetic:
+        return SyntheticDataset(num_samples=synthetic)
+    if config.PATCH_SAMPLING:
+        return PatchDataset(
+            cities=config.TRAIN_CITIES,
+            root_dir=config.DATASET_ROOT,
+            transform=None if config.BATCH_AUGMENT else get_patch_transforms(),
+            mmap_dir=config.PATCH_MMAP_DIR
+        )
+    return OneraDataset(
+        cities=config.TRAIN_CITIES,
+        root_dir=config.DATASET_ROOT,
+        transform=get_transforms(train=True, batch_augment=config.BATCH_AUGMENT)
+    )
+
+
+def run_worker(rank, world_size, args, results=None):
+    """Training loop executed by every rank"""
+    setup(rank, world_size, master_port=str(args.port))
+
+    # Split the machine's cores between ranks instead of oversubscribing
+    local_world_size = int(os.environ.get('LOCAL_WORLD_SIZE', world_size))
+    threads = args.threads or max(1, (os.cpu_count() or 1) // local_world_size)
+    torch.set_num_threads(threads)
+    torch.manual_seed(args.seed)
+
+    device = torch.device('cpu')
+    dataset = build_dataset(args.synthetic)
+    if isinstance(dataset, PatchDataset):
+        sampler = StratifiedPatchSampler(dataset, seed=args.seed, num_replicas=world_size, rank=rank)
+    else:
+        sampler = DistributedSampler(dataset, num_replicas=world_size, rank=rank, shuffle=True,
+                                     seed=args.seed)
+    loader = get_dataloader(dataset, batch_size=config.BATCH_SIZE, sampler=sampler,
+                            num_workers=args.num_workers)
+
+    model = ChangeDetectionModel(in_channels=13).to(device)
+    if config.CHANNELS_LAST:
+        model = model.to(memory_format=torch.channels_last)
+    # DDP broadcasts rank 0's weights and all-reduces gradients during backward.
+    # The heads outside train.LOSS_HEADS get no gradients, so DDP must look for unused parameters
+    model = DistributedDataParallel(model, find_unused_parameters=True)
+    optimizer = optim.Adam(model.parameters(), lr=config.LEARNING_RATE)
+
+    augment = BatchAugment() if config.BATCH_AUGMENT else None
+    best_loss = float('inf')
+    epoch_times = []
+    for epoch in range(args.epochs):
+        sampler.set_epoch(epoch)
+        if rank == 0:
+            print(f"\nEpoch {epoch+1}/{args.epochs} ({world_size} processes)")
+
+        dist.barrier()
+        start_time = time.perf_counter()
+        train_loss, _ = train_epoch(model, loader, optimizer, device, show_progress=(rank == 0),
+                                    augment=augment)
+        dist.barrier()
+        epoch_times.append(time.perf_counter() - start_time)
+
+        # Average the loss over ranks so every rank agrees on "best"
+        loss_tensor = torch.tensor([train_loss])
+        dist.all_reduce(loss_tensor, op=dist.ReduceOp.SUM)
+        train_loss = loss_tensor.item() / world_size
+
+        if rank == 0:
+            print(f"Train Loss: {train_loss:.4f} ({epoch_times[-1]:.1f}s)")
+            if train_loss < best_loss and not args.no_save:
+                best_loss = train_loss
+                torch.save({
+                    'epoch': epoch,
+                    'model_state_dict': model.module.state_dict(),
+                    'optimizer_state_dict': optimizer.state_dict(),
+                    'loss': train_loss,
+                    'world_size': world_size,
+                }, os.path.join(config.MODEL_DIR, 'best_model.pth'))
+                print("Model saved!")
+
+    if rank == 0 and results is not None:
+        results[world_size] = {
+            'world_size': world_size,
+            'threads_per_process': threads,
+            'epoch_times': epoch_times,
+            'mean_epoch_time': sum(epoch_times) / len(epoch_times),
+            'samples': len(dataset),
+        }
+
+    cleanup()
+
+
+def run_benchmark(args):
+    """Measure epoch time for several process counts on this machine"""
+    world_sizes = [int(n) for n in args.benchmark.split(',')]
+    manager = mp.Manager()
+    results = manager.dict()
+
+    for world_size in world_sizes:
+        print(f"\n=== {world_size} process(es) ===")
+        mp.spawn(run_worker, args=(world_size, args, results), nprocs=world_size, join=True)
+        args.port += 1  # Fresh rendezvous port per run
+
+    baseline = results[world_sizes[0]]['mean_epoch_time']
+    report = []
+    print("\n" + "=" * 60)
+    print(f"{'processes':>10} {'epoch time (s)':>16} {'speedup':>10} {'efficiency':>12}")
+    for world_size in world_sizes:
+        entry = dict(results[world_size])
+        entry['speedup'] = baseline / entry['mean_epoch_time']
+        entry['efficiency'] = entry['speedup'] * world_sizes[0] / world_size
+        report.append(entry)
+        print(f"{world_size:>10} {entry['mean_epoch_time']:>16.2f} "
+              f"{entry['speedup']:>10.2f} {entry['efficiency']:>12.0%}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"\nResults saved to: {args.output}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Distributed CPU training (gloo)')
+    parser.add_argument('--nproc', type=int, default=1, help='Processes to spawn on this machine')
+    parser.add_argument('--epochs', type=int, default=config.NUM_EPOCHS, help='Number of epochs')
+    parser.add_argument('--threads', type=int, help='Torch threads per process (default: cores / nproc)')
+    parser.add_argument('--num-workers', type=int, default=0, help='DataLoader workers per process')
+    parser.add_argument('--port', type=int, default=29500, help='Rendezvous port for spawned runs')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (shared by all ranks)')
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Use N random samples instead of the Onera dataset')
+    parser.add_argument('--benchmark', help='Comma-separated process counts, e.g. 1,2,4,8')
+    parser.add_argument('--output', default='distributed_scaling.json', help='Benchmark results file')
+    parser.add_argument('--no-save', action='store_true', help='Do not write checkpoints')
+
+    args = parser.parse_args()
+
+    if args.benchmark:
+        args.no_save = True
+        run_benchmark(args)
+    elif 'RANK' in os.environ and 'WORLD_SIZE' in os.environ:
+        # Launched by torchrun (possibly across nodes)
+        run_worker(int(os.environ['RANK']), int(os.environ['WORLD_SIZE']), args)
+    else:
+        mp.spawn(run_worker, args=(args.nproc, args), nprocs=args.nproc, join=True)
+
+    print("\nTraining completed!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Pixel validity masking
+Flags no-data pixels (zero in every band, which load_bands also produces
+for raster nodata values) and clouds (B10 cirrus, or bright in both the
+coastal aerosol and blue bands) in either acquisition, so inference and
+statistics can skip them
+"""
+
+import numpy as np
+import config
+
+B01, B02, B10 = (config.BAND_NAMES.index(name) for name in ('B01', 'B02', 'B10'))
+
+
+def nodata_mask(bands):
+    """(H, W) bool, True where every band is zero"""
+    empty = bands[0] == 0
+    for band in bands[1:]:
+        empty &= band == 0
+    return empty
+
+
+def cloud_mask(bands):
+    """(H, W) bool, True for cirrus or thick (bright coastal + blue) cloud"""
+    cloudy = bands[B10] > config.CLOUD_CIRRUS_THRESHOLD
+    cloudy |= (bands[B01] > config.CLOUD_BRIGHTNESS_THRESHOLD) & (bands[B02] > config.CLOUD_BRIGHTNESS_THRESHOLD)
+    return cloudy
+
+
+def validity_mask(bands1, bands2, clouds=True, within=None):
+    """
+    Pixels usable in both acquisitions
+
+    Args:
+        bands1, bands2: (13, H, W) band stacks scaled to [0, 1]
+        clouds: Also mask clouds (off for band stacks synthesized from RGB,
+                whose B10 is not a real cirrus band)
+        within: Optional (H, W) bool mask (e.g. an ROI) the counts are limited to
+
+    Returns:
+        (valid (H, W) bool, counts dict with 'nodata_pixels' and 'cloud_pixels')
+    """
+    nodata = nodata_mask(bands1)
+    nodata |= nodata_mask(bands2)
+    invalid = nodata.copy()
+    cloud_pixels = 0
+    if clouds:
+        cloudy = cloud_mask(bands1)
+        cloudy |= cloud_mask(bands2)
+        cloudy &= ~nodata
+        cloud_pixels = int(np.count_nonzero(cloudy & within if within is not None else cloudy))
+        invalid |= cloudy
+    nodata_pixels = int(np.count_nonzero(nodata & within if within is not None else nodata))
+    return ~invalid, {'nodata_pixels': nodata_pixels, 'cloud_pixels': cloud_pixels}
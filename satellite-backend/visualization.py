@@ -43,8 +43,12 @@ class ChangeVisualizer:
         return overlay
     
     def create_change_visualization(self, bands1, bands2, change_map, 
-                                   vegetation_map, urban_map, output_path):
-        """Create comprehensive visualization of all changes"""
+                                   vegetation_map, urban_map, output_path, on_saved=None):
+        """
+        Create comprehensive visualization of all changes
+        
+        on_saved, if given, is called with each individual file name as soon as it is written.
+        """
         import os
         
         # Create directory for individual visualizations
@@ -89,64 +93,69 @@ class ChangeVisualizer:
         # Save individual visualizations
         visualizations = []
         
+        def saved(filename):
+            visualizations.append(filename)
+            if on_saved:
+                on_saved(filename)
+        
         # 1. RGB Before
         self._save_single_viz(rgb1, 'Before (RGB)', 
                              os.path.join(viz_dir, '01_rgb_before.png'))
-        visualizations.append('01_rgb_before.png')
+        saved('01_rgb_before.png')
         
         # 2. RGB After
         self._save_single_viz(rgb2, 'After (RGB)', 
                              os.path.join(viz_dir, '02_rgb_after.png'))
-        visualizations.append('02_rgb_after.png')
+        saved('02_rgb_after.png')
         
         # 3. False Color Before
         self._save_single_viz(fc1, 'Before (False Color - NIR/Red/Green)', 
                              os.path.join(viz_dir, '03_false_color_before.png'))
-        visualizations.append('03_false_color_before.png')
+        saved('03_false_color_before.png')
         
         # 4. False Color After
         self._save_single_viz(fc2, 'After (False Color - NIR/Red/Green)', 
                              os.path.join(viz_dir, '04_false_color_after.png'))
-        visualizations.append('04_false_color_after.png')
+        saved('04_false_color_after.png')
         
         # 5. Overall Change Detection
         self._save_single_viz_with_colorbar(change_map, 'Overall Change Detection', 
                                            os.path.join(viz_dir, '05_change_detection.png'),
                                            cmap='hot', vmin=0, vmax=1)
-        visualizations.append('05_change_detection.png')
+        saved('05_change_detection.png')
         
         # 6. Vegetation Changes
         self._save_single_viz(veg_colored, 'Vegetation Changes', 
                              os.path.join(viz_dir, '06_vegetation_changes.png'))
-        visualizations.append('06_vegetation_changes.png')
+        saved('06_vegetation_changes.png')
         
         # 7. Urban Changes
         self._save_single_viz(urban_colored, 'Urban Changes', 
                              os.path.join(viz_dir, '07_urban_changes.png'))
-        visualizations.append('07_urban_changes.png')
+        saved('07_urban_changes.png')
         
         # 8. Change Overlay
         self._save_single_viz(combined, 'Change Overlay on After Image', 
                              os.path.join(viz_dir, '08_change_overlay.png'))
-        visualizations.append('08_change_overlay.png')
+        saved('08_change_overlay.png')
         
         # 9. NDVI Before
         self._save_single_viz_with_colorbar(ndvi1, 'NDVI Before', 
                                            os.path.join(viz_dir, '09_ndvi_before.png'),
                                            cmap='RdYlGn', vmin=-1, vmax=1)
-        visualizations.append('09_ndvi_before.png')
+        saved('09_ndvi_before.png')
         
         # 10. NDVI After
         self._save_single_viz_with_colorbar(ndvi2, 'NDVI After', 
                                            os.path.join(viz_dir, '10_ndvi_after.png'),
                                            cmap='RdYlGn', vmin=-1, vmax=1)
-        visualizations.append('10_ndvi_after.png')
+        saved('10_ndvi_after.png')
         
         # 11. NDVI Change
         self._save_single_viz_with_colorbar(ndvi_diff, 'NDVI Change (After - Before)', 
                                            os.path.join(viz_dir, '11_ndvi_change.png'),
                                            cmap='RdYlGn', vmin=-0.5, vmax=0.5)
-        visualizations.append('11_ndvi_change.png')
+        saved('11_ndvi_change.png')
         
         # Also create the combined visualization for backward compatibility
         self._create_combined_visualization(bands1, bands2, change_map, 
@@ -0,0 +1,177 @@
+"""
+Zonal statistics: every EnvironmentalAnalyzer change metric per zone
+(district, parcel, ...) of a label raster, computed for all zones at once
+with bincount / reduceat reductions instead of a loop over zones
+"""
+
+import os
+import csv
+import json
+import numpy as np
+import rasterio
+from rasterio import features
+from rasterio.windows import Window
+import rasterio.windows
+import config
+
+
+def load_zones(zones, image_folder, window=None, name_property='name'):
+    """
+    Build a label raster (0 = outside every zone) aligned with a band folder
+
+    Args:
+        zones: Path to a label raster (integer zone ids) or to a GeoJSON file,
+               a GeoJSON FeatureCollection dict / JSON string, or an int array
+        image_folder: Band folder whose size and georeferencing the zones follow
+        window: Optional rasterio Window the bands were cropped to
+        name_property: GeoJSON feature property used as the zone name
+
+    Returns:
+        (labels (H, W) int32, {zone_id: name})
+    """
+    with rasterio.open(os.path.join(image_folder, f"{config.BAND_NAMES[0]}.tif")) as src:
+        height, width, transform = src.height, src.width, src.transform
+    if window is None:
+        window = Window(0, 0, width, height)
+    shape = (int(window.height), int(window.width))
+
+    if isinstance(zones, np.ndarray):
+        if zones.shape != (height, width):
+            raise ValueError(f"Zone array is {zones.shape[1]}x{zones.shape[0]}, scene is {width}x{height}")
+        labels = zones[int(window.row_off):int(window.row_off) + shape[0],
+                       int(window.col_off):int(window.col_off) + shape[1]]
+        return labels.astype(np.int32), {}
+
+    if isinstance(zones, str) and os.path.exists(zones):
+        if os.path.splitext(zones)[1].lower() not in ('.json', '.geojson'):
+            with rasterio.open(zones) as src:
+                if (src.height, src.width) != (height, width):
+                    raise ValueError(f"Zone raster is {src.width}x{src.height}, scene is {width}x{height}")
+                return src.read(1, window=window).astype(np.int32), {}
+        with open(zones) as f:
+            zones = json.load(f)
+    elif isinstance(zones, str):
+        zones = json.loads(zones)
+
+    feature_list = zones.get('features', []) if zones.get('type') == 'FeatureCollection' else [zones]
+    shapes, names = [], {}
+    for zone_id, feature in enumerate(feature_list, start=1):
+        geometry = feature.get('geometry', feature)
+        if not geometry:
+            continue
+        shapes.append((geometry, zone_id))
+        properties = feature.get('properties') or {}
+        names[zone_id] = str(properties.get(name_property, properties.get('id', zone_id)))
+    if not shapes:
+        raise ValueError("Zone GeoJSON contains no geometry")
+
+    labels = features.rasterize(shapes, out_shape=shape, transform=rasterio.windows.transform(window, transform),
+                                fill=0, dtype='int32')
+    return labels, names
+
+
+def _per_zone_extrema(values, labels, counts):
+    """Per-zone max and min via one sort and reduceat (zones without pixels get 0)"""
+    order = np.argsort(labels, kind='stable')
+    sorted_values = values[order]
+    present = np.flatnonzero(counts)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[present]
+    maxima = np.zeros(len(counts), dtype=np.float64)
+    minima = np.zeros(len(counts), dtype=np.float64)
+    if len(present):
+        maxima[present] = np.maximum.reduceat(sorted_values, starts)
+        minima[present] = np.minimum.reduceat(sorted_values, starts)
+    return maxima, minima
+
+
+def zonal_statistics(indices1, indices2, labels, zone_names=None):
+    """
+    All vegetation / urban / water change metrics for every zone in one pass
+
+    Args:
+        indices1, indices2: Index dicts from EnvironmentalAnalyzer.calculate_indices
+        labels: (H, W) non-negative integer zone ids; 0 means "no zone"
+        zone_names: Optional {zone_id: name}
+
+    Returns:
+        {zone_id: {'name', 'pixels', 'area_km2', 'vegetation_analysis',
+                   'urban_analysis', 'water_analysis'}} for zones with pixels
+    """
+    labels = np.asarray(labels).ravel()
+    if labels.size and labels.min() < 0:
+        raise ValueError("Zone ids must be non-negative")
+    n_zones = int(labels.max()) + 1 if labels.size else 1
+    zone_names = zone_names or {}
+
+    counts = np.bincount(labels, minlength=n_zones)
+    safe_counts = np.maximum(counts, 1)
+
+    def zone_sum(weights):
+        return np.bincount(labels, weights=weights.ravel(), minlength=n_zones)
+
+    def zone_count(condition):
+        return np.bincount(labels[condition], minlength=n_zones)
+
+    diffs = {name: (indices2[name] - indices1[name]).ravel() for name in ('ndvi', 'savi', 'ndbi', 'ndwi')}
+    results = {}
+
+    veg_up = zone_count(diffs['ndvi'] > config.INDEX_CHANGE_THRESHOLD)
+    veg_down = zone_count(diffs['ndvi'] < -config.INDEX_CHANGE_THRESHOLD)
+    veg_gain, veg_loss = _per_zone_extrema(diffs['ndvi'], labels, counts)
+    results['vegetation_analysis'] = {
+        'vegetation_increase_percent': veg_up / safe_counts * 100,
+        'vegetation_decrease_percent': veg_down / safe_counts * 100,
+        'vegetation_stable_percent': (counts - veg_up - veg_down) / safe_counts * 100,
+        'mean_ndvi_change': zone_sum(diffs['ndvi']) / safe_counts,
+        'mean_savi_change': zone_sum(diffs['savi']) / safe_counts,
+        'max_vegetation_gain': veg_gain,
+        'max_vegetation_loss': veg_loss
+    }
+
+    urban_up = zone_count(diffs['ndbi'] > config.INDEX_CHANGE_THRESHOLD)
+    urban_down = zone_count(diffs['ndbi'] < -config.INDEX_CHANGE_THRESHOLD)
+    results['urban_analysis'] = {
+        'urbanization_percent': urban_up / safe_counts * 100,
+        'deurbanization_percent': urban_down / safe_counts * 100,
+        'urban_stable_percent': (counts - urban_up - urban_down) / safe_counts * 100,
+        'mean_ndbi_change': zone_sum(diffs['ndbi']) / safe_counts,
+        'construction_area_km2': urban_up * config.PIXEL_AREA_KM2,
+        'demolition_area_km2': urban_down * config.PIXEL_AREA_KM2
+    }
+
+    water_up = zone_count(diffs['ndwi'] > config.INDEX_CHANGE_THRESHOLD)
+    water_down = zone_count(diffs['ndwi'] < -config.INDEX_CHANGE_THRESHOLD)
+    results['water_analysis'] = {
+        'water_increase_percent': water_up / safe_counts * 100,
+        'water_decrease_percent': water_down / safe_counts * 100,
+        'mean_ndwi_change': zone_sum(diffs['ndwi']) / safe_counts,
+        'water_gain_area_km2': water_up * config.PIXEL_AREA_KM2,
+        'water_loss_area_km2': water_down * config.PIXEL_AREA_KM2
+    }
+
+    # Only the final assembly touches zones one by one
+    zones = {}
+    for zone_id in np.flatnonzero(counts[1:]) + 1:
+        zone_id = int(zone_id)
+        zones[zone_id] = {
+            'name': zone_names.get(zone_id, str(zone_id)),
+            'pixels': int(counts[zone_id]),
+            'area_km2': float(counts[zone_id] * config.PIXEL_AREA_KM2),
+            **{section: {metric: float(values[zone_id]) for metric, values in metrics.items()}
+               for section, metrics in results.items()}
+        }
+    return zones
+
+
+def write_zonal_csv(zones, output_path):
+    """One row per zone with every metric as a column"""
+    sections = ('vegetation_analysis', 'urban_analysis', 'water_analysis')
+    columns = None
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        for zone_id, zone in zones.items():
+            if columns is None:
+                columns = [(section, metric) for section in sections for metric in zone[section]]
+                writer.writerow(['zone_id', 'name', 'pixels', 'area_km2'] + [metric for _, metric in columns])
+            writer.writerow([zone_id, zone['name'], zone['pixels'], zone['area_km2']] +
+                            [zone[section][metric] for section, metric in columns])